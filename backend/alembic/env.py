@@ -0,0 +1,64 @@
+# alembic/env.py
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from app.database import DATABASE_URL, Base
+import app.models  # noqa: F401  (registra todas las tablas en Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Objetos creados con DDL propio del motor (ver app/search.py): no están en los
+# modelos y el autogenerate no debe proponer borrarlos.
+EXCLUDED_NAMES = {"ix_books_search_document_fts"}
+EXCLUDED_PREFIXES = ("books_fts",)
+
+
+def include_name(name, type_, parent_names):
+    if name is None:
+        return True
+    return name not in EXCLUDED_NAMES and not name.startswith(EXCLUDED_PREFIXES)
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        include_name=include_name,
+        compare_type=True,
+        # SQLite no tiene ALTER de columnas: los cambios se aplican recreando la tabla
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+        **kwargs,
+    )
+
+
+def run_migrations_offline():
+    _configure(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run(connection):
+    _configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # Quien invoque las migraciones desde código puede pasar su propia conexión
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with create_engine(DATABASE_URL).connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
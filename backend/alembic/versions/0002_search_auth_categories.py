@@ -0,0 +1,145 @@
+"""Búsqueda de texto completo, revocación de tokens y categorías normalizadas
+
+- books.search_document y su índice de texto completo (FTS5 en SQLite, GIN en PostgreSQL)
+- users.token_epoch
+- categories.normalized_name único; las categorías que sólo difieren en
+  mayúsculas o espacios se fusionan en la más antigua
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-07-14
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Copias de las funciones de la aplicación a la fecha de esta migración
+# (app/search.py y app/models/book.py), para que el resultado no cambie si aquellas cambian.
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokenize(value):
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return _TOKEN_RE.findall("".join(c for c in decomposed if not unicodedata.combining(c)).lower())
+
+
+def _normalize_category_name(name):
+    return " ".join(name.split()).casefold()
+
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "search_document, content='books', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, search_document) VALUES ('delete', old.id, old.search_document); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF search_document ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, search_document) VALUES ('delete', old.id, old.search_document); "
+    "INSERT INTO books_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_FTS_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_books_search_document_fts ON books "
+    "USING gin (to_tsvector('simple', coalesce(search_document, '')))",
+]
+
+
+def _backfill_search_documents(bind):
+    books = sa.table("books", sa.column("id"), sa.column("title"), sa.column("author"),
+                     sa.column("editorial"), sa.column("tags"), sa.column("search_document"))
+    links = sa.table("books_categories", sa.column("book_id"), sa.column("category_id"))
+    categories = sa.table("categories", sa.column("id"), sa.column("name"))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(books.c.id, books.c.title, books.c.author, books.c.editorial, books.c.tags)
+            .where(books.c.id > last_id).order_by(books.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        names = defaultdict(list)
+        for book_id, name in bind.execute(
+            sa.select(links.c.book_id, categories.c.name)
+            .join(categories, categories.c.id == links.c.category_id)
+            .where(links.c.book_id.in_([row.id for row in rows]))
+        ):
+            names[book_id].append(name)
+        bind.execute(
+            books.update().where(books.c.id == sa.bindparam("book_id")).values(search_document=sa.bindparam("document")),
+            [
+                {"book_id": row.id, "document": " ".join(_tokenize(" ".join(
+                    [row.title or "", row.author or "", row.editorial or "", row.tags or ""] + names[row.id]
+                )))}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def _merge_duplicate_categories(bind):
+    categories = sa.table("categories", sa.column("id"), sa.column("name"), sa.column("normalized_name"))
+    links = sa.table("books_categories", sa.column("book_id"), sa.column("category_id"))
+    groups = defaultdict(list)
+    for category_id, name in bind.execute(sa.select(categories.c.id, categories.c.name).order_by(categories.c.id)):
+        groups[_normalize_category_name(name)].append(category_id)
+    for key, (keep, *duplicates) in groups.items():
+        for duplicate in duplicates:
+            # Los libros de la duplicada pasan a la que se conserva, sin repetir pares
+            already = sa.select(links.c.book_id).where(links.c.category_id == keep)
+            bind.execute(links.insert().from_select(
+                ["book_id", "category_id"],
+                sa.select(links.c.book_id, sa.literal(keep))
+                .where(links.c.category_id == duplicate, links.c.book_id.not_in(already)),
+            ))
+            bind.execute(links.delete().where(links.c.category_id == duplicate))
+            bind.execute(categories.delete().where(categories.c.id == duplicate))
+        bind.execute(categories.update().where(categories.c.id == keep).values(normalized_name=key))
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    op.add_column("users", sa.Column("token_epoch", sa.Integer(), server_default="0", nullable=False))
+
+    op.add_column("categories", sa.Column("normalized_name", sa.String(), nullable=True))
+    _merge_duplicate_categories(bind)
+    op.create_index("ix_categories_normalized_name", "categories", ["normalized_name"], unique=True)
+
+    op.add_column("books", sa.Column("search_document", sa.Text(), nullable=True))
+    _backfill_search_documents(bind)
+    if bind.dialect.name == "sqlite":
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+    elif bind.dialect.name == "postgresql":
+        for statement in POSTGRES_FTS_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for trigger in ("books_fts_ai", "books_fts_ad", "books_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS books_fts")
+    elif bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_books_search_document_fts")
+    with op.batch_alter_table("books") as batch:
+        batch.drop_column("search_document")
+    op.drop_index("ix_categories_normalized_name", table_name="categories")
+    with op.batch_alter_table("categories") as batch:
+        batch.drop_column("normalized_name")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("token_epoch")
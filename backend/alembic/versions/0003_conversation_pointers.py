@@ -0,0 +1,70 @@
+"""Último mensaje, no leídos y lectura por participante en cada conversación
+
+Agrega el puntero al último mensaje que usa la bandeja de entrada, los contadores
+de no leídos y el último mensaje leído de cada participante, y los completa a
+partir de los mensajes existentes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-07-14
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.add_column(sa.Column("last_message_id", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("last_message_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("user1_unread_count", sa.Integer(), server_default="0", nullable=False))
+        batch.add_column(sa.Column("user2_unread_count", sa.Integer(), server_default="0", nullable=False))
+        batch.add_column(sa.Column("user1_last_read_id", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("user2_last_read_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_conversations_last_message_id", "messages", ["last_message_id"], ["id"])
+
+    conversations = sa.table(
+        "conversations", sa.column("id"), sa.column("user1_id"), sa.column("user2_id"), sa.column("created_at"),
+        sa.column("last_message_id"), sa.column("last_message_at"),
+        sa.column("user1_unread_count"), sa.column("user2_unread_count"),
+        sa.column("user1_last_read_id"), sa.column("user2_last_read_id"),
+    )
+    messages = sa.table("messages", sa.column("id"), sa.column("conversation_id"), sa.column("receiver_id"),
+                        sa.column("timestamp"), sa.column("is_read"))
+    c, m = conversations.c, messages.c
+    in_conversation = m.conversation_id == c.id
+
+    def received(user_column, is_read):
+        return sa.and_(in_conversation, m.receiver_id == user_column, m.is_read == is_read)
+
+    op.execute(conversations.update().values(
+        last_message_id=sa.select(sa.func.max(m.id)).where(in_conversation).scalar_subquery(),
+        user1_unread_count=sa.select(sa.func.count()).where(received(c.user1_id, sa.false())).scalar_subquery(),
+        user2_unread_count=sa.select(sa.func.count()).where(received(c.user2_id, sa.false())).scalar_subquery(),
+        user1_last_read_id=sa.select(sa.func.max(m.id)).where(received(c.user1_id, sa.true())).scalar_subquery(),
+        user2_last_read_id=sa.select(sa.func.max(m.id)).where(received(c.user2_id, sa.true())).scalar_subquery(),
+    ))
+    # Sin mensajes, la conversación se ordena por su fecha de creación
+    op.execute(conversations.update().values(last_message_at=sa.func.coalesce(
+        sa.select(m.timestamp).where(m.id == c.last_message_id).scalar_subquery(), c.created_at,
+    )))
+
+    op.create_index("ix_conversations_user1_last_message_at", "conversations", ["user1_id", "last_message_at"])
+    op.create_index("ix_conversations_user2_last_message_at", "conversations", ["user2_id", "last_message_at"])
+    op.create_index("ix_messages_conversation_receiver_is_read", "messages", ["conversation_id", "receiver_id", "is_read"])
+
+
+def downgrade():
+    op.drop_index("ix_messages_conversation_receiver_is_read", table_name="messages")
+    op.drop_index("ix_conversations_user2_last_message_at", table_name="conversations")
+    op.drop_index("ix_conversations_user1_last_message_at", table_name="conversations")
+    with op.batch_alter_table("conversations") as batch:
+        batch.drop_constraint("fk_conversations_last_message_id", type_="foreignkey")
+        for column in ("user2_last_read_id", "user1_last_read_id", "user2_unread_count",
+                       "user1_unread_count", "last_message_at", "last_message_id"):
+            batch.drop_column(column)
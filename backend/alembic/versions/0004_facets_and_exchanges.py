@@ -0,0 +1,137 @@
+"""Conteos de facetas, listas de deseos e índices de intercambio
+
+- book_facet_counts, completada con los conteos del catálogo actual
+- wishlist_items, book_match_keys (completada con las claves de los libros
+  existentes) y exchange_edges (vacía: todavía no hay deseos)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-07-14
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Copia de app.matching.match_key a la fecha de esta migración
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _match_key(kind, value):
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    terms = _TOKEN_RE.findall("".join(c for c in decomposed if not unicodedata.combining(c)).lower())
+    return f"{kind}:{' '.join(terms)}" if terms else None
+
+
+def _fill_facet_counts(bind):
+    books = sa.table("books", sa.column("id"), sa.column("idioma"), sa.column("estado"), sa.column("publication_date", sa.Integer))
+    links = sa.table("books_categories", sa.column("book_id"), sa.column("category_id"))
+    categories = sa.table("categories", sa.column("id"), sa.column("name"))
+    counts = sa.table("book_facet_counts", sa.column("facet"), sa.column("value"), sa.column("count"))
+
+    def grouped(facet, value, select_from, *where):
+        return (
+            sa.select(sa.literal(facet), sa.cast(value, sa.String), sa.func.count())
+            .select_from(select_from).where(*where).group_by(value)
+        )
+
+    decade = (books.c.publication_date // 10) * 10
+    queries = [
+        grouped("categories", categories.c.name, links.join(categories, categories.c.id == links.c.category_id)),
+        grouped("idioma", books.c.idioma, books, books.c.idioma.isnot(None)),
+        grouped("estado", books.c.estado, books, books.c.estado.isnot(None)),
+        grouped("publication_decade", decade, books, books.c.publication_date.isnot(None)),
+    ]
+    bind.execute(counts.insert().from_select(["facet", "value", "count"], sa.union_all(*queries)))
+
+
+def _fill_book_match_keys(bind):
+    books = sa.table("books", sa.column("id"), sa.column("title"), sa.column("author"), sa.column("user_id"))
+    links = sa.table("books_categories", sa.column("book_id"), sa.column("category_id"))
+    categories = sa.table("categories", sa.column("id"), sa.column("name"))
+    keys = sa.table("book_match_keys", sa.column("key"), sa.column("book_id"), sa.column("user_id"))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(books.c.id, books.c.title, books.c.author, books.c.user_id)
+            .where(books.c.id > last_id, books.c.user_id.isnot(None)).order_by(books.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        names = defaultdict(list)
+        for book_id, name in bind.execute(
+            sa.select(links.c.book_id, categories.c.name)
+            .join(categories, categories.c.id == links.c.category_id)
+            .where(links.c.book_id.in_([row.id for row in rows]))
+        ):
+            names[book_id].append(name)
+        values = []
+        for row in rows:
+            book_keys = {_match_key("title", row.title), _match_key("author", row.author)}
+            book_keys.update(_match_key("category", name) for name in names[row.id])
+            book_keys.discard(None)
+            values.extend({"key": key, "book_id": row.id, "user_id": row.user_id} for key in book_keys)
+        if values:
+            bind.execute(keys.insert(), values)
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    op.create_table(
+        "book_facet_counts",
+        sa.Column("facet", sa.String(), primary_key=True),
+        sa.Column("value", sa.String(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    _fill_facet_counts(bind)
+
+    op.create_table(
+        "wishlist_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("user_id", "key", name="uq_wishlist_items_user_key"),
+    )
+    op.create_index("ix_wishlist_items_id", "wishlist_items", ["id"])
+    op.create_index("ix_wishlist_items_key_user", "wishlist_items", ["key", "user_id"])
+
+    op.create_table(
+        "book_match_keys",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("book_id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    )
+    _fill_book_match_keys(bind)
+    op.create_index("ix_book_match_keys_key_user", "book_match_keys", ["key", "user_id"])
+    op.create_index("ix_book_match_keys_book", "book_match_keys", ["book_id"])
+    op.create_index("ix_book_match_keys_user", "book_match_keys", ["user_id"])
+
+    op.create_table(
+        "exchange_edges",
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("wisher_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("strength", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_exchange_edges_wisher_owner", "exchange_edges", ["wisher_id", "owner_id"])
+
+
+def downgrade():
+    op.drop_table("exchange_edges")
+    op.drop_table("book_match_keys")
+    op.drop_table("wishlist_items")
+    op.drop_table("book_facet_counts")
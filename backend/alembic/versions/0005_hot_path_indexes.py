@@ -0,0 +1,39 @@
+"""Índices compuestos para los caminos de acceso frecuentes
+
+- books(user_id, id): libros de un usuario paginados por id
+- books_categories(category_id, book_id): libros de una categoría (filtros y facetas)
+- messages(sender_id, receiver_id, timestamp): historial entre dos usuarios
+- messages(conversation_id, timestamp): mensajes de una conversación en orden
+- conversations(user1_id, user2_id): conversación entre dos usuarios
+
+benchmarks/check_query_plans.py verifica que las rutas los usen.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-07-14
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_books_user_id_id", "books", ["user_id", "id"]),
+    ("ix_books_categories_category_book", "books_categories", ["category_id", "book_id"]),
+    ("ix_messages_sender_receiver_timestamp", "messages", ["sender_id", "receiver_id", "timestamp"]),
+    ("ix_messages_conversation_timestamp", "messages", ["conversation_id", "timestamp"]),
+    ("ix_conversations_user1_user2", "conversations", ["user1_id", "user2_id"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
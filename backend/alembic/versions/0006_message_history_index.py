@@ -0,0 +1,24 @@
+"""Índice para el historial de mensajes por id
+
+- messages(conversation_id, id): páginas hacia atrás (before_id) y
+  sincronización incremental (since_id) de GET /messages/conversation/{user_id}
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-07-14
+"""
+from alembic import op
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_messages_conversation_id", "messages", ["conversation_id", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_messages_conversation_id", table_name="messages")
@@ -0,0 +1,176 @@
+# app/catalog_export.py
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import secrets
+import sys
+import threading
+import zlib
+from datetime import date
+from typing import Iterable, Iterator, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from app.database import read_session
+from app.models import Book, Category, User
+from app.models.book import books_categories
+
+load_dotenv()
+
+# Filas que trae el cursor del servidor en cada viaje (y tamaño del lote de categorías)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+# Credencial de operador para GET /books/export (header X-Export-Token). Sin ella la ruta
+# queda deshabilitada y el volcado sólo se hace con este módulo desde la línea de comandos.
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Mismas columnas que acepta POST /books/import, más el dueño
+CSV_FIELDS = [
+    "id", "title", "author", "publication_date", "editorial", "edicion", "description",
+    "image_url", "tags", "idioma", "estado", "categories", "user_id", "owner_username",
+]
+CSV_CATEGORY_SEPARATOR = ";"
+
+_COLUMNS = [getattr(Book, field) for field in CSV_FIELDS[:11]] + [Book.user_id, User.username.label("owner_username")]
+
+
+def _records(db, batch_size: int) -> Iterator[dict]:
+    """
+    Recorre el catálogo con un cursor del lado del servidor (yield_per) y agrega
+    las categorías de cada tanda con una sola consulta.
+    """
+    stmt = (
+        select(*_COLUMNS)
+        .outerjoin(User, User.id == Book.user_id)
+        .order_by(Book.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in db.execute(stmt).partitions():
+        ids = [row.id for row in partition]
+        categories = {book_id: [] for book_id in ids}
+        category_rows = db.execute(
+            select(books_categories.c.book_id, Category.name)
+            .join(Category, Category.id == books_categories.c.category_id)
+            .where(books_categories.c.book_id.in_(ids))
+            .order_by(books_categories.c.book_id, Category.name)
+        )
+        for book_id, name in category_rows:
+            categories[book_id].append(name)
+        for row in partition:
+            record = row._asdict()
+            record["categories"] = categories[row.id]
+            yield record
+
+
+def _ndjson(records: Iterable[dict]) -> Iterator[bytes]:
+    for record in records:
+        yield (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode()
+
+
+def _csv(records: Iterable[dict]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow({**record, "categories": CSV_CATEGORY_SEPARATOR.join(record["categories"])})
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _coalesce(chunks: Iterable[bytes], size: int = 64 * 1024) -> Iterator[bytes]:
+    """Agrupa las líneas en bloques de ~64 KB para no enviar un fragmento por fila."""
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= size:
+            yield b"".join(pending)
+            pending, pending_size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Comprime al vuelo en formato gzip, bloque por bloque."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_catalog(fmt: str = "ndjson", compress: bool = False, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Genera el volcado completo del catálogo (libros, categorías y dueño) en NDJSON
+    o CSV. Usa su propia sesión de lectura (en una réplica si hay), que se cierra al
+    terminar o si se interrumpe la descarga, y mantiene la memoria constante sin
+    importar el tamaño del catálogo.
+    """
+    db = read_session()
+    try:
+        records = _records(db, batch_size)
+        chunks = _coalesce(_csv(records) if fmt == "csv" else _ndjson(records))
+        yield from gzip_stream(chunks) if compress else chunks
+    finally:
+        db.close()
+
+
+# Una sola exportación a la vez por proceso: cada una recorre todo el catálogo
+_export_lock = threading.Lock()
+
+
+def is_export_token(token: Optional[str]) -> bool:
+    return bool(EXPORT_TOKEN and token and secrets.compare_digest(token, EXPORT_TOKEN))
+
+
+def exclusive_export(fmt: str = "ndjson", compress: bool = False) -> Optional[Iterator[bytes]]:
+    """
+    Como `export_catalog`, pero devuelve None si ya hay otra exportación en curso en
+    este proceso. El primer bloque se genera acá, así el volcado queda iniciado y el
+    lock se libera al terminar, al fallar o cuando se descarta la descarga sin leerla.
+    """
+    if not _export_lock.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            yield from export_catalog(fmt, compress)
+        finally:
+            _export_lock.release()
+
+    stream = run()
+    first = next(stream, None)
+    return itertools.chain([] if first is None else [first], stream)
+
+
+def filename(fmt: str, compress: bool) -> str:
+    return f"catalogo-{date.today():%Y%m%d}.{fmt}" + (".gz" if compress else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta el catálogo de libros en NDJSON o CSV.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="comprime la salida con gzip")
+    parser.add_argument("--output", "-o", help="archivo de salida (por defecto, la salida estándar)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_catalog(args.format, args.gzip, args.batch_size):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+# Uso (desde backend/): python -m app.catalog_export --format csv --gzip -o catalogo.csv.gz
+if __name__ == "__main__":
+    main()
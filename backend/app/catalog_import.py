@@ -0,0 +1,188 @@
+# app/catalog_import.py
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import models, schemas
+from app.categories import resolve_categories
+from app.database import SessionLocal
+from app.models.book import normalize_category_name
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Libros por transacción durante una importación
+BOOK_IMPORT_BATCH_SIZE = int(os.getenv("BOOK_IMPORT_BATCH_SIZE", 500))
+# El reporte se guarda en memoria hasta este tamaño y después en disco
+REPORT_SPOOL_BYTES = 1024 * 1024
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# En CSV las categorías van en una sola columna separadas por este carácter
+CSV_CATEGORY_SEPARATOR = ";"
+
+
+def detect_format(explicit: Optional[str], content_type: Optional[str]) -> str:
+    """Formato del cuerpo: el parámetro `format` si vino, si no el Content-Type."""
+    if explicit:
+        return explicit
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    for name, expected in FORMATS.items():
+        if media_type == expected or media_type.endswith(f"/{name}"):
+            return name
+    if media_type in ("application/json", "application/jsonl", "application/x-jsonlines"):
+        return "ndjson"
+    raise HTTPException(
+        status_code=415,
+        detail="Formato no soportado: envía text/csv o application/x-ndjson, o indica ?format=csv|ndjson.",
+    )
+
+
+class _ChunkReader(io.RawIOBase):
+    """Adapta una función que devuelve bloques de bytes (b"" al terminar) a un archivo de lectura."""
+
+    def __init__(self, read_chunk: Callable[[], bytes]):
+        self._read_chunk = read_chunk
+        self._pending = memoryview(b"")
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self._done:
+            chunk = self._read_chunk()
+            self._pending = memoryview(chunk)
+            self._done = not chunk
+        # memoryview evita copiar el resto del bloque en cada lectura
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _csv_rows(text: io.TextIOBase) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(text)
+    for number, row in enumerate(reader, start=1):
+        # Las celdas vacías se omiten para que tomen el valor por defecto del esquema
+        data = {key.strip(): value.strip() for key, value in row.items()
+                if key is not None and value is not None and value.strip()}
+        categories = data.get("categories", "")
+        data["categories"] = [name for name in categories.split(CSV_CATEGORY_SEPARATOR) if name.strip()]
+        yield number, data
+
+
+def _ndjson_rows(text: io.TextIOBase) -> Iterator[Tuple[int, object]]:
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+def _line(entry: dict) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode()
+
+
+def _validation_errors(error: Exception) -> List[dict]:
+    if isinstance(error, ValidationError):
+        return [{"loc": list(item["loc"]), "msg": item["msg"]} for item in error.errors()]
+    return [{"loc": [], "msg": f"JSON inválido: {error}"}]
+
+
+def _save_batch(db, user_id: int, batch: List[Tuple[int, schemas.BookCreate]]) -> Iterator[dict]:
+    """Guarda un lote de libros en una sola transacción, con las categorías resueltas de una vez."""
+    if not batch:
+        return
+    try:
+        names = [name for _, book in batch for name in book.categories]
+        resolved = {normalize_category_name(c.name): c for c in resolve_categories(db, names)}
+        db_books = []
+        for _, book in batch:
+            keys = dict.fromkeys(normalize_category_name(name) for name in book.categories)
+            db_book = models.Book(**book.model_dump(exclude={"categories"}), user_id=user_id)
+            db_book.categories = [resolved[key] for key in keys if key]
+            db_books.append(db_book)
+        db.add_all(db_books)
+        db.flush()
+        ids = [db_book.id for db_book in db_books]
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error al guardar un lote de la importación: {e}")
+        for number, _ in batch:
+            yield {"row": number, "status": "error", "errors": [{"loc": [], "msg": "No se pudo guardar el lote."}]}
+        return
+    finally:
+        # Los libros ya guardados no se vuelven a usar: se sueltan para mantener la memoria plana
+        db.expunge_all()
+    for (number, _), book_id in zip(batch, ids):
+        yield {"row": number, "status": "created", "id": book_id}
+
+
+def import_books(user_id: int, read_chunk: Callable[[], bytes], fmt: str,
+                 batch_size: int = BOOK_IMPORT_BATCH_SIZE) -> tempfile.SpooledTemporaryFile:
+    """
+    Importa los libros de un cuerpo CSV o NDJSON leído por bloques con `read_chunk`.
+    Valida cada fila con schemas.BookCreate y guarda de a `batch_size` libros por
+    transacción. Devuelve el reporte (una línea JSON por fila más un resumen final)
+    en un archivo temporal, listo para enviarse en streaming.
+    """
+    text = io.TextIOWrapper(io.BufferedReader(_ChunkReader(read_chunk)), encoding="utf-8-sig", newline="")
+    rows = _csv_rows(text) if fmt == "csv" else _ndjson_rows(text)
+    report = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+    counts = {"created": 0, "error": 0}
+
+    def write(entry: dict) -> None:
+        counts[entry["status"]] += 1
+        report.write(_line(entry))
+
+    db = SessionLocal()
+    try:
+        batch: List[Tuple[int, schemas.BookCreate]] = []
+        invalid: List[dict] = []
+        for number, data in rows:
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                batch.append((number, schemas.BookCreate.model_validate(data)))
+            except (ValidationError, ValueError) as e:
+                invalid.append({"row": number, "status": "error", "errors": _validation_errors(e)})
+            if len(batch) + len(invalid) >= batch_size:
+                # El reporte del lote se escribe en el orden de las filas
+                for entry in sorted([*_save_batch(db, user_id, batch), *invalid], key=lambda e: e["row"]):
+                    write(entry)
+                batch, invalid = [], []
+        for entry in sorted([*_save_batch(db, user_id, batch), *invalid], key=lambda e: e["row"]):
+            write(entry)
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.close()
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {e}")
+    finally:
+        db.close()
+
+    report.write(_line({"summary": counts}))
+    report.seek(0)
+    return report
+
+
+def iter_report(report: tempfile.SpooledTemporaryFile) -> Iterator[bytes]:
+    """Envía el reporte por bloques y cierra el archivo temporal al terminar."""
+    try:
+        while chunk := report.read(64 * 1024):
+            yield chunk
+    finally:
+        report.close()
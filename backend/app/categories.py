@@ -0,0 +1,109 @@
+# app/categories.py
+import os
+from typing import Dict, Iterable, List
+
+from dotenv import load_dotenv
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.cache import TTLCache
+from app.models import Category
+from app.models.book import normalize_category_name
+
+load_dotenv()
+
+# Categorías conocidas: clave normalizada -> (id, nombre). El conjunto es chico
+# y casi no cambia, así que se cachea con un TTL largo.
+CATEGORY_CACHE_TTL_SECONDS = float(os.getenv("CATEGORY_CACHE_TTL_SECONDS", 3600))
+CATEGORY_CACHE_MAX_SIZE = int(os.getenv("CATEGORY_CACHE_MAX_SIZE", 10000))
+
+category_cache = TTLCache(maxsize=CATEGORY_CACHE_MAX_SIZE, ttl=CATEGORY_CACHE_TTL_SECONDS)
+
+_INSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def resolve_categories(db: Session, names: Iterable[str]) -> List[Category]:
+    """
+    Devuelve las categorías de `names` (en el orden recibido y sin repetidas),
+    creando las que falten dentro de la transacción en curso, sin hacer commit.
+    Las conocidas salen de la caché; el resto se busca con un único IN y las
+    que no existen se insertan en bloque ignorando las que otra petición haya
+    creado a la vez.
+    """
+    wanted: Dict[str, str] = {}
+    for name in names:
+        name = " ".join(name.split())
+        if name:
+            wanted.setdefault(normalize_category_name(name), name)
+    if not wanted:
+        return []
+
+    found: Dict[str, tuple] = {}
+    for key in wanted:
+        cached = category_cache.get(key)
+        if cached is not None:
+            found[key] = cached
+
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        found.update(_fetch(db, missing))
+        to_create = [key for key in missing if key not in found]
+        if to_create:
+            _insert_missing(db, [{"name": wanted[key], "normalized_name": key} for key in to_create])
+            created = _fetch(db, to_create)
+            found.update(created)
+            # Las recién creadas se cachean recién cuando la transacción se confirma
+            db.info.setdefault("created_categories", {}).update(created)
+        for key in missing:
+            if key in found and key not in to_create:
+                category_cache.set(key, found[key])
+
+    return [_attach(db, *found[key]) for key in wanted]
+
+
+def _attach(db: Session, category_id: int, name: str) -> Category:
+    """Vincula a la sesión una categoría ya persistida sin volver a consultarla."""
+    category = Category(id=category_id, name=name)
+    make_transient_to_detached(category)
+    return db.merge(category, load=False)
+
+
+def _fetch(db: Session, keys: List[str]) -> Dict[str, tuple]:
+    # La migración 0002 completó normalized_name en las categorías anteriores
+    rows = db.query(Category.id, Category.name).filter(Category.normalized_name.in_(keys))
+    return {normalize_category_name(row.name): (row.id, row.name) for row in rows}
+
+
+def _insert_missing(db: Session, rows: List[dict]) -> None:
+    # Se vuelcan antes los cambios pendientes para no insertar dos veces lo mismo
+    db.flush()
+    dialect_insert = _INSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        # ON CONFLICT DO NOTHING: si otra petición creó la misma categoría, se usa ésa
+        db.execute(dialect_insert(Category).values(rows).on_conflict_do_nothing())
+    else:
+        db.execute(insert(Category), rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_created_categories(session):
+    for key, value in session.info.pop("created_categories", {}).items():
+        category_cache.set(key, value)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_created_categories(session):
+    session.info.pop("created_categories", None)
+
+
+@event.listens_for(Category, "after_update")
+def _forget_renamed_category(mapper, connection, target):
+    # after_update también se dispara cuando sólo cambió la colección de libros
+    if inspect(target).attrs.name.history.has_changes():
+        category_cache.clear()
+
+
+@event.listens_for(Category, "after_delete")
+def _forget_deleted_category(mapper, connection, target):
+    category_cache.clear()
@@ -0,0 +1,275 @@
+# app/chat_manager.py
+import asyncio
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from dotenv import load_dotenv
+from fastapi import WebSocket
+
+from app import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# URL del broker de pub/sub compartido entre workers (p. ej. redis://localhost:6379/0).
+# Si no está definida, los mensajes sólo se entregan dentro del proceso actual.
+CHAT_BROKER_URL = os.getenv("CHAT_BROKER_URL")
+
+Deliver = Callable[[int, Dict[str, Any]], Awaitable[int]]
+
+DELIVERIES = metrics.Counter("chat_deliveries", "Eventos entregados a un WebSocket, por tipo.", ("type",))
+DELIVERY_FAILURES = metrics.Counter("chat_delivery_failures", "Eventos que no se pudieron entregar a un WebSocket.")
+
+
+class ConnectionRegistry:
+    """Sockets abiertos en este proceso, varios por usuario (una pestaña = un socket)."""
+
+    def __init__(self):
+        self._sockets: Dict[int, Set[WebSocket]] = defaultdict(set)
+
+    def add(self, user_id: int, websocket: WebSocket) -> bool:
+        """Registra un socket. Devuelve True si es el primero del usuario en este proceso."""
+        sockets = self._sockets[user_id]
+        sockets.add(websocket)
+        return len(sockets) == 1
+
+    def remove(self, user_id: int, websocket: WebSocket) -> bool:
+        """Quita un socket. Devuelve True si era el último del usuario en este proceso."""
+        sockets = self._sockets.get(user_id)
+        if not sockets or websocket not in sockets:
+            return False
+        sockets.discard(websocket)
+        if sockets:
+            return False
+        del self._sockets[user_id]
+        return True
+
+    def is_connected(self, user_id: int) -> bool:
+        return user_id in self._sockets
+
+    def count(self) -> int:
+        return sum(len(sockets) for sockets in self._sockets.values())
+
+    def user_count(self) -> int:
+        return len(self._sockets)
+
+    async def send(self, user_id: int, payload: Dict[str, Any]) -> int:
+        """Envía `payload` a todos los sockets locales del usuario. Devuelve cuántos lo recibieron."""
+        delivered = 0
+        for websocket in list(self._sockets.get(user_id, ())):
+            try:
+                await websocket.send_json(payload)
+                delivered += 1
+            except Exception as e:
+                # El socket se está cerrando: su handler lo quitará del registro
+                logger.warning(f"No se pudo entregar al usuario {user_id}: {e}")
+                DELIVERY_FAILURES.inc()
+        if delivered:
+            DELIVERIES.inc(payload.get("type", "message"), amount=delivered)
+        return delivered
+
+
+class Broker(ABC):
+    """
+    Distribuye mensajes dirigidos a un usuario hacia el proceso donde está conectado.
+    `deliver` entrega un mensaje a los sockets locales del usuario.
+    """
+
+    def __init__(self, deliver: Deliver):
+        self._deliver = deliver
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Abre las conexiones del backend al arrancar la aplicación."""
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Cierra las conexiones del backend al apagar la aplicación."""
+
+    @abstractmethod
+    async def subscribe(self, user_id: int) -> None:
+        """Empieza a recibir los mensajes de un usuario conectado a este worker."""
+
+    @abstractmethod
+    async def unsubscribe(self, user_id: int) -> None:
+        """Deja de recibir los mensajes de un usuario que ya no tiene sockets en este worker."""
+
+    @abstractmethod
+    async def publish(self, user_id: int, payload: Dict[str, Any]) -> None:
+        """Envía `payload` al worker (o los workers) donde está conectado el usuario."""
+
+
+class InProcessBroker(Broker):
+    """Entrega directa a los sockets del proceso. Sirve para un único worker."""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def subscribe(self, user_id: int) -> None:
+        pass
+
+    async def unsubscribe(self, user_id: int) -> None:
+        pass
+
+    async def publish(self, user_id: int, payload: Dict[str, Any]) -> None:
+        await self._deliver(user_id, payload)
+
+
+class RedisBroker(Broker):
+    """
+    Pub/sub sobre el protocolo de Redis con un canal por usuario. Cada worker se
+    suscribe sólo a los usuarios que tiene conectados, así un mensaje viaja
+    únicamente a los procesos que tienen sockets del destinatario.
+    """
+
+    CHANNEL_PREFIX = "chat:user:"
+    # Canal propio del worker: mantiene la conexión de pub/sub abierta aunque no haya usuarios
+    CONTROL_CHANNEL = "chat:control"
+    # Espera entre reintentos cuando se cae la conexión de pub/sub (se duplica hasta el máximo)
+    RECONNECT_MIN_SECONDS = 0.5
+    RECONNECT_MAX_SECONDS = 30
+
+    def __init__(self, url: str, deliver: Deliver):
+        import redis.asyncio as redis
+
+        super().__init__(deliver)
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._listener: Optional[asyncio.Task] = None
+        # Canales de los usuarios conectados a este worker, para volver a suscribirse tras una caída
+        self._channels: Set[str] = set()
+        self._connection_errors = (redis.ConnectionError, redis.TimeoutError, OSError)
+
+    def _channel(self, user_id: int) -> str:
+        return f"{self.CHANNEL_PREFIX}{user_id}"
+
+    async def start(self) -> None:
+        await self._pubsub.subscribe(self.CONTROL_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+        self._listener.add_done_callback(self._listener_done)
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+    async def subscribe(self, user_id: int) -> None:
+        channel = self._channel(user_id)
+        self._channels.add(channel)
+        try:
+            await self._pubsub.subscribe(channel)
+        except self._connection_errors as e:
+            # El listener se vuelve a suscribir a todos los canales al reconectarse
+            logger.warning(f"No se pudo suscribir a {channel}, se reintenta al reconectar: {e}")
+
+    async def unsubscribe(self, user_id: int) -> None:
+        channel = self._channel(user_id)
+        self._channels.discard(channel)
+        try:
+            await self._pubsub.unsubscribe(channel)
+        except self._connection_errors as e:
+            logger.warning(f"No se pudo cancelar la suscripción a {channel}: {e}")
+
+    async def publish(self, user_id: int, payload: Dict[str, Any]) -> None:
+        await self._redis.publish(self._channel(user_id), json.dumps(payload))
+
+    async def _listen(self) -> None:
+        """Recibe los mensajes del pub/sub; si se cae la conexión, espera y se vuelve a suscribir."""
+        delay = self.RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    await self._dispatch(message)
+                logger.warning("La conexión de pub/sub del chat terminó sin suscripciones, se reabre")
+            except self._connection_errors as e:
+                logger.error(f"Se perdió la conexión de pub/sub del chat, se reintenta en {delay:g} s: {e}")
+            await asyncio.sleep(delay)
+            if await self._resubscribe():
+                delay = self.RECONNECT_MIN_SECONDS
+            else:
+                delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+
+    async def _resubscribe(self) -> bool:
+        """Reemplaza la conexión de pub/sub y se suscribe al canal de control y al de cada usuario conectado."""
+        try:
+            await self._pubsub.aclose()
+        except Exception:
+            pass
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await self._pubsub.subscribe(self.CONTROL_CHANNEL, *self._channels)
+            logger.info(f"Pub/sub del chat reconectado ({len(self._channels)} usuarios)")
+            return True
+        except self._connection_errors as e:
+            # listen() sin suscripciones termina enseguida y se vuelve a intentar
+            logger.error(f"No se pudo volver a suscribir el pub/sub del chat: {e}")
+            return False
+
+    async def _dispatch(self, message: Dict[str, Any]) -> None:
+        if message.get("type") != "message":
+            return
+        channel = message["channel"].decode()
+        if not channel.startswith(self.CHANNEL_PREFIX):
+            return
+        try:
+            await self._deliver(int(channel[len(self.CHANNEL_PREFIX):]), json.loads(message["data"]))
+        except Exception as e:
+            logger.error(f"Error al entregar un mensaje del broker: {e}")
+
+    def _listener_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"El listener de pub/sub del chat terminó inesperadamente: {task.exception()!r}")
+
+
+def create_broker(url: Optional[str], deliver: Deliver) -> Broker:
+    """Elige el backend según la URL: redis://, rediss:// o unix:// usan Redis, si no, el proceso local."""
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url, deliver)
+    return InProcessBroker(deliver)
+
+
+connections = ConnectionRegistry()
+broker = create_broker(CHAT_BROKER_URL, connections.send)
+
+metrics.Gauge("websocket_connections", "WebSockets de chat abiertos en este proceso.",
+              collect=lambda: [((), connections.count())])
+metrics.Gauge("websocket_users", "Usuarios con al menos un WebSocket de chat en este proceso.",
+              collect=lambda: [((), connections.user_count())])
+
+
+async def start() -> None:
+    await broker.start()
+
+
+async def stop() -> None:
+    await broker.stop()
+
+
+async def connect(user_id: int, websocket: WebSocket) -> None:
+    """Registra el socket y, si es el primero del usuario en este worker, se suscribe a su canal."""
+    if connections.add(user_id, websocket):
+        await broker.subscribe(user_id)
+
+
+async def disconnect(user_id: int, websocket: WebSocket) -> None:
+    """Quita el socket y cancela la suscripción si el usuario ya no tiene sockets en este worker."""
+    if connections.remove(user_id, websocket):
+        await broker.unsubscribe(user_id)
+
+
+async def send_to_user(user_id: int, payload: Dict[str, Any]) -> None:
+    """Entrega `payload` a todas las conexiones del usuario, en cualquier worker."""
+    await broker.publish(user_id, payload)
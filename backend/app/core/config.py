@@ -1,9 +1,35 @@
 # app/core/config.py
-from pydantic import BaseSettings
+from typing import List
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+load_dotenv()
+
+
 class Settings(BaseSettings):
+    """Configuración de la base de datos, leída de variables de entorno (o del .env)."""
+
+    model_config = SettingsConfigDict(extra="ignore")
+
     DATABASE_URL: str
+    # Réplicas de lectura separadas por comas; sin réplicas todo va al primario
+    DATABASE_REPLICA_URLS: str = ""
+
+    # Pool de cada engine (los valores por defecto son los de SQLAlchemy)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_RECYCLE: int = -1
+    # Tiempo máximo por sentencia en PostgreSQL (0 = sin límite)
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # Después de escribir, el mismo cliente lee del primario durante este tiempo
+    DB_READ_AFTER_WRITE_SECONDS: float = 5
+
+    @property
+    def replica_urls(self) -> List[str]:
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
 
-    class Config:
-        env_file = ".env"  # Cargar variables desde .env
 
 settings = Settings()
@@ -1,23 +1,314 @@
 # app/database.py
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from typing import Optional
+
+from fastapi.requests import HTTPConnection
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app import metrics
+from app.cache import TTLCache
+from app.core.config import settings
+
+DATABASE_URL = settings.DATABASE_URL
+
+
+# --- Pools con medición de esperas ---
+
+class PoolStats:
+    """Checkouts del pool y cuánto esperaron por una conexión, para dimensionarlo bajo carga."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+
+    def record(self, elapsed: float, checked_out: int, timed_out: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += elapsed
+            self.wait_max = max(self.wait_max, elapsed)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                "max_wait_ms": self.wait_max * 1000,
+                "peak_checked_out": self.peak_checked_out,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra en `stats` cuánto tarda cada checkout en obtener una conexión."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # dispose() e invalidaciones reemplazan el pool: las estadísticas se conservan
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - start, self.checkedout(), timed_out)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool con la cola compatible con asyncio de los engines asíncronos."""
+
+
+# Como los pools de SQLAlchemy, no registran cada dispose/recreate con el nivel INFO de la aplicación
+for _pool_class in (TimedQueuePool, TimedAsyncQueuePool):
+    logging.getLogger(f"{__name__}.{_pool_class.__name__}").setLevel(logging.WARNING)
+
 
-load_dotenv()
+# Driver asíncrono de cada motor: asyncpg en PostgreSQL, aiosqlite para correr en local
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+def async_url(url: str) -> URL:
+    """La misma URL de base de datos, con el driver asíncrono del motor."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No hay driver asíncrono configurado para {backend}.")
+    parsed = parsed.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}")
+    if backend == "postgresql":
+        # asyncpg siempre usa UTF-8 y rechaza client_encoding como parámetro de conexión
+        parsed = parsed.difference_update_query(["client_encoding"])
+    return parsed
+
+
+def _create_engine(url: str, asynchronous: bool = False):
+    parsed = async_url(url) if asynchronous else make_url(url)
+    factory = create_async_engine if asynchronous else create_engine
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # Una base SQLite en memoria vive en una sola conexión: se deja el pool del dialecto
+        # (y la capa asíncrona ve otra base, distinta de la del engine síncrono)
+        return factory(parsed, **options)
+    if parsed.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = settings.DB_STATEMENT_TIMEOUT_MS
+        options["connect_args"] = (
+            {"server_settings": {"statement_timeout": str(timeout)}} if asynchronous
+            else {"options": f"-c statement_timeout={timeout}"}
+        )
+    return factory(
+        parsed,
+        poolclass=TimedAsyncQueuePool if asynchronous else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        **options,
+    )
+
+
+engine = _create_engine(DATABASE_URL)
+replica_engines = [_create_engine(url) for url in settings.replica_urls]
+
+# Los mismos servidores para las rutas `async def` (ver "Capa asíncrona" más abajo)
+async_engine = _create_engine(DATABASE_URL, asynchronous=True)
+async_replica_engines = [_create_engine(url, asynchronous=True) for url in settings.replica_urls]
+
+engines = {
+    "primary": engine,
+    **{f"replica-{i}": e for i, e in enumerate(replica_engines, start=1)},
+    "primary-async": async_engine.sync_engine,
+    **{f"replica-{i}-async": e.sync_engine for i, e in enumerate(async_replica_engines, start=1)},
+}
+
+# Las lecturas rotan entre las réplicas; sin réplicas van al primario
+_read_engines = itertools.cycle(replica_engines or [engine])
+_async_read_engines = itertools.cycle(async_replica_engines or [async_engine])
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sin expirar al confirmar: en una sesión asíncrona no se puede recargar un atributo de forma implícita
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
 
 Base = declarative_base()
 
-def get_db():
+
+def read_session(primary: bool = False) -> Session:
+    """Sesión de sólo lectura contra la siguiente réplica (o contra el primario)."""
+    db = SessionLocal(bind=engine if primary else next(_read_engines))
+    db.info["read_only"] = True
+    return db
+
+
+def async_read_session(primary: bool = False) -> AsyncSession:
+    """Como read_session, para las rutas asíncronas."""
+    db = AsyncSessionLocal(bind=async_engine if primary else next(_async_read_engines))
+    db.info["read_only"] = True
+    return db
+
+
+async def dispose_async_engines() -> None:
+    """Cierra las conexiones de los engines asíncronos (al apagar la aplicación)."""
+    for e in (async_engine, *async_replica_engines):
+        await e.dispose()
+
+
+def _timed_pools():
+    for name, e in engines.items():
+        if isinstance(e.pool, TimedQueuePool):
+            yield name, e.pool
+
+
+def _pool_metric(cls, name: str, documentation: str, value):
+    cls(name, documentation, ("engine",), collect=lambda: [((engine_name,), value(pool)) for engine_name, pool in _timed_pools()])
+
+
+_pool_metric(metrics.Gauge, "db_pool_size", "Conexiones permanentes del pool.", lambda pool: pool.size())
+_pool_metric(metrics.Gauge, "db_pool_checked_out", "Conexiones del pool en uso.", lambda pool: pool.checkedout())
+_pool_metric(metrics.Gauge, "db_pool_overflow", "Conexiones abiertas por encima del tamaño del pool.",
+             lambda pool: max(pool.overflow(), 0))
+_pool_metric(metrics.Counter, "db_pool_checkouts", "Conexiones pedidas al pool.", lambda pool: pool.stats.checkouts)
+_pool_metric(metrics.Counter, "db_pool_checkout_wait_seconds", "Tiempo total esperando una conexión del pool.",
+             lambda pool: pool.stats.wait_total)
+_pool_metric(metrics.Counter, "db_pool_checkout_timeouts", "Pedidos al pool que agotaron DB_POOL_TIMEOUT.",
+             lambda pool: pool.stats.timeouts)
+
+
+def pool_stats() -> dict:
+    """Tamaño, uso y esperas del pool de cada engine."""
+    result = {}
+    for name, e in engines.items():
+        pool = e.pool
+        if not isinstance(pool, TimedQueuePool):
+            result[name] = {"pool": type(pool).__name__}
+            continue
+        capacity = pool.size() + max(settings.DB_MAX_OVERFLOW, 0)
+        result[name] = {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "utilization": pool.checkedout() / capacity if capacity else 0.0,
+            **pool.stats.snapshot(),
+        }
+    return result
+
+
+# --- Leer las propias escrituras ---
+# Tras un commit con cambios, el cliente (su token, o su dirección si no envía
+# uno) lee del primario durante DB_READ_AFTER_WRITE_SECONDS, hasta que las
+# réplicas lo alcancen. El registro es por proceso: con varios workers, una
+# lectura atendida por otro worker puede ver la réplica todavía atrasada.
+recent_writers = TTLCache(maxsize=10000, ttl=settings.DB_READ_AFTER_WRITE_SECONDS)
+
+
+def _client_key(connection: HTTPConnection) -> Optional[str]:
+    authorization = connection.headers.get("authorization")
+    if authorization:
+        return authorization
+    return connection.client.host if connection.client else None
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        if orm_execute_state.session.info.get("read_only"):
+            raise RuntimeError("La sesión de lectura no admite escrituras: usa get_db.")
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_read_only_flush(session, flush_context, instances):
+    if session.info.get("read_only"):
+        raise RuntimeError("La sesión de lectura no admite escrituras: usa get_db.")
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session):
+    key = session.info.get("client_key")
+    if session.info.pop("wrote", False) and key is not None:
+        recent_writers.set(key, True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
+
+
+def get_db(connection: HTTPConnection):
+    """Sesión contra el primario, para las rutas que escriben."""
     db = SessionLocal()
+    db.info["client_key"] = _client_key(connection)
     try:
         yield db
     finally:
         db.close()
+
+
+def _reads_from_primary(connection: HTTPConnection) -> bool:
+    sticky = bool(replica_engines) and recent_writers.get(_client_key(connection)) is not None
+    connection.state.read_your_writes = sticky
+    return sticky
+
+
+def get_read_db(connection: HTTPConnection):
+    """
+    Sesión de sólo lectura para las rutas GET. Usa una réplica, salvo que el
+    cliente haya escrito hace poco: entonces lee del primario para ver sus cambios.
+    """
+    db = read_session(primary=_reads_from_primary(connection))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# --- Capa asíncrona ---
+# Las rutas `async def` usan AsyncSession: mientras esperan a la base no ocupan
+# un hilo del threadpool. Comparten con la capa síncrona la configuración del
+# pool, el ruteo a réplicas y los eventos de Session (guarda de sólo lectura,
+# leer las propias escrituras, invalidación de cachés). Las relaciones no se
+# cargan de forma perezosa: hay que pedirlas con selectinload en la consulta.
+
+async def get_async_db(connection: HTTPConnection):
+    """Como get_db, con una AsyncSession contra el primario."""
+    db = AsyncSessionLocal()
+    db.info["client_key"] = _client_key(connection)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_async_read_db(connection: HTTPConnection):
+    """Como get_read_db, con una AsyncSession de sólo lectura."""
+    db = async_read_session(primary=_reads_from_primary(connection))
+    try:
+        yield db
+    finally:
+        await db.close()
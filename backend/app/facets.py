@@ -0,0 +1,235 @@
+# app/facets.py
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import String, cast, event, func, inspect, insert, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import Book, BookFacetCount, Category
+from app.models.book import books_categories
+
+# Facetas expuestas por GET /books/facets, en el orden de la respuesta
+FACETS = ("categories", "idioma", "estado", "publication_decade")
+
+# Cuántos valores se devuelven por faceta (los más frecuentes)
+MAX_FACET_VALUES = 50
+
+
+# --- Filtros del listado ---
+
+def book_filter_clauses(
+    title: Optional[str] = None,
+    author: Optional[str] = None,
+    publication_date=None,
+    editorial: Optional[str] = None,
+    edicion: Optional[str] = None,
+    category: Optional[str] = None,
+    tags: Optional[str] = None,
+    idioma: Optional[str] = None,
+    estado: Optional[str] = None,
+) -> Dict[str, object]:
+    """Condiciones de GET /books/ por nombre de filtro; el listado y las facetas usan las mismas."""
+    clauses = {}
+    if title:
+        clauses["title"] = Book.title.ilike(f"%{title}%")
+    if author:
+        clauses["author"] = Book.author.ilike(f"%{author}%")
+    if publication_date:
+        clauses["publication_date"] = Book.publication_date == publication_date
+    if editorial:
+        clauses["editorial"] = Book.editorial.ilike(f"%{editorial}%")
+    if edicion:
+        clauses["edicion"] = Book.edicion.ilike(f"%{edicion}%")
+    if category:
+        # EXISTS para no duplicar libros con varias categorías coincidentes
+        clauses["category"] = Book.categories.any(Category.name.ilike(f"%{category}%"))
+    if tags:
+        clauses["tags"] = Book.tags.ilike(f"%{tags}%")
+    if idioma:
+        clauses["idioma"] = Book.idioma.ilike(f"%{idioma}%")
+    if estado:
+        clauses["estado"] = Book.estado.ilike(f"%{estado}%")
+    return clauses
+
+
+# Filtro que corresponde a cada faceta: al contar una faceta se ignora su propio
+# filtro, para que el usuario vea cuántos libros tendría cada opción alternativa.
+_OWN_FILTER = {"categories": "category", "idioma": "idioma", "estado": "estado", "publication_decade": "publication_date"}
+
+
+def _decade(year: Optional[int]) -> Optional[str]:
+    return str(year // 10 * 10) if year is not None else None
+
+
+_DECADE_SQL = (Book.publication_date // 10) * 10
+
+
+# --- Conteos ---
+
+def _grouped_queries(clauses: Dict[str, object]):
+    """Una consulta agrupada por faceta, todas unidas en un único viaje a la base."""
+    queries = []
+    for facet in FACETS:
+        where = [clause for name, clause in clauses.items() if name != _OWN_FILTER[facet]]
+        if facet == "categories":
+            value = Category.name
+            query = (
+                select(literal(facet).label("facet"), value.label("value"), func.count().label("count"))
+                .select_from(books_categories)
+                .join(Category, Category.id == books_categories.c.category_id)
+                .join(Book, Book.id == books_categories.c.book_id)
+            )
+        else:
+            column = _DECADE_SQL if facet == "publication_decade" else getattr(Book, facet)
+            value = cast(column, String)
+            query = select(literal(facet).label("facet"), value.label("value"), func.count().label("count")).select_from(Book)
+            where.append(column.isnot(None))
+        queries.append(query.where(*where).group_by(value))
+    return union_all(*queries)
+
+
+def facet_counts(db: Session, clauses: Dict[str, object]) -> Dict[str, List[dict]]:
+    """
+    Conteos por faceta para el conjunto de filtros `clauses`. Sin filtros se leen
+    de la tabla precalculada book_facet_counts en lugar de agrupar todo el catálogo.
+    """
+    if clauses:
+        rows = db.execute(_grouped_queries(clauses)).all()
+    else:
+        rows = db.execute(
+            select(BookFacetCount.facet, BookFacetCount.value, BookFacetCount.count).where(BookFacetCount.count > 0)
+        ).all()
+
+    result: Dict[str, List[dict]] = {facet: [] for facet in FACETS}
+    for facet, value, count in rows:
+        if facet in result:
+            result[facet].append({"value": str(value), "count": count})
+    for facet, values in result.items():
+        values.sort(key=lambda item: (-item["count"], item["value"]))
+        del values[MAX_FACET_VALUES:]
+    return result
+
+
+# --- Mantenimiento incremental de book_facet_counts ---
+
+# Atributos del libro que alimentan facetas escalares, con la conversión a valor de faceta
+_SCALAR_FACETS = (
+    ("idioma", "idioma", None),
+    ("estado", "estado", None),
+    ("publication_decade", "publication_date", _decade),
+)
+
+
+def _add_values(values: Counter, facet: str, raw_values: Iterable, convert=None, sign: int = 1) -> None:
+    for value in raw_values:
+        value = convert(value) if convert else value
+        if value is not None:
+            values[(facet, value)] += sign
+
+
+def _current_values(book: Book, sign: int) -> Counter:
+    """Valores de faceta actuales de un libro (se cargan si estaban expirados)."""
+    values = Counter()
+    for facet, attr, convert in _SCALAR_FACETS:
+        _add_values(values, facet, [getattr(book, attr)], convert, sign)
+    _add_values(values, "categories", dict.fromkeys(c.name for c in book.categories), sign=sign)
+    return values
+
+
+def _changed_values(book: Book) -> Counter:
+    """Diferencia entre los valores nuevos y los anteriores de un libro modificado."""
+    state = inspect(book)
+    values = Counter()
+    for facet, attr, convert in _SCALAR_FACETS + (("categories", "categories", lambda c: c.name),):
+        history = state.attrs[attr].history
+        if history.has_changes():
+            _add_values(values, facet, history.added, convert, 1)
+            _add_values(values, facet, history.deleted, convert, -1)
+    return values
+
+
+def _collect_deltas(session: Session) -> Counter:
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Book):
+            deltas.update(_current_values(obj, 1))
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            deltas.update(_current_values(obj, -1))
+    for obj in session.dirty:
+        if isinstance(obj, Book):
+            deltas.update(_changed_values(obj))
+    return Counter({key: delta for key, delta in deltas.items() if delta})
+
+
+# Con un listener "set" con active_history, SQLAlchemy carga el valor anterior de
+# estos atributos aunque estuvieran expirados, así el delta puede restarlo.
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+for _attr in ("idioma", "estado", "publication_date"):
+    event.listen(getattr(Book, _attr), "set", _keep_previous_value, active_history=True, retval=True)
+
+
+@event.listens_for(Session, "before_flush")
+def _remember_facet_deltas(session, flush_context, instances):
+    # Se calcula antes del flush, cuando todavía se conocen los valores anteriores
+    with session.no_autoflush:
+        deltas = _collect_deltas(session)
+    if deltas:
+        session.info.setdefault("facet_deltas", Counter()).update(deltas)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_facet_deltas(session, flush_context):
+    deltas = session.info.pop("facet_deltas", None)
+    if deltas:
+        apply_deltas(session, deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_facet_deltas(session):
+    session.info.pop("facet_deltas", None)
+
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def apply_deltas(session: Session, deltas: Dict[tuple, int]) -> None:
+    """Suma los deltas a book_facet_counts dentro de la transacción del flush."""
+    # Orden fijo de claves para que dos transacciones no se bloqueen en orden cruzado
+    rows = [{"facet": facet, "value": value, "count": delta} for (facet, value), delta in sorted(deltas.items())]
+    dialect_insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(BookFacetCount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BookFacetCount.facet, BookFacetCount.value],
+            set_={"count": BookFacetCount.count + stmt.excluded["count"]},
+        )
+        session.execute(stmt, rows)
+        return
+    table = BookFacetCount.__table__
+    for row in rows:
+        updated = session.execute(
+            table.update()
+            .where(table.c.facet == row["facet"], table.c.value == row["value"])
+            .values(count=table.c.count + row["count"])
+        )
+        if not updated.rowcount:
+            session.execute(insert(table), [row])
+
+
+def rebuild_facet_counts(db: Session) -> None:
+    """Recalcula book_facet_counts desde cero (p. ej. tras cargar libros sin pasar por el ORM)."""
+    db.execute(BookFacetCount.__table__.delete())
+    db.execute(insert(BookFacetCount).from_select(["facet", "value", "count"], _grouped_queries({})))
+    db.commit()
+
+
+@event.listens_for(BookFacetCount.__table__, "after_create")
+def _fill_new_rollup(target, connection, **kw):
+    # Si la tabla se crea sobre un catálogo existente, se llena con los conteos actuales
+    if inspect(connection).has_table(Book.__tablename__):
+        connection.execute(insert(BookFacetCount).from_select(["facet", "value", "count"], _grouped_queries({})))
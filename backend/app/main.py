@@ -1,22 +1,25 @@
 # app/main.py
+import asyncio
 import logging
-from fastapi.staticfiles import StaticFiles
 import os
 
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import users, books, messages, conversations
-from app.database import engine, Base
+from app.routers import users, books, exchanges, messages, conversations
+from app import chat_manager, database, media, metrics, message_writer, password_hashing, presence, read_receipts, response_cache, socket_manager, sql_profiler
 import socketio
 from app.socket_manager import sio
 
-Base.metadata.create_all(bind=engine)
+# El esquema lo administra Alembic: `alembic upgrade head` antes de arrancar (ver README)
 
 app = FastAPI()
 socket_app = socketio.ASGIApp(sio, app)
 
+# Las subidas de imágenes demasiado grandes se cortan antes de leer el formulario
+app.add_middleware(media.UploadLimitMiddleware)
+
 # Configuración de CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,11 +33,13 @@ app.add_middleware(
 os.makedirs("static/images", exist_ok=True)
 
 # Montar archivos estáticos
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# (imágenes por contenido con caché inmutable, ETag, 304 y rangos)
+app.mount("/static", media.MediaFiles(directory="static"), name="static")
 
 
 app.include_router(users.router)
 app.include_router(books.router)
+app.include_router(exchanges.router)
 app.include_router(messages.router)
 app.include_router(conversations.router)
 
@@ -44,12 +49,31 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
+    await chat_manager.start()
+    message_writer.writer.start()
+    await asyncio.get_running_loop().run_in_executor(None, password_hashing.hasher.start)
     logger.info("Aplicación iniciada")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await message_writer.writer.stop()
+    await read_receipts.writer.stop()
+    await presence.tracker.stop()
+    await chat_manager.stop()
+    await database.dispose_async_engines()
+    password_hashing.hasher.shutdown()
     logger.info("Aplicación apagada")
 
+# Aciertos, fallos y latencia media de la caché de respuestas, para ajustar TTL y tamaño
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.get_stats()
+
+# Uso y esperas de los pools del primario y las réplicas, para dimensionarlos bajo carga
+@app.get("/db/pool-stats")
+def db_pool_stats():
+    return database.pool_stats()
+
 @app.middleware("http")
 async def error_handling_middleware(request: Request, call_next):
     try:
@@ -67,16 +91,46 @@ async def error_handling_middleware(request: Request, call_next):
             content={"detail": "Error interno del servidor."},
         )
 
+# Con SQL_PROFILER=1: X-DB-Query-Count y X-DB-Time en cada respuesta, avisos de N+1
+# y log de consultas lentas (ver app/sql_profiler.py)
+if sql_profiler.SQL_PROFILER:
+    app.add_middleware(sql_profiler.SqlProfilerMiddleware)
+
+# Medición de cada petición HTTP (duración por ruta y estado, consultas SQL);
+# se agrega al final para que envuelva también a los demás middlewares
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+SOCKETIO_CONNECTIONS = metrics.Gauge("socketio_connections", "Conexiones de Socket.IO abiertas en este proceso.")
+
+# Socket.IO: presencia e indicadores de escritura (ver app/presence.py). La conexión
+# se autentica con el mismo JWT de la API, en `auth` ({"token": ...}) o en ?token=.
 @sio.on("connect")
-async def connect(sid, environ):
-    print("connect ", sid)
+async def connect(sid, environ, auth=None):
+    user_id = await socket_manager.authenticate(environ, auth)
+    if user_id is None:
+        raise socketio.exceptions.ConnectionRefusedError("No autorizado")
+    await presence.tracker.connect(sid, user_id)
+    # Después de registrarla: si connect falla, disconnect no la descuenta
+    SOCKETIO_CONNECTIONS.inc()
+    logger.debug(f"Socket.IO conectado: {sid} (usuario {user_id})")
 
 @sio.on("disconnect")
 async def disconnect(sid):
-    print("disconnect ", sid)
-
-@sio.on("message")
-async def message(sid, data):
-    print("message ", data)
-    await sio.emit("response", data, room=sid)
-
+    if sid in sio.sid_user_map:
+        SOCKETIO_CONNECTIONS.dec()
+        presence.tracker.disconnect(sid)
+    logger.debug(f"Socket.IO desconectado: {sid}")
+
+@sio.on("heartbeat")
+async def heartbeat(sid, data=None):
+    await presence.tracker.heartbeat(sid)
+
+@sio.on("typing")
+async def typing(sid, data):
+    # {"receiver_id": 7, "typing": true}; el cliente puede enviarlo en cada tecla
+    if isinstance(data, dict) and isinstance(data.get("receiver_id"), int):
+        await presence.tracker.typing(sid, data["receiver_id"], bool(data.get("typing", True)))
@@ -0,0 +1,205 @@
+# app/matching.py
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import and_, case, delete, event, func, insert, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased, selectinload
+
+from app import pagination
+from app.models import Book, BookMatchKey, Category, ExchangeEdge, User, WishlistItem
+from app.models.book import books_categories
+from app.search import tokenize
+
+WISH_KINDS = ("title", "author", "category")
+
+
+def match_key(kind: str, value: Optional[str]) -> Optional[str]:
+    """Clave normalizada de un deseo o de un atributo de libro: "author:garcia marquez"."""
+    terms = tokenize(value or "")
+    return f"{kind}:{' '.join(terms)}" if terms else None
+
+
+def keys_for(title: Optional[str], author: Optional[str], category_names: Iterable[str]) -> Set[str]:
+    """Claves por las que un libro puede satisfacer un deseo: título, autor y cada categoría."""
+    keys = {match_key("title", title), match_key("author", author)}
+    keys.update(match_key("category", name) for name in category_names)
+    keys.discard(None)
+    return keys
+
+
+def book_keys(book: Book) -> Set[str]:
+    return keys_for(book.title, book.author, (category.name for category in book.categories))
+
+
+# --- Aristas dirigidas dueño -> interesado ---
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _add_edges(session: Session, deltas) -> None:
+    """Suma a exchange_edges las filas (owner_id, wisher_id, strength) del SELECT `deltas`."""
+    columns = ["owner_id", "wisher_id", "strength"]
+    dialect_insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(ExchangeEdge).from_select(columns, deltas)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[ExchangeEdge.owner_id, ExchangeEdge.wisher_id],
+            set_={"strength": ExchangeEdge.strength + stmt.excluded.strength},
+        ))
+        return
+    table = ExchangeEdge.__table__
+    for owner_id, wisher_id, strength in session.execute(deltas).all():
+        updated = session.execute(
+            table.update()
+            .where(table.c.owner_id == owner_id, table.c.wisher_id == wisher_id)
+            .values(strength=table.c.strength + strength)
+        )
+        if not updated.rowcount:
+            session.execute(insert(table).values(owner_id=owner_id, wisher_id=wisher_id, strength=strength))
+
+
+def _offer_changed(session: Session, owner_id: int, keys: Iterable[str], sign: int) -> None:
+    """El dueño agregó (sign=1) o quitó (sign=-1) libros con estas claves: se actualizan sus interesados."""
+    keys = list(keys)
+    if not keys:
+        return
+    _add_edges(session, (
+        select(literal(owner_id), WishlistItem.user_id, func.count() * sign)
+        .where(WishlistItem.key.in_(keys), WishlistItem.user_id != owner_id)
+        .group_by(WishlistItem.user_id)
+    ))
+    if sign < 0:
+        session.execute(delete(ExchangeEdge).where(ExchangeEdge.owner_id == owner_id, ExchangeEdge.strength <= 0))
+
+
+def _wish_changed(session: Session, wisher_id: int, key: str, sign: int) -> None:
+    """El usuario empezó (sign=1) o dejó (sign=-1) de buscar `key`: se actualizan los dueños."""
+    _add_edges(session, (
+        select(BookMatchKey.user_id, literal(wisher_id), func.count() * sign)
+        .where(BookMatchKey.key == key, BookMatchKey.user_id != wisher_id)
+        .group_by(BookMatchKey.user_id)
+    ))
+    if sign < 0:
+        session.execute(delete(ExchangeEdge).where(ExchangeEdge.wisher_id == wisher_id, ExchangeEdge.strength <= 0))
+
+
+# --- Mantenimiento incremental en cada flush ---
+
+_BOOK_MATCH_ATTRS = ("title", "author", "categories")
+
+
+def _sync_book(session: Session, book: Book, deleted: bool) -> None:
+    """Compara las claves guardadas del libro con las actuales y aplica sólo la diferencia."""
+    old = set(session.execute(select(BookMatchKey.key).where(BookMatchKey.book_id == book.id)).scalars())
+    new = set() if deleted else book_keys(book)
+    removed, added = old - new, new - old
+    if removed:
+        session.execute(delete(BookMatchKey).where(BookMatchKey.book_id == book.id, BookMatchKey.key.in_(removed)))
+        _offer_changed(session, book.user_id, removed, -1)
+    if added:
+        session.execute(insert(BookMatchKey), [{"key": key, "book_id": book.id, "user_id": book.user_id} for key in added])
+        _offer_changed(session, book.user_id, added, 1)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_match_index(session, flush_context):
+    # Primero los deseos y después los libros: así un par (libro, deseo) creado o
+    # borrado en el mismo flush se cuenta una sola vez.
+    wishes = [(obj, 1) for obj in session.new if isinstance(obj, WishlistItem)]
+    wishes += [(obj, -1) for obj in session.deleted if isinstance(obj, WishlistItem)]
+    books = [(obj, False) for obj in session.new if isinstance(obj, Book)]
+    books += [(obj, True) for obj in session.deleted if isinstance(obj, Book)]
+    books += [
+        (obj, False) for obj in session.dirty
+        if isinstance(obj, Book) and any(inspect(obj).attrs[attr].history.has_changes() for attr in _BOOK_MATCH_ATTRS)
+    ]
+    if not wishes and not books:
+        return
+    with session.no_autoflush:
+        for wish, sign in wishes:
+            _wish_changed(session, wish.user_id, wish.key, sign)
+        for book, deleted in books:
+            _sync_book(session, book, deleted)
+
+
+def rebuild_match_index(db: Session, batch_size: int = 5000) -> None:
+    """Reconstruye book_match_keys y exchange_edges desde cero (p. ej. tras cargas masivas sin el ORM)."""
+    db.execute(delete(ExchangeEdge))
+    db.execute(delete(BookMatchKey))
+    books = db.execute(
+        select(Book.id, Book.title, Book.author, Book.user_id).execution_options(yield_per=batch_size)
+    )
+    for partition in books.partitions():
+        ids = [row.id for row in partition]
+        categories = {book_id: [] for book_id in ids}
+        for book_id, name in db.execute(
+            select(books_categories.c.book_id, Category.name)
+            .join(Category, Category.id == books_categories.c.category_id)
+            .where(books_categories.c.book_id.in_(ids))
+        ):
+            categories[book_id].append(name)
+        rows = [
+            {"key": key, "book_id": row.id, "user_id": row.user_id}
+            for row in partition for key in keys_for(row.title, row.author, categories[row.id])
+        ]
+        if rows:
+            db.execute(insert(BookMatchKey), rows)
+    db.execute(insert(ExchangeEdge).from_select(
+        ["owner_id", "wisher_id", "strength"],
+        select(BookMatchKey.user_id, WishlistItem.user_id, func.count())
+        .join(WishlistItem, WishlistItem.key == BookMatchKey.key)
+        .where(BookMatchKey.user_id != WishlistItem.user_id)
+        .group_by(BookMatchKey.user_id, WishlistItem.user_id),
+    ))
+    db.commit()
+
+
+# --- Consultas ---
+
+def matches_query(db: Session, user_id: int, cursor: Optional[str] = None):
+    """
+    Usuarios con match recíproco: tienen algo que `user_id` busca y buscan algo
+    que `user_id` tiene. Recorre sólo las aristas salientes del usuario (índice
+    por owner_id) y las cruza con las entrantes por clave primaria.
+    Ordena por el lado más débil del intercambio, de mayor a menor.
+    """
+    gives = aliased(ExchangeEdge)  # el usuario tiene algo que el otro busca
+    gets = aliased(ExchangeEdge)   # el otro tiene algo que el usuario busca
+    score = case((gives.strength < gets.strength, gives.strength), else_=gets.strength)
+    query = (
+        db.query(
+            User.id.label("user_id"),
+            User.username,
+            User.profile_picture_url,
+            gives.strength.label("gives"),
+            gets.strength.label("gets"),
+            score.label("score"),
+        )
+        .select_from(gives)
+        .join(gets, and_(gets.owner_id == gives.wisher_id, gets.wisher_id == user_id))
+        .join(User, User.id == gives.wisher_id)
+        .filter(gives.owner_id == user_id)
+    )
+    after = pagination.decode_cursor(cursor, score=int, id=int)
+    if after:
+        query = query.filter((score < after["score"]) | ((score == after["score"]) & (User.id > after["id"])))
+    return query.order_by(score.desc(), User.id)
+
+
+def matching_books(db: Session, owner_id: int, wisher_id: int, limit: int) -> List[Book]:
+    """Libros de `owner_id` que coinciden con algún deseo de `wisher_id`."""
+    book_ids = (
+        select(BookMatchKey.book_id)
+        .join(WishlistItem, and_(WishlistItem.key == BookMatchKey.key, WishlistItem.user_id == wisher_id))
+        .where(BookMatchKey.user_id == owner_id)
+        .distinct()
+    )
+    # Las categorías en una sola consulta para todos los libros (evita un N+1 al serializar)
+    return (
+        db.query(Book)
+        .options(selectinload(Book.categories))
+        .filter(Book.id.in_(book_ids))
+        .order_by(Book.id.desc())
+        .limit(limit)
+        .all()
+    )
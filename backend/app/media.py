@@ -0,0 +1,296 @@
+# app/media.py
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+from typing import Dict, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile, status
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo aceptado para una imagen subida y tamaño de cada bloque leído
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+# Cuerpo máximo de una petición de subida: la imagen más el margen del multipart
+MAX_UPLOAD_REQUEST_BYTES = MAX_UPLOAD_BYTES + CHUNK_SIZE
+
+# Rutas de subida de imágenes a las que se aplica UploadLimitMiddleware
+UPLOAD_ROUTES = [
+    ("POST", re.compile(r"^/books/\d+/image/?$")),
+    ("PUT", re.compile(r"^/books/\d+/upload-image$")),
+    ("PUT", re.compile(r"^/users/me/profile_picture$")),
+]
+
+STATIC_DIR = "static"
+BOOK_IMAGES_DIR = os.path.join(STATIC_DIR, "images")
+PROFILE_PICTURES_DIR = os.path.join(STATIC_DIR, "profile_pictures")
+
+# Tamaños derivados: nombre -> lado mayor en píxeles
+VARIANTS = {"thumbnail": 200, "medium": 600}
+VARIANT_FORMAT = "webp"
+
+# Formatos aceptados en las subidas (según lo que detecta Pillow) y su extensión
+IMAGE_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+
+class StoredImage(NamedTuple):
+    url: str
+    path: str
+    created: bool  # False si ya existía un archivo con el mismo contenido
+
+
+def _image_extension(path: str) -> str:
+    """
+    Abre el archivo con Pillow y devuelve la extensión de su formato real. Responde
+    400 si no es una imagen JPEG, PNG, WEBP o GIF válida: el nombre y el Content-Type
+    los elige el cliente y no sirven para decidir cómo se va a servir el archivo.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        image_format = None
+    if image_format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail="El archivo debe ser una imagen JPEG, PNG, WEBP o GIF.")
+    return IMAGE_FORMATS[image_format]
+
+
+def store_upload(file: UploadFile, directory: str) -> StoredImage:
+    """
+    Copia la imagen subida por bloques a `directory`, con el SHA-256 de su
+    contenido como nombre: dos subidas idénticas se guardan una sola vez. La
+    extensión sale del formato que detecta Pillow. Responde 400 si no es una imagen
+    de IMAGE_FORMATS y 413 si supera MAX_UPLOAD_BYTES.
+    """
+    if not (file.content_type or "").startswith("image/"):
+        raise HTTPException(status_code=400, detail="El archivo debe ser una imagen.")
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    written = 0
+    # Se escribe en un temporal del mismo directorio para poder renombrarlo de forma atómica
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := file.file.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise _too_large()
+                digest.update(chunk)
+                buffer.write(chunk)
+
+        filename = f"{digest.hexdigest()}{_image_extension(tmp_path)}"
+        path = os.path.join(directory, filename)
+        created = not os.path.exists(path)
+        if created:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return StoredImage(url="/" + path.replace(os.sep, "/"), path=path, created=created)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"La imagen supera el tamaño máximo de {round(MAX_UPLOAD_BYTES / (1024 * 1024), 1):g} MB.",
+    )
+
+
+class UploadLimitMiddleware:
+    """
+    Middleware ASGI que corta las subidas de imágenes que superan
+    MAX_UPLOAD_REQUEST_BYTES antes de que se procese el formulario: responde 413 de
+    entrada si Content-Length ya lo supera y, si no, cuenta los bytes a medida que
+    llegan y aborta la lectura al pasarse, sin terminar de recibir ni guardar el cuerpo.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = MAX_UPLOAD_REQUEST_BYTES if max_bytes is None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+            scope["method"] == method and pattern.match(scope["path"]) for method, pattern in UPLOAD_ROUTES
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            error = _too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI deja pasar las HTTPException del cuerpo: termina en un 413
+                    raise _too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _variant_path(path: str, variant: str) -> str:
+    return f"{os.path.splitext(path)[0]}.{variant}.{VARIANT_FORMAT}"
+
+
+def generate_variants(path: str) -> None:
+    """
+    Genera las versiones reducidas de una imagen guardada. Pensada para correr
+    como tarea en segundo plano, después de responder la subida.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        logger.warning("Pillow no está instalado: no se generan tamaños derivados.")
+        return
+
+    pending = {name: size for name, size in VARIANTS.items() if not os.path.exists(_variant_path(path, name))}
+    if not pending:
+        return
+    try:
+        with Image.open(path) as original:
+            original = ImageOps.exif_transpose(original)
+            for name, size in pending.items():
+                variant = original.copy()
+                variant.thumbnail((size, size))
+                target = _variant_path(path, name)
+                tmp_target = f"{target}.part"
+                variant.save(tmp_target, format=VARIANT_FORMAT)
+                os.replace(tmp_target, target)
+                _known_variants.add(target)
+    except Exception as e:
+        logger.error(f"No se pudieron generar los tamaños derivados de {path}: {e}")
+
+
+# Variantes que ya se sabe que existen, para no consultar el disco en cada respuesta
+_known_variants = set()
+
+
+def _variant_exists(path: str) -> bool:
+    if path in _known_variants:
+        return True
+    if os.path.exists(path):
+        _known_variants.add(path)
+        return True
+    return False
+
+
+def variant_urls(url: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    URLs de cada tamaño de una imagen guardada. Mientras un tamaño derivado no
+    esté generado (o en imágenes anteriores a este esquema) se usa la original.
+    """
+    if not url:
+        return None
+    urls = {"original": url}
+    if url.startswith(f"/{STATIC_DIR}/"):
+        path = os.path.normpath(url.lstrip("/"))
+        for name in VARIANTS:
+            variant = _variant_path(path, name)
+            urls[name] = "/" + variant.replace(os.sep, "/") if _variant_exists(variant) else url
+    else:
+        urls.update({name: url for name in VARIANTS})
+    return urls
+
+
+# --- Servicio de archivos estáticos ---
+
+# Nombre de un archivo guardado por contenido: <sha256>[.<variante>].<ext>
+_CONTENT_ADDRESSED = re.compile(r"^(?P<digest>[0-9a-f]{64})(?:\.(?P<variant>[a-z]+))?\.[0-9A-Za-z]+$")
+
+# Un nombre por contenido nunca cambia de bytes: se cachea un año sin revalidar.
+# El resto (imágenes anteriores, que pudieron sobrescribirse) se revalida con ETag.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# Tipos que el navegador puede mostrar dentro del sitio sin ejecutar nada. Cualquier
+# otro archivo (p. ej. un SVG o un HTML subido antes de validar las imágenes) se
+# sirve como descarga y con CSP sandbox, porque se cachea como inmutable y no se
+# puede retirar de los navegadores ni de una CDN
+INLINE_MEDIA_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+# Codificaciones precomprimidas soportadas, en orden de preferencia
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(request_headers: Headers) -> set:
+    accepted = set()
+    for item in request_headers.get("accept-encoding", "").split(","):
+        encoding, _, params = item.strip().partition(";")
+        if encoding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(encoding.lower())
+    return accepted
+
+
+class MediaFiles(StaticFiles):
+    """
+    StaticFiles con cabeceras pensadas para las imágenes del sitio: los archivos
+    guardados por contenido se sirven con `Cache-Control: immutable` y un ETag
+    fuerte derivado del hash, el resto con revalidación. Si existe una copia
+    .br/.gz y el cliente la acepta se sirve ésa. Las peticiones condicionales
+    (304) y por rangos los resuelve StaticFiles/FileResponse.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        name = os.path.basename(full_path)
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        # Sin nosniff el navegador podría interpretar una "imagen" como HTML o script
+        headers = {"x-content-type-options": "nosniff"}
+        if media_type not in INLINE_MEDIA_TYPES:
+            headers["content-disposition"] = "attachment"
+            headers["content-security-policy"] = "sandbox"
+        etag_suffix = ""
+
+        encodings = _accepted_encodings(request_headers)
+        for encoding, extension in PRECOMPRESSED:
+            compressed = full_path + extension
+            if encoding in encodings and os.path.isfile(compressed):
+                full_path, stat_result = compressed, os.stat(compressed)
+                headers["content-encoding"] = encoding
+                headers["vary"] = "Accept-Encoding"
+                etag_suffix = f"-{encoding}"
+                break
+
+        match = _CONTENT_ADDRESSED.match(name)
+        if match:
+            variant = f".{match.group('variant')}" if match.group("variant") else ""
+            headers["etag"] = f'"{match.group("digest")}{variant}{etag_suffix}"'
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            headers["cache-control"] = REVALIDATE_CACHE_CONTROL
+
+        response = FileResponse(full_path, status_code=status_code, headers=headers,
+                                media_type=media_type, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,134 @@
+# app/message_writer.py
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models.message import Message, add_unread_messages, set_conversation_last_message
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que el escritor espera para juntar mensajes antes de confirmar un lote,
+# tamaño máximo de cada lote y de la cola de mensajes pendientes.
+MESSAGE_BATCH_INTERVAL_MS = float(os.getenv("MESSAGE_BATCH_INTERVAL_MS", 5))
+MESSAGE_BATCH_MAX_SIZE = int(os.getenv("MESSAGE_BATCH_MAX_SIZE", 500))
+MESSAGE_QUEUE_MAX_SIZE = int(os.getenv("MESSAGE_QUEUE_MAX_SIZE", 10000))
+
+Pending = Tuple[Dict[str, Any], asyncio.Future]
+
+
+class MessageWriter:
+    """
+    Persiste los mensajes del chat con "group commit": los handlers encolan
+    mensajes y una única tarea los inserta por lotes, en una transacción cada
+    pocos milisegundos, en un hilo aparte para no bloquear el event loop.
+    Cada mensaje encolado recibe un Future que se resuelve con el mensaje
+    guardado (incluido su id) cuando el lote ya está confirmado.
+    """
+
+    def __init__(self, session_factory=SessionLocal, interval_ms: float = MESSAGE_BATCH_INTERVAL_MS,
+                 max_batch: int = MESSAGE_BATCH_MAX_SIZE, max_queue: int = MESSAGE_QUEUE_MAX_SIZE):
+        self._session_factory = session_factory
+        self._interval = interval_ms / 1000
+        self._max_batch = max_batch
+        self._max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Arranca la tarea escritora en el event loop actual si no está corriendo."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Confirma los mensajes pendientes y detiene la tarea escritora."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)
+        await self._task
+
+    async def submit(self, sender_id: int, receiver_id: int, conversation_id: int, content: str) -> asyncio.Future:
+        """Encola un mensaje y devuelve el Future que se resuelve cuando queda guardado."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        row = {
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "conversation_id": conversation_id,
+            "content": content,
+            "timestamp": datetime.utcnow(),
+            "is_read": False,
+        }
+        # Si la cola está llena, el emisor espera: contrapresión en lugar de memoria sin límite
+        await self._queue.put((row, future))
+        return future
+
+    async def _run(self) -> None:
+        closing = False
+        while not closing:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch: List[Pending] = [first]
+            # Junta lo que llegue durante la ventana del lote
+            await asyncio.sleep(self._interval)
+            while len(batch) < self._max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Pending]) -> None:
+        rows = [row for row, _ in batch]
+        try:
+            ids = await asyncio.get_running_loop().run_in_executor(None, self._write, rows)
+        except Exception as e:
+            logger.error(f"Error al guardar un lote de {len(rows)} mensajes: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (row, future), message_id in zip(batch, ids):
+            if not future.done():
+                future.set_result({**row, "id": message_id})
+
+    def _write(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        Inserta el lote y actualiza el último mensaje y los no leídos de cada
+        conversación en una sola transacción.
+        """
+        db = self._session_factory()
+        try:
+            ids = db.scalars(insert(Message).returning(Message.id, sort_by_parameter_order=True), rows).all()
+            # El INSERT masivo no dispara los eventos del ORM: un UPDATE por conversación del lote
+            latest = {}
+            unread = Counter()
+            for row, message_id in zip(rows, ids):
+                latest[row["conversation_id"]] = (message_id, row["timestamp"])
+                unread[(row["conversation_id"], row["receiver_id"])] += 1
+            connection = db.connection()
+            for conversation_id, (message_id, timestamp) in latest.items():
+                set_conversation_last_message(connection, conversation_id, message_id, timestamp)
+            for (conversation_id, receiver_id), count in unread.items():
+                add_unread_messages(connection, conversation_id, receiver_id, count)
+            db.commit()
+            return ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+writer = MessageWriter()
@@ -0,0 +1,209 @@
+# app/metrics.py
+"""
+Métricas en el formato de texto de Prometheus, sin dependencias externas.
+Cada módulo registra las suyas (contadores, gauges e histogramas) y GET /metrics
+las expone todas. Los valores son por proceso: con varios workers, Prometheus
+debe consultar cada uno (o agregarlos) por separado.
+"""
+import bisect
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latencias típicas de una API: de 1 ms a 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Collect = Callable[[], Iterable[Tuple[tuple, float]]]
+
+REGISTRY: List["Metric"] = []
+
+
+class Metric:
+    kind = "untyped"
+    suffix = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), collect: Optional[Collect] = None):
+        """`collect`, si se indica, devuelve al exponer los pares (valores de etiquetas, valor)."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterable[Tuple[str, tuple, float]]:
+        """(sufijo, pares de etiquetas, valor) de cada serie."""
+        if self._collect is not None:
+            items = list(self._collect())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for labels, value in items:
+            yield self.suffix, tuple(zip(self.labelnames, labels)), value
+
+
+class Counter(Metric):
+    kind = "counter"
+    suffix = "_total"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        # Se guarda la cuenta de cada intervalo; la acumulada se calcula al exponer
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[Tuple[str, tuple, float]]:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            pairs = tuple(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                yield "_bucket", pairs + (("le", _format_value(bound)),), cumulative
+            yield "_sum", pairs, series[-1]
+            yield "_count", pairs, cumulative
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """Todas las métricas registradas en el formato de exposición de texto 0.0.4."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, value in metric.samples():
+            label_text = ",".join(f'{name}="{_escape(v)}"' for name, v in labels)
+            lines.append(f"{metric.name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{metric.name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Peticiones HTTP ---
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Peticiones HTTP en curso.")
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP por ruta y estado.", ("method", "route", "status"),
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Consultas SQL ejecutadas por petición HTTP.", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+DB_QUERIES = Counter("db_queries", "Sentencias SQL ejecutadas.")
+
+
+class _QueryCount:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+# Consultas de la petición en curso; los hilos del threadpool heredan el contexto
+_request_queries: ContextVar[Optional[_QueryCount]] = ContextVar("request_queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERIES.inc()
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+
+
+def route_template(scope) -> str:
+    """
+    Plantilla de la ruta de la petición (p. ej. "/books/{book_id}"), para no crear
+    una serie por cada id. Los montajes como /static dejan su prefijo en root_path.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope and scope.get("root_path"):
+        return scope["root_path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide duración, estado y consultas SQL de cada petición HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = _QueryCount()
+        token = _request_queries.set(queries)
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            _request_queries.reset(token)
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.observe(elapsed, scope["method"], route, str(status))
+            HTTP_REQUEST_DB_QUERIES.observe(queries.count, scope["method"], route)
@@ -1,4 +1,6 @@
 from .user import User
 from .book import Book, Category
 from .message import Message
-from .conversation import Conversation
\ No newline at end of file
+from .conversation import Conversation
+from .facet import BookFacetCount
+from .exchange import WishlistItem, BookMatchKey, ExchangeEdge
\ No newline at end of file
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index, Table
+from sqlalchemy.orm import relationship, validates
 
 from app.database import Base
 
@@ -8,7 +8,9 @@ books_categories = Table(
     'books_categories',
     Base.metadata,
     Column('book_id', Integer, ForeignKey('books.id'), primary_key=True),
-    Column('category_id', Integer, ForeignKey('categories.id'), primary_key=True)
+    Column('category_id', Integer, ForeignKey('categories.id'), primary_key=True),
+    # La clave primaria sirve de libro a categorías; este índice, de categoría a libros
+    Index('ix_books_categories_category_book', 'category_id', 'book_id'),
 )
 
 class Book(Base):
@@ -25,16 +27,34 @@ class Book(Base):
     tags = Column(String, nullable=True)
     idioma = Column(String, nullable=True)
     estado = Column(String, nullable=True)
+    # Texto normalizado (sin tildes, en minúsculas) que alimenta la búsqueda de texto completo
+    search_document = Column(Text, nullable=True)
 
     user_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="books")
     categories = relationship("Category", secondary=books_categories, back_populates="books")
 
+    __table_args__ = (
+        # Libros de un usuario paginados por id (GET /books/my-books y /books/user-books/{id})
+        Index("ix_books_user_id_id", "user_id", "id"),
+    )
+
+def normalize_category_name(name: str) -> str:
+    """Clave de una categoría: sin espacios sobrantes y sin distinguir mayúsculas."""
+    return " ".join(name.split()).casefold()
+
 class Category(Base):
     __tablename__ = "categories"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False)
+    # Clave normalizada: "Ciencia Ficción" y " ciencia  ficción" son la misma categoría
+    normalized_name = Column(String, unique=True, index=True, nullable=True)
+
+    books = relationship("Book", secondary=books_categories, back_populates="categories")
 
-    books = relationship("Book", secondary=books_categories, back_populates="categories")
\ No newline at end of file
+    @validates("name")
+    def _set_normalized_name(self, key, name):
+        self.normalized_name = normalize_category_name(name)
+        return name
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, func
+from datetime import datetime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from ..database import Base
 
@@ -9,7 +10,27 @@ class Conversation(Base):
     user1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user2_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Puntero desnormalizado al último mensaje, mantenido al insertar cada mensaje
+    # (ver app/models/message.py). last_message_at arranca con la fecha de creación
+    # para que la bandeja de entrada pueda ordenar por esta columna sin COALESCE.
+    last_message_id = Column(Integer, ForeignKey("messages.id", use_alter=True, name="fk_conversations_last_message_id"), nullable=True)
+    last_message_at = Column(DateTime, default=datetime.utcnow)
+    # No leídos y último mensaje leído de cada participante. Los contadores se suman
+    # al guardar mensajes y se restan al marcarlos leídos (app/read_receipts.py), así
+    # la bandeja de entrada los lee de la fila sin contar mensajes.
+    user1_unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    user2_unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    user1_last_read_id = Column(Integer, nullable=True)
+    user2_last_read_id = Column(Integer, nullable=True)
 
     user1 = relationship("User", foreign_keys=[user1_id])
     user2 = relationship("User", foreign_keys=[user2_id])
-    messages = relationship("Message", back_populates="conversation", order_by="Message.created_at.desc()")
+    messages = relationship("Message", back_populates="conversation", foreign_keys="Message.conversation_id", order_by="Message.created_at.desc()")
+
+    __table_args__ = (
+        # Respaldan la bandeja de entrada: conversaciones de un usuario ordenadas por actividad
+        Index("ix_conversations_user1_last_message_at", "user1_id", "last_message_at"),
+        Index("ix_conversations_user2_last_message_at", "user2_id", "last_message_at"),
+        # Conversación entre dos usuarios dados (find_conversation)
+        Index("ix_conversations_user1_user2", "user1_id", "user2_id"),
+    )
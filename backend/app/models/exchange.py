@@ -0,0 +1,56 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.orm import relationship
+
+from app.database import Base
+
+class WishlistItem(Base):
+    """Algo que un usuario busca: un título, un autor o una categoría."""
+    __tablename__ = "wishlist_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)  # "title", "author" o "category"
+    value = Column(String, nullable=False)
+    # Clave normalizada "<kind>:<términos>", la misma que indexa los libros en book_match_keys
+    key = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    user = relationship("User")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_wishlist_items_user_key"),
+        # Índice invertido: clave buscada -> usuarios que la buscan
+        Index("ix_wishlist_items_key_user", "key", "user_id"),
+    )
+
+class BookMatchKey(Base):
+    """Índice invertido de ofertas: clave de un libro -> dueño y libro."""
+    __tablename__ = "book_match_keys"
+
+    key = Column(String, primary_key=True)
+    # Sin FK: es un índice derivado que se limpia al borrar el libro (ver app/matching.py)
+    book_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_book_match_keys_key_user", "key", "user_id"),
+        Index("ix_book_match_keys_book", "book_id"),
+        Index("ix_book_match_keys_user", "user_id"),
+    )
+
+class ExchangeEdge(Base):
+    """
+    Arista dirigida del grafo de intercambios: `owner_id` tiene `strength` pares
+    (libro, deseo) que le interesan a `wisher_id`. Dos usuarios hacen match
+    recíproco cuando existen las aristas en ambos sentidos.
+    """
+    __tablename__ = "exchange_edges"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    wisher_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    strength = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_exchange_edges_wisher_owner", "wisher_id", "owner_id"),
+    )
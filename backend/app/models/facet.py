@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String
+
+from app.database import Base
+
+class BookFacetCount(Base):
+    """
+    Conteo precalculado de libros por valor de cada faceta (categoría, idioma,
+    estado y década de publicación) sobre todo el catálogo. Se mantiene de forma
+    incremental en cada flush (ver app/facets.py).
+    """
+    __tablename__ = "book_facet_counts"
+
+    facet = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
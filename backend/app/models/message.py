@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Boolean, func
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Boolean, Index, case, event, func, or_, update
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime
 from app.database import Base
+from .conversation import Conversation
 
 class Message(Base):
     __tablename__ = "messages"
@@ -15,7 +16,49 @@ class Message(Base):
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    conversation = relationship("Conversation", back_populates="messages")
+    conversation = relationship("Conversation", back_populates="messages", foreign_keys=[conversation_id])
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
 
+    __table_args__ = (
+        # Marcar leídos sólo recorre los mensajes todavía sin leer del destinatario
+        Index("ix_messages_conversation_receiver_is_read", "conversation_id", "receiver_id", "is_read"),
+        # Historial entre dos usuarios en orden cronológico
+        Index("ix_messages_sender_receiver_timestamp", "sender_id", "receiver_id", "timestamp"),
+        Index("ix_messages_conversation_timestamp", "conversation_id", "timestamp"),
+        # Páginas del historial y sincronización incremental por id dentro de la conversación
+        Index("ix_messages_conversation_id", "conversation_id", "id"),
+    )
+
+
+def set_conversation_last_message(connection, conversation_id: int, message_id: int, timestamp: datetime) -> None:
+    """Mueve el puntero de último mensaje de una conversación; nunca retrocede si los mensajes llegan fuera de orden."""
+    conversations = Conversation.__table__
+    connection.execute(
+        update(conversations)
+        .where(conversations.c.id == conversation_id)
+        .where(or_(conversations.c.last_message_id.is_(None), conversations.c.last_message_id < message_id))
+        .values(last_message_id=message_id, last_message_at=timestamp)
+    )
+
+
+def add_unread_messages(connection, conversation_id: int, receiver_id: int, count: int) -> None:
+    """Suma `count` al contador de no leídos del destinatario en la conversación."""
+    conversations = Conversation.__table__
+    c = conversations.c
+    connection.execute(
+        update(conversations)
+        .where(c.id == conversation_id)
+        .values(
+            user1_unread_count=case((c.user1_id == receiver_id, c.user1_unread_count + count), else_=c.user1_unread_count),
+            user2_unread_count=case((c.user2_id == receiver_id, c.user2_unread_count + count), else_=c.user2_unread_count),
+        )
+    )
+
+
+@event.listens_for(Message, "after_insert")
+def _update_conversation_last_message(mapper, connection, target):
+    """Actualiza la conversación en la misma transacción del INSERT."""
+    set_conversation_last_message(connection, target.conversation_id, target.id, target.timestamp)
+    if not target.is_read:
+        add_unread_messages(connection, target.conversation_id, target.receiver_id, 1)
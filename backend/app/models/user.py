@@ -18,6 +18,8 @@ class User(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
     profile_picture_url: Mapped[str] = mapped_column(String, nullable=True)
+    # Se incrementa para revocar todos los tokens emitidos hasta el momento
+    token_epoch: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     books = relationship("Book", back_populates="owner")
     sent_messages = relationship("Message", back_populates="sender", foreign_keys="[Message.sender_id]")
@@ -0,0 +1,55 @@
+# app/pagination.py
+import base64
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Tamaño máximo de página aceptado por los endpoints de listado
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Codifica la clave de la última fila de una página como un cursor opaco."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], **fields: Callable[[Any], Any]) -> Optional[Dict[str, Any]]:
+    """
+    Decodifica un cursor generado por `encode_cursor` y convierte cada campo
+    esperado con su tipo (p. ej. `decode_cursor(cursor, id=int)`).
+    Devuelve None si no hay cursor y responde 400 si es inválido.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {name: convert(values[name]) for name, convert in fields.items()}
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido.")
+
+
+def paginate(query, limit: int, cursor_for: Callable[[Any], Dict[str, Any]]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Ejecuta `query` (ya filtrada por el cursor y ordenada) pidiendo una fila de más
+    para saber si existe una página siguiente. Devuelve las filas de la página y el
+    cursor de la siguiente, o None si es la última.
+    """
+    return split_page(query.limit(limit + 1).all(), limit, cursor_for)
+
+
+async def paginate_async(db: AsyncSession, statement, limit: int, cursor_for: Callable[[Any], Dict[str, Any]]) -> Tuple[List[Any], Optional[str]]:
+    """Como `paginate`, ejecutando un `select()` en una sesión asíncrona."""
+    rows = (await db.execute(statement.limit(limit + 1))).all()
+    return split_page(rows, limit, cursor_for)
+
+
+def split_page(rows: List[Any], limit: int, cursor_for: Callable[[Any], Dict[str, Any]]) -> Tuple[List[Any], Optional[str]]:
+    """Separa la fila de más pedida por la consulta: devuelve la página y el cursor de la siguiente."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(cursor_for(rows[-1]))
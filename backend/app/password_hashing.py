@@ -0,0 +1,88 @@
+# app/password_hashing.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+load_dotenv()
+
+# Procesos dedicados a bcrypt (0 = calcular en el hilo de la petición) y cuántas
+# operaciones pueden estar en curso o en espera antes de rechazar con 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", max(PASSWORD_HASH_WORKERS, 1) * 4))
+
+# Configuración de hashing de contraseñas
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasherBusy(Exception):
+    """La cola de hashing está llena: hay que rechazar la petición en lugar de esperar."""
+
+
+# Funciones que se ejecutan en los procesos del pool (deben ser de nivel de módulo)
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Ejecuta bcrypt en un pool de procesos propio para no ocupar el threadpool de
+    Starlette ni el GIL. Un semáforo limita las operaciones pendientes: si está
+    agotado se lanza PasswordHasherBusy de inmediato (control de admisión).
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Crea el pool y arranca sus procesos para que el primer login no pague el arranque."""
+        if self.workers <= 0:
+            return
+        with self._lock:
+            if self._pool is None:
+                # "spawn" evita heredar hilos y conexiones abiertas del proceso del servidor
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+        for future in [self._pool.submit(_hash, "") for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    def _run(self, fn: Callable, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            if self._pool is None:
+                self.start()
+            future: Future = self._pool.submit(fn, *args)
+            return future.result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verifica la contraseña y, si el hash usa un esquema obsoleto, devuelve también el nuevo hash."""
+        return self._run(_verify_and_update, password, hashed_password)
+
+
+hasher = PasswordHasher()
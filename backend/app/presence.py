@@ -0,0 +1,272 @@
+# app/presence.py
+"""
+Presencia ("en línea") e indicadores de "escribiendo..." sobre Socket.IO.
+
+Cada conexión autenticada envía "heartbeat" periódicamente; un usuario está en
+línea mientras alguna de sus conexiones tenga un latido más reciente que
+PRESENCE_TTL_SECONDS. Los cambios no se emiten en el momento: se marcan y, cada
+PRESENCE_FLUSH_MS, se comparan con lo último que se avisó, así una reconexión o
+una ráfaga de teclas dentro de la ventana no generan ningún aviso, y cada
+interlocutor recibe un único frame "presence" con todos sus cambios:
+
+    {"events": [{"type": "presence", "user_id": 7, "online": true},
+                {"type": "typing", "user_id": 9, "typing": false}]}
+
+Los avisos van sólo a los interlocutores (usuarios con una conversación en
+común) que están en línea. "escribiendo" vence a los TYPING_TTL_SECONDS del
+último evento "typing" si el cliente no avisa que terminó.
+
+La tabla vive en memoria de cada proceso: con varios workers, cada uno ve sólo
+las conexiones que atiende.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import case, or_, select
+
+from app import metrics
+from app.database import async_read_session
+from app.models import Conversation
+from app.socket_manager import sio, user_room
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", 60))
+TYPING_TTL_SECONDS = float(os.getenv("TYPING_TTL_SECONDS", 6))
+PRESENCE_FLUSH_MS = float(os.getenv("PRESENCE_FLUSH_MS", 1000))
+
+Emit = Callable[[int, List[Dict[str, Any]]], Awaitable[None]]
+TypingKey = Tuple[int, int]  # (quien escribe, destinatario)
+
+FRAMES = metrics.Counter("presence_frames", "Frames de presencia y escritura emitidos por Socket.IO.")
+
+
+def partners_statement(user_id: int):
+    """Usuarios con los que `user_id` tiene una conversación."""
+    return select(
+        case((Conversation.user1_id == user_id, Conversation.user2_id), else_=Conversation.user1_id)
+    ).where(or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id))
+
+
+async def load_partners(user_id: int) -> Set[int]:
+    db = async_read_session()
+    try:
+        return set((await db.scalars(partners_statement(user_id))).all())
+    finally:
+        await db.close()
+
+
+async def emit_to_user(user_id: int, events: List[Dict[str, Any]]) -> None:
+    await sio.emit("presence", {"events": events}, room=user_room(user_id))
+
+
+class PresenceTracker:
+    """
+    Tabla de presencia de este proceso. Usa los mapas de `sio`: `sid_user_map`
+    guarda todas las conexiones autenticadas y `user_sid_map` sólo las que tienen
+    un latido vigente, así una conexión vencida vuelve a contar con su próximo latido.
+    """
+
+    def __init__(self, emit: Emit = emit_to_user, ttl_seconds: float = PRESENCE_TTL_SECONDS,
+                 typing_ttl_seconds: float = TYPING_TTL_SECONDS, interval_ms: float = PRESENCE_FLUSH_MS,
+                 clock: Callable[[], float] = time.monotonic):
+        self._emit = emit
+        self._ttl = ttl_seconds
+        self._typing_ttl = typing_ttl_seconds
+        self._interval = interval_ms / 1000
+        self._clock = clock
+        self._sid_users: Dict[str, int] = sio.sid_user_map
+        self._user_sids: Dict[int, Set[str]] = sio.user_sid_map
+        self._last_seen: Dict[str, float] = {}
+        self._partners: Dict[int, Set[int]] = {}
+        # Vencimiento de cada "escribiendo" activo
+        self._typing: Dict[TypingKey, float] = {}
+        # Lo último que se avisó a los interlocutores
+        self._announced_online: Set[int] = set()
+        self._announced_typing: Set[TypingKey] = set()
+        # Cambios desde el último frame
+        self._dirty_users: Set[int] = set()
+        self._dirty_typing: Set[TypingKey] = set()
+        # Interlocutores nuevos (destinatario, usuario) que todavía no recibieron el estado del otro
+        self._introductions: Set[Tuple[int, int]] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self._user_sids
+
+    def online_count(self) -> int:
+        return len(self._user_sids)
+
+    async def connect(self, sid: str, user_id: int) -> None:
+        """Registra una conexión autenticada y le envía qué interlocutores están en línea."""
+        self._loop = asyncio.get_running_loop()
+        self._sid_users[sid] = user_id
+        try:
+            await self._touch(sid, user_id)
+        except Exception:
+            self._sid_users.pop(sid, None)
+            raise
+        if sid not in self._sid_users:
+            # Se desconectó mientras se cargaban sus interlocutores
+            return
+        await sio.enter_room(sid, user_room(user_id))
+        online = [{"type": "presence", "user_id": partner, "online": True}
+                  for partner in sorted(self._partners.get(user_id, ())) if self.is_online(partner)]
+        if online:
+            await sio.emit("presence", {"events": online}, to=sid)
+            FRAMES.inc()
+
+    def disconnect(self, sid: str) -> None:
+        user_id = self._sid_users.pop(sid, None)
+        if user_id is not None:
+            self._drop(sid, user_id)
+
+    async def heartbeat(self, sid: str) -> None:
+        user_id = self._sid_users.get(sid)
+        if user_id is not None:
+            await self._touch(sid, user_id)
+
+    async def typing(self, sid: str, partner_id: int, active: bool) -> None:
+        """Registra que el usuario de `sid` empezó o dejó de escribirle a `partner_id`."""
+        user_id = self._sid_users.get(sid)
+        if user_id is None:
+            return
+        await self._touch(sid, user_id)
+        if partner_id not in self._partners.get(user_id, ()):
+            return
+        key = (user_id, partner_id)
+        if active:
+            # Cada tecla sólo extiende el vencimiento; el aviso sale en el próximo frame
+            self._typing[key] = self._clock() + self._typing_ttl
+        else:
+            self._typing.pop(key, None)
+        self._dirty_typing.add(key)
+
+    def conversation_created(self, user_id: int, other_user_id: int) -> None:
+        """
+        Agrega a los dos usuarios como interlocutores si están en línea en este proceso,
+        y en el próximo frame cada uno recibe que el otro está en línea. Se puede llamar
+        desde un hilo del threadpool: el cambio se aplica en el event loop.
+        """
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._add_partners, user_id, other_user_id)
+
+    def _add_partners(self, user_id: int, other_user_id: int) -> None:
+        for user, partner in ((user_id, other_user_id), (other_user_id, user_id)):
+            partners = self._partners.get(user)
+            if partners is not None and partner not in partners:
+                partners.add(partner)
+                self._introductions.add((user, partner))
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _touch(self, sid: str, user_id: int) -> None:
+        if user_id not in self._user_sids:
+            # Vuelve a estar en línea: se recargan por si inició conversaciones nuevas
+            partners = await load_partners(user_id)
+            if self._sid_users.get(sid) != user_id:
+                # La conexión se cerró durante la consulta: no se registra
+                return
+            self._partners[user_id] = partners
+            self._dirty_users.add(user_id)
+        self._last_seen[sid] = self._clock()
+        self._user_sids.setdefault(user_id, set()).add(sid)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _drop(self, sid: str, user_id: int) -> None:
+        """Quita una conexión de la presencia (desconexión o latido vencido)."""
+        self._last_seen.pop(sid, None)
+        sids = self._user_sids.get(user_id)
+        if sids is None or sid not in sids:
+            return
+        sids.discard(sid)
+        if not sids:
+            del self._user_sids[user_id]
+            self._dirty_users.add(user_id)
+            for key in [key for key in self._typing if key[0] == user_id]:
+                del self._typing[key]
+                self._dirty_typing.add(key)
+
+    async def _run(self) -> None:
+        # Corre mientras haya conexiones vivas o cambios sin avisar
+        while self._last_seen or self._dirty_users or self._dirty_typing:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error al emitir presencia: {e}")
+
+    async def flush(self) -> None:
+        """Vence latidos y "escribiendo", y emite un frame por interlocutor con los cambios acumulados."""
+        now = self._clock()
+        for sid, seen in list(self._last_seen.items()):
+            if now - seen > self._ttl:
+                user_id = self._sid_users.get(sid)
+                if user_id is None:
+                    self._last_seen.pop(sid, None)
+                else:
+                    self._drop(sid, user_id)
+        for key, expires in list(self._typing.items()):
+            if expires <= now:
+                del self._typing[key]
+                self._dirty_typing.add(key)
+
+        frames: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        dirty_users, self._dirty_users = self._dirty_users, set()
+        for user_id in dirty_users:
+            online = self.is_online(user_id)
+            # Un usuario que se fue y volvió dentro de la ventana no genera avisos
+            if online != (user_id in self._announced_online):
+                if online:
+                    self._announced_online.add(user_id)
+                else:
+                    self._announced_online.discard(user_id)
+                for partner in self._partners.get(user_id, ()):
+                    if self.is_online(partner):
+                        frames[partner].append({"type": "presence", "user_id": user_id, "online": online})
+            if not online:
+                self._partners.pop(user_id, None)
+
+        introductions, self._introductions = self._introductions, set()
+        for recipient, user_id in introductions:
+            # Si el usuario cambió de estado en esta ventana ya se avisó arriba a todos sus interlocutores
+            if self.is_online(recipient) and user_id in self._announced_online and user_id not in dirty_users:
+                frames[recipient].append({"type": "presence", "user_id": user_id, "online": True})
+
+        dirty_typing, self._dirty_typing = self._dirty_typing, set()
+        for key in dirty_typing:
+            active = key in self._typing
+            if active == (key in self._announced_typing):
+                continue
+            if active:
+                self._announced_typing.add(key)
+            else:
+                self._announced_typing.discard(key)
+            user_id, partner = key
+            if self.is_online(partner):
+                frames[partner].append({"type": "typing", "user_id": user_id, "typing": active})
+
+        for recipient, events in frames.items():
+            await self._emit(recipient, events)
+        FRAMES.inc(amount=len(frames))
+
+
+tracker = PresenceTracker()
+
+metrics.Gauge("presence_online_users", "Usuarios en línea (con latido vigente) en este proceso.",
+              collect=lambda: [((), tracker.online_count())])
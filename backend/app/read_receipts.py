@@ -0,0 +1,162 @@
+# app/read_receipts.py
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import case, or_, select, update
+
+from app import chat_manager
+from app.database import SessionLocal
+from app.models import Conversation, Message
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Ventana en la que se juntan las marcas de lectura antes de escribirlas
+READ_RECEIPT_INTERVAL_MS = float(os.getenv("READ_RECEIPT_INTERVAL_MS", 250))
+
+Key = Tuple[int, int]  # (conversation_id, reader_id)
+
+
+def mark_read(connection, conversation_id: int, reader_id: int, up_to_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Marca como leídos los mensajes recibidos por `reader_id` en la conversación
+    hasta `up_to_id` inclusive, con un único UPDATE por rango, y descuenta del
+    contador del lector los que cambiaron. Devuelve el nuevo estado de lectura o
+    None si el lector no participa de la conversación.
+    """
+    conversations = Conversation.__table__
+    c = conversations.c
+    row = connection.execute(
+        select(c.user1_id, c.user2_id, c.last_message_id).where(c.id == conversation_id)
+    ).first()
+    if row is None or reader_id not in (row.user1_id, row.user2_id) or row.last_message_id is None:
+        return None
+    # No se puede marcar por adelantado lo que todavía no se escribió
+    up_to_id = min(up_to_id, row.last_message_id)
+    slot = "user1" if row.user1_id == reader_id else "user2"
+
+    messages = Message.__table__
+    marked = connection.execute(
+        update(messages)
+        .where(
+            messages.c.conversation_id == conversation_id,
+            messages.c.receiver_id == reader_id,
+            messages.c.is_read == False,  # noqa: E712
+            messages.c.id <= up_to_id,
+        )
+        .values(is_read=True)
+    ).rowcount
+
+    counter, pointer = c[f"{slot}_unread_count"], c[f"{slot}_last_read_id"]
+    unread, last_read = connection.execute(
+        update(conversations)
+        .where(c.id == conversation_id)
+        .values({
+            counter: case((counter > marked, counter - marked), else_=0),
+            pointer: case((or_(pointer.is_(None), pointer < up_to_id), up_to_id), else_=pointer),
+        })
+        .returning(counter, pointer)
+    ).one()
+    return {
+        "conversation_id": conversation_id,
+        "reader_id": reader_id,
+        "other_user_id": row.user2_id if slot == "user1" else row.user1_id,
+        "last_read_id": last_read,
+        "unread_count": unread,
+        "marked": marked,
+    }
+
+
+class ReadReceiptWriter:
+    """
+    Junta las marcas de "leído hasta X". Mientras un usuario recorre un historial
+    largo, todas las marcas de una conversación dentro de la ventana se reducen a
+    la más alta, y las de todas las conversaciones se escriben juntas en una
+    transacción, en un hilo aparte. Cada marca recibe un Future (compartido por
+    las que se fusionaron) con el estado de lectura resultante.
+    """
+
+    def __init__(self, session_factory=SessionLocal, interval_ms: float = READ_RECEIPT_INTERVAL_MS):
+        self._session_factory = session_factory
+        self._interval = interval_ms / 1000
+        self._pending: Dict[Key, List] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, conversation_id: int, reader_id: int, up_to_id: int) -> asyncio.Future:
+        """Registra una marca de lectura y devuelve el Future de su escritura."""
+        entry = self._pending.get((conversation_id, reader_id))
+        if entry is None:
+            entry = [up_to_id, asyncio.get_running_loop().create_future()]
+            self._pending[(conversation_id, reader_id)] = entry
+        else:
+            entry[0] = max(entry[0], up_to_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return entry[1]
+
+    async def stop(self) -> None:
+        """Escribe las marcas pendientes."""
+        if self._task is not None and not self._task.done():
+            await self._task
+
+    async def _run(self) -> None:
+        # Las marcas que llegan mientras se escribe un lote van al siguiente
+        while self._pending:
+            await asyncio.sleep(self._interval)
+            batch, self._pending = self._pending, {}
+            await self._flush(batch)
+
+    async def _flush(self, batch: Dict[Key, List]) -> None:
+        marks = [(conversation_id, reader_id, up_to_id) for (conversation_id, reader_id), (up_to_id, _) in batch.items()]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self._write, marks)
+        except Exception as e:
+            logger.error(f"Error al guardar {len(marks)} marcas de lectura: {e}")
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()  # ya quedó en el log; evita el aviso si nadie la espera
+            return
+        for (_, future), result in zip(batch.values(), results):
+            if not future.done():
+                future.set_result(result)
+        for result in results:
+            if result and result["marked"]:
+                await publish(result)
+
+    def _write(self, marks: List[Tuple[int, int, int]]) -> List[Optional[Dict[str, Any]]]:
+        db = self._session_factory()
+        try:
+            connection = db.connection()
+            # Orden fijo para que dos workers no se bloqueen en orden cruzado
+            results = {mark: mark_read(connection, *mark) for mark in sorted(marks)}
+            db.commit()
+            return [results[mark] for mark in marks]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+async def publish(result: Dict[str, Any]) -> None:
+    """Avisa al otro participante que sus mensajes fueron leídos y sincroniza las otras pestañas del lector."""
+    await chat_manager.send_to_user(result["other_user_id"], {
+        "type": "read",
+        "conversation_id": result["conversation_id"],
+        "reader_id": result["reader_id"],
+        "last_read_id": result["last_read_id"],
+    })
+    await chat_manager.send_to_user(result["reader_id"], {
+        "type": "unread",
+        "conversation_id": result["conversation_id"],
+        "last_read_id": result["last_read_id"],
+        "unread_count": result["unread_count"],
+    })
+
+
+writer = ReadReceiptWriter()
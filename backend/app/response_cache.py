@@ -0,0 +1,320 @@
+# app/response_cache.py
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app import metrics
+from app.cache import TTLCache
+from app.models import Book, User
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Vida de una respuesta cacheada y cantidad máxima en memoria. Con RESPONSE_CACHE_URL
+# (redis://...) la caché se comparte entre workers e invalidar en uno afecta a todos.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 30))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", 2048))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+
+# El cliente puede guardar la respuesta pero debe revalidarla (con If-None-Match) cada vez
+CACHE_CONTROL = "public, no-cache"
+
+
+# --- Etiquetas de invalidación ---
+
+def book_tags(book_id: int, owner_id: Optional[int]) -> List[str]:
+    """Respuestas que dependen de un libro: su detalle, los listados y los libros de su dueño."""
+    return [f"book:{book_id}", "books", f"user-books:{owner_id}"]
+
+
+def user_tags(user_id: int) -> List[str]:
+    return [f"user:{user_id}"]
+
+
+# --- Backends ---
+
+class MemoryBackend:
+    """Respuestas en un LRU con TTL dentro del proceso; las versiones de etiqueta, en un dict."""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_MAX_SIZE, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        return self.entries.get(key)
+
+    def set(self, key: str, etag: str, body: bytes) -> None:
+        self.entries.set(key, (etag, body))
+
+    def versions(self, tags: List[str]) -> List[int]:
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class RedisBackend:
+    """Misma interfaz sobre Redis, para compartir respuestas e invalidaciones entre workers."""
+
+    PREFIX = "respcache:"
+
+    def __init__(self, url: str, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = max(int(ttl), 1)
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        raw = self._redis.get(self.PREFIX + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return etag.decode(), body
+
+    def set(self, key: str, etag: str, body: bytes) -> None:
+        self._redis.set(self.PREFIX + key, etag.encode() + b"\n" + body, ex=self.ttl)
+
+    def versions(self, tags: List[str]) -> List[int]:
+        values = self._redis.mget([f"{self.PREFIX}tag:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags: Iterable[str]) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(f"{self.PREFIX}tag:{tag}")
+        pipe.execute()
+
+    def clear(self) -> None:
+        for key in self._redis.scan_iter(match=self.PREFIX + "*"):
+            self._redis.delete(key)
+
+
+def create_backend(url: Optional[str]):
+    """Elige el backend según la URL: redis://, rediss:// o unix:// usan Redis, si no, memoria."""
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return MemoryBackend()
+
+
+backend = create_backend(RESPONSE_CACHE_URL)
+
+
+# --- Estadísticas ---
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.hits = self.misses = self.not_modified = self.errors = 0
+        self.hit_seconds = self.miss_seconds = 0.0
+
+    def record(self, hit: bool, not_modified: bool, elapsed: float) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += elapsed
+            else:
+                self.misses += 1
+                self.miss_seconds += elapsed
+            if not_modified:
+                self.not_modified += 1
+
+    def snapshot(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "avg_hit_ms": self.hit_seconds * 1000 / self.hits if self.hits else 0.0,
+            "avg_miss_ms": self.miss_seconds * 1000 / self.misses if self.misses else 0.0,
+        }
+
+
+stats = _Stats()
+
+metrics.Counter("response_cache_requests", "Respuestas servidas desde la caché (hit) o generadas (miss).", ("result",),
+                collect=lambda: [(("hit",), stats.hits), (("miss",), stats.misses)])
+metrics.Counter("response_cache_not_modified", "Respuestas 304 por If-None-Match coincidente.",
+                collect=lambda: [((), stats.not_modified)])
+metrics.Counter("response_cache_errors", "Fallos del backend de la caché de respuestas.",
+                collect=lambda: [((), stats.errors)])
+
+
+def get_stats() -> dict:
+    return {"backend": type(backend).__name__, **stats.snapshot()}
+
+
+# --- Respuestas ---
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def _serialize(model: Any, value: Any) -> bytes:
+    """Serializa como lo haría FastAPI con `response_model`."""
+    adapter = _adapters.get(model)
+    if adapter is None:
+        adapter = _adapters[model] = TypeAdapter(model)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True), by_alias=True)
+
+
+def _query_key(request: Request) -> str:
+    """Parámetros de la consulta que declara la ruta, ordenados y sin los vacíos."""
+    route = request.scope.get("route")
+    declared = {param.alias for param in route.dependant.query_params} if route else None
+    items = sorted(
+        (name, value.strip()) for name, value in request.query_params.multi_items()
+        if value.strip() and (declared is None or name in declared)
+    )
+    return "&".join(f"{name}={value}" for name, value in items)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def _lookup(request: Request, tags: List[str]) -> Tuple[Optional[str], Optional[Tuple[str, bytes]]]:
+    """Clave de la petición y la respuesta guardada (etag, cuerpo), si la hay."""
+    try:
+        versions = backend.versions(tags)
+        key = f"{request.url.path}?{_query_key(request)}#" + ",".join(map(str, versions))
+        # Un cliente que acaba de escribir lee del primario (app.database.get_read_db):
+        # no usa la respuesta cacheada, que pudo salir de una réplica atrasada
+        entry = None if getattr(request.state, "read_your_writes", False) else backend.get(key)
+        return key, entry
+    except Exception as e:
+        # Si el backend compartido falla la petición se atiende igual, sin caché
+        logger.error(f"Caché de respuestas no disponible: {e}")
+        stats.errors += 1
+        return None, None
+
+
+def _store(key: Optional[str], etag: str, body: bytes) -> None:
+    if key is None:
+        return
+    try:
+        backend.set(key, etag, body)
+    except Exception as e:
+        logger.error(f"No se pudo guardar la respuesta en caché: {e}")
+        stats.errors += 1
+
+
+def _render(model: Any, value: Any) -> Tuple[str, bytes]:
+    body = _serialize(model, value)
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body
+
+
+def _respond(request: Request, hit: bool, etag: str, body: bytes, start: float) -> Response:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "X-Cache": "HIT" if hit else "MISS"}
+    not_modified = _etag_matches(request, etag)
+    stats.record(hit, not_modified, time.perf_counter() - start)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_response(request: Request, model: Any, tags: List[str], produce: Callable[[], Any]) -> Response:
+    """
+    Devuelve la respuesta JSON de `produce()` pasando por la caché. La clave es la
+    ruta, los parámetros de consulta normalizados y la versión actual de cada
+    etiqueta de `tags`, así que invalidar una etiqueta deja inalcanzables sus
+    respuestas viejas. El ETag es fuerte (hash del cuerpo) y un If-None-Match
+    coincidente se responde con 304 sin cuerpo.
+    """
+    start = time.perf_counter()
+    key, entry = _lookup(request, tags)
+    hit = entry is not None
+    if hit:
+        etag, body = entry
+    else:
+        etag, body = _render(model, produce())
+        _store(key, etag, body)
+    return _respond(request, hit, etag, body, start)
+
+
+async def _call_backend(fn: Callable, *args):
+    # Redis se usa con un cliente síncrono: desde una ruta async se llama en el
+    # threadpool para no bloquear el event loop; la memoria se consulta directo
+    if isinstance(backend, MemoryBackend):
+        return fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+
+async def cached_response_async(request: Request, model: Any, tags: List[str], produce: Callable[[], Awaitable[Any]]) -> Response:
+    """Como `cached_response`, para rutas `async def`: `produce` es una función asíncrona."""
+    start = time.perf_counter()
+    key, entry = await _call_backend(_lookup, request, tags)
+    hit = entry is not None
+    if hit:
+        etag, body = entry
+    else:
+        etag, body = _render(model, await produce())
+        await _call_backend(_store, key, etag, body)
+    return _respond(request, hit, etag, body, start)
+
+
+def invalidate(*tags: str) -> None:
+    try:
+        backend.bump(tags)
+    except Exception as e:
+        logger.error(f"No se pudo invalidar la caché de respuestas: {e}")
+        stats.errors += 1
+
+
+# --- Invalidación automática al confirmar cambios en libros y usuarios ---
+
+def _remember_tags(target, tags: Iterable[str]) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("response_cache_tags", set()).update(tags)
+
+
+@event.listens_for(Book, "after_insert")
+@event.listens_for(Book, "after_update")
+@event.listens_for(Book, "after_delete")
+def _collect_book_tags(mapper, connection, target):
+    tags = book_tags(target.id, target.user_id)
+    # Si el libro cambió de dueño, también cambian los libros del dueño anterior
+    tags.extend(f"user-books:{owner_id}" for owner_id in inspect(target).attrs.user_id.history.deleted)
+    _remember_tags(target, tags)
+
+
+@event.listens_for(User, "after_update")
+def _collect_user_tags(mapper, connection, target):
+    _remember_tags(target, user_tags(target.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    tags = session.info.pop("response_cache_tags", None)
+    if tags:
+        invalidate(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tags(session):
+    session.info.pop("response_cache_tags", None)
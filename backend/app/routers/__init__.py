@@ -1,5 +1,6 @@
 from .users import router as users_router
 from .books import router as books_router
+from .exchanges import router as exchanges_router
 from .messages import router as messages_router
 from .conversations import router as conversations_router
 
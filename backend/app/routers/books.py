@@ -1,13 +1,17 @@
 # app/routers/books.py
-import os
-from uuid import uuid4
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from anyio import from_thread
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Header, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
 from datetime import date
 
-from app import models, schemas, security
-from app.database import get_db
+from app import catalog_export, catalog_import, facets, media, models, pagination, response_cache, schemas, search, security
+from app.categories import resolve_categories
+from app.database import get_async_read_db, get_db, get_read_db
 import logging
 
 
@@ -16,35 +20,14 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 router = APIRouter()
 
-# Función para guardar imágenes
-def save_image(file: UploadFile) -> str:
-    extension = os.path.splitext(file.filename)[1]
-    filename = f"{uuid4().hex}{extension}"
-    path = os.path.join("static", "images", filename)
-
-    with open(path, "wb") as buffer:
-        buffer.write(file.file.read())
-
-    return f"/static/images/{filename}"
-
 # Endpoint para crear el libro (sin imagen)
 @router.post("/books/", response_model=schemas.Book)
 def create_book(book: schemas.BookCreate, current_user: models.User = Depends(security.get_current_user), db: Session = Depends(get_db)):
     # 1. Obtiene los nombres de las categorías del request
     category_names = book.categories
     
-    # 2. Busca o crea las categorías en la base de datos
-    categories = []
-    for name in category_names:
-        # Busca si la categoría ya existe (la búsqueda es insensible a mayúsculas/minúsculas)
-        category = db.query(models.Category).filter(models.Category.name.ilike(name)).first()
-        if not category:
-            # Si no existe, la crea
-            category = models.Category(name=name)
-            db.add(category)
-            db.commit()
-            db.refresh(category)
-        categories.append(category)
+    # 2. Busca o crea las categorías en lote, dentro de la misma transacción que el libro
+    categories = resolve_categories(db, category_names)
 
     # 3. Crea el libro con los datos recibidos, excluyendo el campo 'categories'
     #    ya que lo manejaremos por separado
@@ -60,10 +43,35 @@ def create_book(book: schemas.BookCreate, current_user: models.User = Depends(se
     
     return db_book
 
+async def _next_chunk(body) -> bytes:
+    try:
+        return await body.__anext__()
+    except StopAsyncIteration:
+        return b""
+
+@router.post("/books/import", description="Importa muchos libros desde un cuerpo CSV o NDJSON y devuelve un reporte por fila en NDJSON.")
+async def import_books(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Lee el cuerpo por bloques mientras llega: cada fila se valida como BookCreate
+    y los libros se guardan en lotes de BOOK_IMPORT_BATCH_SIZE por transacción.
+    En CSV la columna `categories` separa los nombres con ";".
+    """
+    fmt = catalog_import.detect_format(format, request.headers.get("content-type"))
+    body = request.stream()
+    # La importación corre en un hilo del threadpool, que pide cada bloque del cuerpo al event loop
+    read_chunk = lambda: from_thread.run(_next_chunk, body)
+    report = await run_in_threadpool(catalog_import.import_books, current_user.id, read_chunk, fmt)
+    return StreamingResponse(catalog_import.iter_report(report), media_type="application/x-ndjson")
+
 # Endpoint para cargar la imagen del libro
 @router.post("/books/{book_id}/image/", response_model=schemas.Book)
 def upload_book_image(
     book_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: models.User = Depends(security.get_current_user),
     db: Session = Depends(get_db)
@@ -74,15 +82,31 @@ def upload_book_image(
     if db_book.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="No autorizado")
 
-    image_url = save_image(file)
-    db_book.image_url = image_url
+    # La imagen se guarda por contenido y los tamaños reducidos se generan después de responder
+    image = media.store_upload(file, media.BOOK_IMAGES_DIR)
+    background_tasks.add_task(media.generate_variants, image.path)
+    # Cuando existan los tamaños reducidos cambia `image_variants`: se invalida otra vez
+    background_tasks.add_task(response_cache.invalidate, *response_cache.book_tags(db_book.id, db_book.user_id))
+    db_book.image_url = image.url
     db.commit()
     db.refresh(db_book)
     return db_book
 
-@router.get("/books/", response_model=List[schemas.Book], description="Obtiene una lista de libros con opciones de búsqueda y filtrado.")
-def read_books(
-    skip: int = 0, limit: int = 100,
+async def _page_by_id(db: AsyncSession, statement, cursor: Optional[str], limit: int) -> schemas.BookPage:
+    """Pagina por keyset sobre `Book.id` (más recientes primero) cargando las categorías en lote."""
+    after = pagination.decode_cursor(cursor, id=int)
+    if after:
+        statement = statement.where(models.Book.id < after["id"])
+    statement = statement.options(selectinload(models.Book.categories)).order_by(models.Book.id.desc())
+    books = (await db.scalars(statement.limit(limit + 1))).all()
+    books, next_cursor = pagination.split_page(books, limit, lambda book: {"id": book.id})
+    return schemas.BookPage(items=books, next_cursor=next_cursor)
+
+@router.get("/books/", response_model=schemas.BookPage, description="Obtiene una lista de libros con opciones de búsqueda y filtrado.")
+async def read_books(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
     title: Optional[str] = None,
     author: Optional[str] = None,
     publication_date: Optional[date] = None,
@@ -92,42 +116,116 @@ def read_books(
     tags: Optional[str] = None,
     idioma: Optional[str] = None,
     estado: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    clauses = facets.book_filter_clauses(
+        title=title, author=author, publication_date=publication_date, editorial=editorial, edicion=edicion,
+        category=category, tags=tags, idioma=idioma, estado=estado,
+    )
+    statement = select(models.Book).where(*clauses.values())
+    return await response_cache.cached_response_async(
+        request, schemas.BookPage, ["books"], lambda: _page_by_id(db, statement, cursor, limit)
+    )
+
+@router.get("/books/facets", response_model=schemas.BookFacets, description="Cuántos libros hay por categoría, idioma, estado y década para los filtros de GET /books/.")
+def read_book_facets(
+    request: Request,
+    title: Optional[str] = None,
+    author: Optional[str] = None,
+    publication_date: Optional[date] = None,
+    editorial: Optional[str] = None,
+    edicion: Optional[str] = None,
+    category: Optional[str] = None,
+    tags: Optional[str] = None,
+    idioma: Optional[str] = None,
+    estado: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Acepta los mismos filtros que GET /books/. Cada faceta se cuenta sin su
+    propio filtro, para mostrar cuántos libros tendría cada opción. Sin filtros
+    los conteos salen de la tabla precalculada book_facet_counts.
+    """
+    clauses = facets.book_filter_clauses(
+        title=title, author=author, publication_date=publication_date, editorial=editorial, edicion=edicion,
+        category=category, tags=tags, idioma=idioma, estado=estado,
+    )
+    return response_cache.cached_response(request, schemas.BookFacets, ["books"], lambda: facets.facet_counts(db, clauses))
+
+@router.get("/books/search", response_model=schemas.BookPage, description="Búsqueda de texto completo en el catálogo, ordenada por relevancia.")
+def search_books(
+    q: str = Query(..., min_length=1),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Busca libros por título, autor, editorial, etiquetas y categorías.
+    Cada término se compara por prefijo y sin distinguir mayúsculas ni tildes.
+    """
+    query, rank = search.search_books_query(db, q)
+    if query is None:
+        return schemas.BookPage(items=[])
+    after = pagination.decode_cursor(cursor, rank=float, id=int)
+    if after:
+        query = query.filter(or_(rank < after["rank"], and_(rank == after["rank"], models.Book.id > after["id"])))
+    query = (
+        query.add_columns(rank)
+        .options(selectinload(models.Book.categories))
+        .order_by(rank.desc(), models.Book.id)
+    )
+    rows, next_cursor = pagination.paginate(query, limit, lambda row: {"rank": row[1], "id": row[0].id})
+    return schemas.BookPage(items=[book for book, _ in rows], next_cursor=next_cursor)
+
+@router.get("/books/my-books", response_model=schemas.BookPage)
+async def read_my_books(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: models.User = Depends(security.get_async_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(models.Book)
-    if title:
-        query = query.filter(models.Book.title.ilike(f"%{title}%"))
-    if author:
-        query = query.filter(models.Book.author.ilike(f"%{author}%"))
-    if publication_date:
-        query = query.filter(models.Book.publication_date == publication_date)
-    if editorial:
-        query = query.filter(models.Book.editorial.ilike(f"%{editorial}%"))
-    if edicion:
-        query = query.filter(models.Book.edicion.ilike(f"%{edicion}%"))
-    if category:
-        # Lógica para filtrar por categoría
-        query = query.join(models.Book.categories).filter(models.Category.name.ilike(f"%{category}%"))
-    if tags:
-        query = query.filter(models.Book.tags.ilike(f"%{tags}%"))
-    if idioma:
-        query = query.filter(models.Book.idioma.ilike(f"%{idioma}%"))
-    if estado:
-        query = query.filter(models.Book.estado.ilike(f"%{estado}%"))
-    books = query.offset(skip).limit(limit).all()
-    return books
-
-@router.get("/books/my-books", response_model=List[schemas.Book])
-def read_my_books(current_user: models.User = Depends(security.get_current_user), db: Session = Depends(get_db)):
-    books = db.query(models.Book).filter(models.Book.user_id == current_user.id).all()
-    return books
+    statement = select(models.Book).where(models.Book.user_id == current_user.id)
+    return await _page_by_id(db, statement, cursor, limit)
+
+@router.get("/books/export", description="Descarga el catálogo completo (libros, categorías y dueño) en NDJSON o CSV.")
+def export_books(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    x_export_token: Optional[str] = Header(None)
+):
+    """
+    Para volcados de operación (backups, analítica): requiere el header
+    X-Export-Token con el valor de EXPORT_TOKEN y admite una sola exportación a la
+    vez por worker. Se envía en streaming desde un cursor del servidor, así que la
+    memoria no depende del tamaño del catálogo. Con `gzip=true` se comprime al vuelo.
+    Equivale a `python -m app.catalog_export`.
+    """
+    if not catalog_export.is_export_token(x_export_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Exportación no autorizada")
+    stream = catalog_export.exclusive_export(format, gzip)
+    if stream is None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Ya hay una exportación en curso, intenta nuevamente más tarde.",
+            headers={"Retry-After": "60"},
+        )
+    media_type = "application/gzip" if gzip else catalog_export.FORMATS[format]
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{catalog_export.filename(format, gzip)}"'},
+    )
 
 @router.get("/books/{book_id}", response_model=schemas.Book)
-def read_book(book_id: int, db: Session = Depends(get_db)):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if db_book is None:
-        raise HTTPException(status_code=404, detail="Libro no encontrado")
-    return db_book
+async def read_book(book_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def produce():
+        db_book = await db.scalar(
+            select(models.Book).options(selectinload(models.Book.categories)).where(models.Book.id == book_id)
+        )
+        if db_book is None:
+            raise HTTPException(status_code=404, detail="Libro no encontrado")
+        return db_book
+    return await response_cache.cached_response_async(request, schemas.Book, [f"book:{book_id}"], produce)
 
 # ✅ PUT modificado para aceptar JSON plano desde Postman (application/json)
 @router.put("/books/{book_id}", response_model=schemas.Book)
@@ -140,18 +238,7 @@ def update_book(book_id: int, book: schemas.BookUpdate, current_user: models.Use
 
     # Si hay categorías en la actualización, las procesamos
     if book.categories is not None:
-        category_names = book.categories
-        categories = []
-        for name in category_names:
-            category = db.query(models.Category).filter(models.Category.name.ilike(name)).first()
-            if not category:
-                # Si no existe, la crea
-                category = models.Category(name=name)
-                db.add(category)
-                db.commit()
-                db.refresh(category)
-            categories.append(category)
-        db_book.categories = categories # Asocia las nuevas categorías al libro
+        db_book.categories = resolve_categories(db, book.categories) # Asocia las nuevas categorías al libro
         
     # Actualiza el resto de los campos
     for key, value in book.dict(exclude_unset=True, exclude={"categories"}).items():
@@ -175,6 +262,7 @@ def delete_book(book_id: int, current_user: models.User = Depends(security.get_c
 @router.put("/books/{book_id}/upload-image", response_model=schemas.Book)
 def update_book_image(
     book_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: models.User = Depends(security.get_current_user),
     db: Session = Depends(get_db)
@@ -185,20 +273,30 @@ def update_book_image(
     if db_book.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="No autorizado")
 
-    image_url = save_image(file)
-    db_book.image_url = image_url
+    # La imagen se guarda por contenido y los tamaños reducidos se generan después de responder
+    image = media.store_upload(file, media.BOOK_IMAGES_DIR)
+    background_tasks.add_task(media.generate_variants, image.path)
+    # Cuando existan los tamaños reducidos cambia `image_variants`: se invalida otra vez
+    background_tasks.add_task(response_cache.invalidate, *response_cache.book_tags(db_book.id, db_book.user_id))
+    db_book.image_url = image.url
     db.commit()
     db.refresh(db_book)
     return db_book
 
 # 🎉 NUEVO ENDPOINT PARA OBTENER LOS LIBROS DE UN USUARIO ESPECÍFICO 🎉
-@router.get("/books/user-books/{user_id}", response_model=List[schemas.Book])
-def get_user_books(user_id: int, db: Session = Depends(get_db)):
+@router.get("/books/user-books/{user_id}", response_model=schemas.BookPage)
+async def get_user_books(
+    user_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db)
+):
     """
-    Obtiene todos los libros publicados por un usuario específico por su ID.
+    Obtiene los libros publicados por un usuario específico por su ID, paginados por cursor.
+    Devuelve una página vacía si no hay libros, en lugar de un error 404.
     """
-    books = db.query(models.Book).filter(models.Book.user_id == user_id).all()
-    if not books:
-        # Devuelve una lista vacía si no hay libros, en lugar de un error 404.
-        return []
-    return books
\ No newline at end of file
+    statement = select(models.Book).where(models.Book.user_id == user_id)
+    return await response_cache.cached_response_async(
+        request, schemas.BookPage, [f"user-books:{user_id}"], lambda: _page_by_id(db, statement, cursor, limit)
+    )
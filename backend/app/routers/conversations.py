@@ -1,45 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List
-from .. import models, schemas
-from ..database import get_db
-from app.security import get_current_user
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, case, or_, select
+from typing import Optional
+from .. import models, schemas, pagination, presence
+from ..database import get_async_read_db, get_db
+from app.security import get_async_current_user, get_current_user
 
 router = APIRouter(prefix="/conversations", tags=["Conversations"])
 
-@router.get("/", response_model=List[schemas.conversation.ConversationOut])
-def get_my_conversations(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+
+def find_conversation(db: Session, user_id: int, other_user_id: int) -> Optional[models.Conversation]:
+    """Busca la conversación entre dos usuarios, sin importar quién la inició."""
+    return db.query(models.Conversation).filter(
+        or_(
+            (models.Conversation.user1_id == user_id) & (models.Conversation.user2_id == other_user_id),
+            (models.Conversation.user1_id == other_user_id) & (models.Conversation.user2_id == user_id)
+        )
+    ).first()
+
+
+def get_or_create_conversation(db: Session, user_id: int, other_user_id: int) -> models.Conversation:
+    """Devuelve la conversación entre dos usuarios, creándola si todavía no existe."""
+    conversation = find_conversation(db, user_id, other_user_id)
+    if conversation is None:
+        conversation = models.Conversation(user1_id=user_id, user2_id=other_user_id)
+        db.add(conversation)
+        db.commit()
+        db.refresh(conversation)
+        # Los indicadores de escritura y presencia se habilitan sin reconectar
+        presence.tracker.conversation_created(user_id, other_user_id)
+    return conversation
+
+
+def inbox_statement(user_id: int, cursor: Optional[str] = None):
     """
-    Obtiene todas las conversaciones del usuario actual con los últimos mensajes.
+    Consulta única de la bandeja de entrada: cada conversación del usuario con el
+    otro participante, su último mensaje (vía `last_message_id`) y los no leídos
+    del usuario, de la más reciente a la más antigua y filtrada por el cursor.
     """
-    conversations = db.query(models.Conversation).filter(
-        (models.Conversation.user1_id == current_user.id) |
-        (models.Conversation.user2_id == current_user.id)
-    ).all()
+    Conversation = models.Conversation
+    other = aliased(models.User)
+    other_id = case((Conversation.user1_id == user_id, Conversation.user2_id), else_=Conversation.user1_id)
+    unread = case((Conversation.user1_id == user_id, Conversation.user1_unread_count), else_=Conversation.user2_unread_count)
 
-    result = []
-    for convo in conversations:
-        other = convo.user2 if convo.user1_id == current_user.id else convo.user1
-        last_message = (
-            db.query(models.Message)
-            .filter(models.Message.conversation_id == convo.id)
-            .order_by(models.Message.timestamp.desc())
-            .first()
+    statement = (
+        select(
+            Conversation.id,
+            Conversation.created_at,
+            Conversation.last_message_at,
+            other.id.label("other_user_id"),
+            other.username.label("other_user_name"),
+            models.Message.content.label("last_message"),
+            models.Message.timestamp.label("last_message_time"),
+            unread.label("unread_count"),
         )
-
-        result.append(schemas.conversation.ConversationOut(
-            id=convo.id,
-            other_user_id=other.id,
-            other_user_name=other.username,
-            created_at=convo.created_at,
-            last_message=last_message.content if last_message else None,
-            last_message_time=last_message.timestamp if last_message else None
+        .join(other, other.id == other_id)
+        .outerjoin(models.Message, models.Message.id == Conversation.last_message_id)
+        .where(or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id))
+    )
+    after = pagination.decode_cursor(cursor, at=datetime.fromisoformat, id=int)
+    if after:
+        statement = statement.where(or_(
+            Conversation.last_message_at < after["at"],
+            and_(Conversation.last_message_at == after["at"], Conversation.id < after["id"]),
         ))
+    return statement.order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+
+
+def inbox_cursor(row) -> dict:
+    """Clave de paginación de una fila de `inbox_statement`."""
+    return {"at": row.last_message_at.isoformat(), "id": row.id}
 
-    result.sort(key=lambda x: x.last_message_time or x.created_at, reverse=True)
 
-    return result
+@router.get("/", response_model=schemas.conversation.ConversationPage)
+async def get_my_conversations(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_async_current_user)
+):
+    """
+    Obtiene las conversaciones del usuario actual con su último mensaje, de la más
+    reciente a la más antigua, resueltas en una sola consulta.
+    """
+    rows, next_cursor = await pagination.paginate_async(db, inbox_statement(current_user.id, cursor), limit, inbox_cursor)
+    items = [
+        schemas.conversation.ConversationOut(
+            id=row.id,
+            other_user_id=row.other_user_id,
+            other_user_name=row.other_user_name,
+            created_at=row.created_at,
+            last_message=row.last_message,
+            last_message_time=row.last_message_time,
+            unread_count=row.unread_count,
+        )
+        for row in rows
+    ]
+    return schemas.conversation.ConversationPage(items=items, next_cursor=next_cursor)
 
 @router.post("/", response_model=schemas.conversation.ConversationOut)
 def start_conversation(convo_data: schemas.conversation.ConversationCreate,
@@ -51,34 +110,11 @@ def start_conversation(convo_data: schemas.conversation.ConversationCreate,
     if convo_data.receiver_id == current_user.id:
         raise HTTPException(status_code=400, detail="No puedes iniciar conversación contigo mismo.")
 
-    existing = db.query(models.Conversation).filter(
-        or_(
-            (models.Conversation.user1_id == current_user.id) & (models.Conversation.user2_id == convo_data.receiver_id),
-            (models.Conversation.user1_id == convo_data.receiver_id) & (models.Conversation.user2_id == current_user.id)
-        )
-    ).first()
-
-    if existing:
-        other = existing.user2 if existing.user1_id == current_user.id else existing.user1
-        return schemas.conversation.ConversationOut(
-            id=existing.id,
-            other_user_id=other.id,
-            other_user_name=other.username,
-            created_at=existing.created_at
-        )
-
-    new_convo = models.Conversation(
-        user1_id=current_user.id,
-        user2_id=convo_data.receiver_id
-    )
-    db.add(new_convo)
-    db.commit()
-    db.refresh(new_convo)
-
-    other = new_convo.user2
+    convo = get_or_create_conversation(db, current_user.id, convo_data.receiver_id)
+    other = convo.user2 if convo.user1_id == current_user.id else convo.user1
     return schemas.conversation.ConversationOut(
-        id=new_convo.id,
+        id=convo.id,
         other_user_id=other.id,
         other_user_name=other.username,
-        created_at=new_convo.created_at
-    )
\ No newline at end of file
+        created_at=convo.created_at
+    )
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import matching, models, pagination, schemas
+from ..database import get_db, get_read_db
+from app.security import get_current_user
+
+router = APIRouter(prefix="/exchanges", tags=["Exchanges"])
+
+
+@router.get("/wishlist", response_model=List[schemas.WishlistItem])
+def get_my_wishlist(db: Session = Depends(get_read_db), current_user: models.User = Depends(get_current_user)):
+    """Lista de deseos del usuario actual, de lo más reciente a lo más antiguo."""
+    return (
+        db.query(models.WishlistItem)
+        .filter(models.WishlistItem.user_id == current_user.id)
+        .order_by(models.WishlistItem.id.desc())
+        .all()
+    )
+
+
+@router.post("/wishlist", response_model=schemas.WishlistItem)
+def add_to_wishlist(item: schemas.WishlistItemCreate,
+                    db: Session = Depends(get_db),
+                    current_user: models.User = Depends(get_current_user)):
+    """
+    Agrega un título, autor o categoría buscado. La comparación con los libros
+    publicados ignora mayúsculas, tildes y puntuación.
+    """
+    key = matching.match_key(item.kind, item.value)
+    if key is None:
+        raise HTTPException(status_code=400, detail="El valor buscado no puede estar vacío.")
+    exists = db.query(models.WishlistItem.id).filter(
+        models.WishlistItem.user_id == current_user.id, models.WishlistItem.key == key
+    ).first()
+    if exists:
+        raise HTTPException(status_code=409, detail="Ya está en tu lista de deseos.")
+
+    wish = models.WishlistItem(user_id=current_user.id, kind=item.kind, value=item.value.strip(), key=key)
+    db.add(wish)
+    db.commit()
+    db.refresh(wish)
+    return wish
+
+
+@router.delete("/wishlist/{item_id}", response_model=dict)
+def remove_from_wishlist(item_id: int,
+                         db: Session = Depends(get_db),
+                         current_user: models.User = Depends(get_current_user)):
+    wish = db.query(models.WishlistItem).filter(models.WishlistItem.id == item_id).first()
+    if wish is None:
+        raise HTTPException(status_code=404, detail="Deseo no encontrado")
+    if wish.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    db.delete(wish)
+    db.commit()
+    return {"message": "Deseo eliminado de la lista"}
+
+
+@router.get("/matches", response_model=schemas.ExchangeMatchPage)
+def get_my_matches(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Usuarios con los que hay un intercambio posible en ambos sentidos, primero
+    los que tienen más coincidencias del lado más débil.
+    """
+    rows, next_cursor = pagination.paginate(
+        matching.matches_query(db, current_user.id, cursor), limit,
+        lambda row: {"score": row.score, "id": row.user_id},
+    )
+    items = [schemas.ExchangeMatch.model_validate(row) for row in rows]
+    return schemas.ExchangeMatchPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/matches/{user_id}", response_model=schemas.ExchangeMatchDetail)
+def get_match_detail(
+    user_id: int,
+    limit: int = Query(20, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Libros concretos del intercambio con otro usuario: los que le das y los que recibes."""
+    other = db.query(models.User).filter(models.User.id == user_id).first()
+    if other is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return schemas.ExchangeMatchDetail(
+        user_id=other.id,
+        username=other.username,
+        you_give=matching.matching_books(db, current_user.id, other.id, limit),
+        you_get=matching.matching_books(db, other.id, current_user.id, limit),
+    )
@@ -1,175 +1,246 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException, status
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, HTTPException, status
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Dict
-from app import models, schemas
-from app.security import get_current_user, get_db, verify_access_token
+from typing import Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from app import chat_manager, message_writer, metrics, models, read_receipts, schemas, pagination
+from app.database import SessionLocal, get_async_read_db, get_db
+from app.security import get_async_current_user, get_current_user
+from app.routers.conversations import find_conversation, get_or_create_conversation, inbox_cursor, inbox_statement
 
 router = APIRouter(
     prefix="/messages",
     tags=["Messages"]
 )
 
+logger = logging.getLogger(__name__)
+
+MESSAGES_SENT = metrics.Counter("chat_messages_sent", "Mensajes enviados, por vía (rest o websocket).", ("transport",))
+MESSAGES_FAILED = metrics.Counter("chat_messages_failed", "Mensajes enviados por WebSocket que no se pudieron guardar.")
+
 # --- REST para historial ---
 @router.post("/", response_model=schemas.message.MessageResponse)
 def send_message(message: schemas.message.MessageCreate, db: Session = Depends(get_db), current_user: models.user.User = Depends(get_current_user)):
+    conversation = get_or_create_conversation(db, current_user.id, message.receiver_id)
     new_message = models.message.Message(
         sender_id=current_user.id,
         receiver_id=message.receiver_id,
-        content=message.content
+        content=message.content,
+        conversation_id=conversation.id
     )
     db.add(new_message)
     db.commit()
     db.refresh(new_message)
+    MESSAGES_SENT.inc("rest")
     return new_message
 
-@router.get("/conversation/{user_id}", response_model=List[schemas.message.MessageResponse])
-def get_conversation(user_id: int, db: Session = Depends(get_db), current_user: models.user.User = Depends(get_current_user)):
-    messages = db.query(models.message.Message).filter(
-        ((models.message.Message.sender_id == current_user.id) & (models.message.Message.receiver_id == user_id)) |
-        ((models.message.Message.sender_id == user_id) & (models.message.Message.receiver_id == current_user.id))
-    ).order_by(models.message.Message.timestamp.asc()).all()
-    return messages
+@router.get("/conversation/{user_id}", response_model=schemas.message.MessageHistoryPage)
+async def get_conversation(
+    user_id: int,
+    before_id: Optional[int] = None,
+    since_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.user.User = Depends(get_async_current_user)
+):
+    """
+    Historial con `user_id`, en orden cronológico y por páginas de `limit` mensajes.
+    Sin parámetros devuelve los últimos; con `before_id`, los anteriores a ese id
+    (para cargar más hacia atrás); con `since_id`, sólo los posteriores, para que el
+    cliente sincronice lo que le falta desde su `high_water_mark`. Las tres variantes
+    recorren el índice (conversation_id, id), así que cuestan lo mismo sin importar
+    el largo de la conversación.
+    """
+    if before_id is not None and since_id is not None:
+        raise HTTPException(status_code=400, detail="before_id y since_id no se pueden combinar.")
+
+    Message, Conversation = models.message.Message, models.Conversation
+    conversation_id = select(Conversation.id).where(or_(
+        (Conversation.user1_id == current_user.id) & (Conversation.user2_id == user_id),
+        (Conversation.user1_id == user_id) & (Conversation.user2_id == current_user.id)
+    )).limit(1).scalar_subquery()
+    statement = select(Message).where(Message.conversation_id == conversation_id)
+
+    if since_id is not None:
+        statement = statement.where(Message.id > since_id).order_by(Message.id.asc())
+    else:
+        if before_id is not None:
+            statement = statement.where(Message.id < before_id)
+        statement = statement.order_by(Message.id.desc())
+
+    messages = (await db.scalars(statement.limit(limit + 1))).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+
+    if since_id is not None:
+        high_water_mark = messages[-1].id if messages else since_id
+    else:
+        messages.reverse()
+        high_water_mark = messages[-1].id if messages and before_id is None else None
+    return schemas.message.MessageHistoryPage(items=messages, has_more=has_more, high_water_mark=high_water_mark)
+
+@router.post("/conversation/{user_id}/read", response_model=schemas.message.ReadState)
+async def mark_conversation_read(user_id: int, receipt: schemas.message.ReadReceiptCreate,
+                                 db: Session = Depends(get_db),
+                                 current_user: models.user.User = Depends(get_current_user)):
+    """
+    Marca como leídos los mensajes recibidos de `user_id` hasta `up_to_id`.
+    Las marcas se juntan con las de otras pestañas y conexiones antes de escribirse,
+    y el otro participante recibe el aviso de lectura por su WebSocket.
+    """
+    conversation = await run_in_threadpool(find_conversation, db, current_user.id, user_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversación no encontrada")
+    state = await read_receipts.writer.submit(conversation.id, current_user.id, receipt.up_to_id)
+    if state is None:
+        return schemas.message.ReadState(conversation_id=conversation.id, unread_count=0)
+    return schemas.message.ReadState(**state)
+
+@router.get("/unread", response_model=schemas.message.UnreadSummary)
+async def get_unread_total(db: AsyncSession = Depends(get_async_read_db), current_user: models.user.User = Depends(get_async_current_user)):
+    """Total de mensajes sin leer del usuario: suma los contadores de sus conversaciones."""
+    Conversation = models.Conversation
+    total = await db.scalar(select(func.coalesce(func.sum(
+        case((Conversation.user1_id == current_user.id, Conversation.user1_unread_count), else_=Conversation.user2_unread_count)
+    ), 0)).where(or_(Conversation.user1_id == current_user.id, Conversation.user2_id == current_user.id)))
+    return schemas.message.UnreadSummary(total=total)
 
 # --- WebSocket para chat en tiempo real ---
-active_connections: Dict[int, WebSocket] = {}
+# Las conexiones se registran en app.chat_manager, que admite varios sockets por
+# usuario y reparte los mensajes entre workers a través del broker configurado.
+# Los mensajes se guardan por lotes con app.message_writer, fuera del event loop.
+# Cada evento lleva un "type": "message" para los mensajes, "read" para avisar al
+# emisor que el otro leyó hasta un id y "unread" para sincronizar las pestañas del
+# lector. El cliente envía {"type": "read", "conversation_id", "up_to_id"} al leer.
+
+def _authenticate(token: str) -> Optional[int]:
+    """Resuelve el token igual que las rutas REST (caché de identidades y token_epoch)."""
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db).id
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+def _conversation_id(user_id: int, receiver_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return get_or_create_conversation(db, user_id, receiver_id).id
+    finally:
+        db.close()
+
+async def _deliver_when_durable(pending: asyncio.Queue):
+    """Entrega los mensajes de una conexión, en orden, a medida que sus lotes quedan guardados."""
+    while True:
+        future = await pending.get()
+        if future is None:
+            return
+        try:
+            message = await future
+        except Exception as e:
+            logger.error(f"No se pudo guardar el mensaje: {e}")
+            MESSAGES_FAILED.inc()
+            continue
+        payload = {
+            "type": "message",
+            "id": message["id"],
+            "sender_id": message["sender_id"],
+            "receiver_id": message["receiver_id"],
+            "content": message["content"],
+            "timestamp": message["timestamp"].isoformat(),
+            "is_read": False,
+            "conversation_id": message["conversation_id"]
+        }
+        # Se entrega en todas las conexiones del receptor y también en las del
+        # emisor, que recibe así la confirmación de que el mensaje quedó guardado
+        await chat_manager.send_to_user(message["receiver_id"], payload)
+        await chat_manager.send_to_user(message["sender_id"], payload)
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, token: str):
     """
     Gestiona la conexión WebSocket para el chat en tiempo real.
     """
-    try:
-        username = verify_access_token(token)
-    except HTTPException:
-        await websocket.close(code=status.HTTP_401_UNAUTHORIZED)
-        return
-        
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if not user:
+    user_id = await run_in_threadpool(_authenticate, token)
+    if not user_id:
         await websocket.close(code=status.HTTP_401_UNAUTHORIZED)
         return
 
     await websocket.accept()
-    active_connections[user.id] = websocket
+    await chat_manager.connect(user_id, websocket)
+
+    # Conversaciones ya resueltas en esta conexión: receptor -> conversation_id
+    conversations: Dict[int, int] = {}
+    pending: asyncio.Queue = asyncio.Queue()
+    delivery = asyncio.create_task(_deliver_when_durable(pending))
 
     try:
         while True:
             data = await websocket.receive_json()
+            if data.get("type") == "read":
+                # Las marcas se fusionan en app.read_receipts; no se espera la escritura
+                conversation_id, up_to_id = data.get("conversation_id"), data.get("up_to_id")
+                if isinstance(conversation_id, int) and isinstance(up_to_id, int):
+                    read_receipts.writer.submit(conversation_id, user_id, up_to_id)
+                continue
+
             receiver_id = data.get("receiver_id")
             content = data.get("content")
 
             if not receiver_id or not content:
                 continue
 
-            # Buscar o crear la conversación.
-            conversation = db.query(models.Conversation).filter(
-                or_(
-                    (models.Conversation.user1_id == user.id) & (models.Conversation.user2_id == receiver_id),
-                    (models.Conversation.user1_id == receiver_id) & (models.Conversation.user2_id == user.id)
-                )
-            ).first()
-
-            if not conversation:
-                new_convo = models.Conversation(
-                    user1_id=user.id,
-                    user2_id=receiver_id
-                )
-                db.add(new_convo)
-                db.commit()
-                db.refresh(new_convo)
-                conversation = new_convo
-
-            # Crear el nuevo mensaje con el conversation_id
-            new_message = models.Message(
-                sender_id=user.id,
-                receiver_id=receiver_id,
-                content=content,
-                conversation_id=conversation.id  # Asignamos el ID de la conversación aquí
-            )
-            db.add(new_message)
-            db.commit()
-            db.refresh(new_message)
-
-            # Si el receptor está conectado, le enviamos el mensaje
-            if receiver_id in active_connections:
-                await active_connections[receiver_id].send_json({
-                    "id": new_message.id,
-                    "sender_id": user.id,
-                    "receiver_id": receiver_id,
-                    "content": content,
-                    "timestamp": new_message.timestamp.isoformat(),
-                    "is_read": False,
-                    "conversation_id": new_message.conversation_id
-                })
-            
-            # También enviamos el mensaje al emisor para que se refleje en su UI
-            await active_connections[user.id].send_json({
-                "id": new_message.id,
-                "sender_id": user.id,
-                "receiver_id": receiver_id,
-                "content": content,
-                "timestamp": new_message.timestamp.isoformat(),
-                "is_read": False,
-                "conversation_id": new_message.conversation_id
-            })
+            # Buscar o crear la conversación (sólo la primera vez por receptor).
+            conversation_id = conversations.get(receiver_id)
+            if conversation_id is None:
+                conversation_id = await run_in_threadpool(_conversation_id, user_id, receiver_id)
+                conversations[receiver_id] = conversation_id
+
+            future = await message_writer.writer.submit(user_id, receiver_id, conversation_id, content)
+            pending.put_nowait(future)
+            MESSAGES_SENT.inc("websocket")
 
     except WebSocketDisconnect:
-        # La conexión se cierra, eliminamos el usuario de las conexiones activas
-        active_connections.pop(user.id, None)
+        # La conexión se cierra, la quitamos de las conexiones activas
+        await chat_manager.disconnect(user_id, websocket)
     except Exception as e:
         # Manejo de cualquier otra excepción para evitar que el proceso se detenga
-        print(f"Error inesperado en WebSocket: {e}")
-        active_connections.pop(user.id, None)
+        logger.error(f"Error inesperado en WebSocket: {e}")
+        await chat_manager.disconnect(user_id, websocket)
         await websocket.close(code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-
-@router.get("/partners", response_model=List[schemas.message.ConversationPreview])
-def get_conversation_partners(
-    db: Session = Depends(get_db),
-    current_user: models.user.User = Depends(get_current_user)
+    finally:
+        # Los mensajes ya encolados se siguen entregando al receptor aunque el emisor se haya ido
+        pending.put_nowait(None)
+        await delivery
+
+
+@router.get("/partners", response_model=schemas.message.ConversationPreviewPage)
+async def get_conversation_partners(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.user.User = Depends(get_async_current_user)
 ):
     """
     Devuelve los usuarios con los que el current_user tiene mensajes,
     con el último mensaje y su timestamp para armar la lista de conversaciones.
+    Cada conversación guarda su último mensaje, así que la base devuelve
+    directamente una fila por interlocutor, sin recorrer el historial.
     """
-    msgs = (
-        db.query(models.message.Message)
-        .filter(
-            or_(
-                models.message.Message.sender_id == current_user.id,
-                models.message.Message.receiver_id == current_user.id,
-            )
-        )
-        .order_by(models.message.Message.timestamp.desc())
-        .all()
-    )
-
-    # Tomamos el más reciente por cada "otro usuario"
-    latest_by_other: Dict[int, models.message.Message] = {}
-    for m in msgs:
-        other_id = m.receiver_id if m.sender_id == current_user.id else m.sender_id
-        if other_id not in latest_by_other:
-            latest_by_other[other_id] = m
-
-    if not latest_by_other:
-        return []
-
-    other_ids = list(latest_by_other.keys())
-    users = db.query(models.user.User).filter(models.user.User.id.in_(other_ids)).all()
-    users_map = {u.id: u for u in users}
-
-    previews = []
-    for other_id, m in latest_by_other.items():
-        u = users_map.get(other_id)
-        previews.append(
-            schemas.message.ConversationPreview(
-                user_id=other_id,
-                username=u.username if u else f"Usuario {other_id}",
-                last_message=m.content,
-                last_timestamp=m.timestamp,
-            )
+    statement = inbox_statement(current_user.id, cursor).where(models.Conversation.last_message_id.isnot(None))
+    rows, next_cursor = await pagination.paginate_async(db, statement, limit, inbox_cursor)
+    previews = [
+        schemas.message.ConversationPreview(
+            user_id=row.other_user_id,
+            username=row.other_user_name,
+            last_message=row.last_message,
+            last_timestamp=row.last_message_time,
+            unread_count=row.unread_count,
         )
-    # Opcional: orden por timestamp (ya vienen desc, pero por si acaso)
-    previews.sort(key=lambda x: x.last_timestamp, reverse=True)
-    return previews
\ No newline at end of file
+        for row in rows
+    ]
+    return schemas.message.ConversationPreviewPage(items=previews, next_cursor=next_cursor)
@@ -1,23 +1,22 @@
 # app/routers/users.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Query, UploadFile, File
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models import User
 from app.schemas.user import UserContactSchema
-from app import models, schemas, security
-from app.database import get_db
+from app import media, models, response_cache, schemas, security
+from app.database import get_async_read_db, get_db
 from app.schemas.user import UpdateTelefono
 from fastapi.responses import JSONResponse
 
 import logging
 from typing import List
 import random
-import shutil
 import os
 
-UPLOAD_FOLDER = "static/profile_pictures"
-
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(media.PROFILE_PICTURES_DIR, exist_ok=True)
 router = APIRouter()
 
 logging.basicConfig(level=logging.INFO)
@@ -26,33 +25,28 @@ logging.basicConfig(level=logging.INFO)
 def generate_username_suggestions(db: Session, base_username: str) -> List[str]:
     """Genera una lista de nombres de usuario sugeridos que no están en uso."""
     suggestions = []
-    # Intentar con sufijos numéricos
-    for i in range(1, 6): # Intentar con 1, 2, 3, 4, 5
-        suggestion = f"{base_username}{i}"
-        if not db.query(models.User).filter(models.User.username == suggestion).first():
-            suggestions.append(suggestion)
-            if len(suggestions) >= 3: # Limitar a 3 sugerencias
-                return suggestions
-
-    # Intentar con combinaciones de punto y número
-    if len(suggestions) < 3:
-        for i in range(1, 4):
-            suggestion = f"{base_username}.{i}"
-            if not db.query(models.User).filter(models.User.username == suggestion).first():
-                suggestions.append(suggestion)
-                if len(suggestions) >= 3:
-                    return suggestions
+
+    def take_free(candidates: List[str]) -> None:
+        # Una sola consulta por tanda de candidatos, en lugar de una por candidato
+        taken = {
+            username for (username,) in
+            db.query(models.User.username).filter(models.User.username.in_(candidates))
+        }
+        for candidate in candidates:
+            if candidate not in taken and candidate not in suggestions and len(suggestions) < 3:
+                suggestions.append(candidate)
+
+    # Intentar con sufijos numéricos (1 a 5) y con combinaciones de punto y número
+    take_free([f"{base_username}{i}" for i in range(1, 6)] + [f"{base_username}.{i}" for i in range(1, 4)])
 
     # Intentar con sufijos aleatorios si aún faltan sugerencias
     while len(suggestions) < 3:
-        random_suffix = ''.join(random.choices('0123456789', k=random.randint(2, 4))) # 2 a 4 dígitos
-        suggestion = f"{base_username}_{random_suffix}"
-        if not db.query(models.User).filter(models.User.username == suggestion).first():
-            suggestions.append(suggestion)
-            if len(suggestions) >= 3:
-                return suggestions
-    
-    return suggestions[:3] # Asegurarse de devolver un máximo de 3
+        take_free([
+            f"{base_username}_{''.join(random.choices('0123456789', k=random.randint(2, 4)))}" # 2 a 4 dígitos
+            for _ in range(5)
+        ])
+
+    return suggestions
 
 # --- Endpoint de registro ---
 @router.post("/register/", response_model=schemas.Token)
@@ -80,7 +74,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)): # Usar
         db.commit()
         db.refresh(db_user)
         
-        access_token = security.create_access_token(subject=db_user.username)
+        access_token = security.create_access_token(subject=db_user.username, user=db_user)
         return {
             "access_token": access_token,
             "token_type": "bearer",
@@ -103,13 +97,19 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
             detail="Incorrect username or email",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    if not security.verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = security.verify_and_update_password(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = security.create_access_token(subject=user.username)
+    if new_hash:
+        # El hash usaba un esquema o costo obsoleto: se reemplaza aprovechando el login
+        user.hashed_password = new_hash
+        db.commit()
+        db.refresh(user)
+    access_token = security.create_access_token(subject=user.username, user=user)
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -120,6 +120,24 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
 def read_users_me(current_user: models.User = Depends(security.get_current_user)):
     return current_user
 
+# 🔒 Cierra todas las sesiones: revoca todos los tokens emitidos y devuelve uno nuevo
+@router.post("/users/me/revoke-tokens", response_model=schemas.Token)
+def revoke_tokens(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user),
+):
+    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    user = security.revoke_user_tokens(db, user)
+    access_token = security.create_access_token(subject=user.username, user=user)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": schemas.User.from_orm(user)
+    }
+
 @router.put("/update-telefono/", response_model=schemas.User)
 def update_telefono(
     telefono_data: UpdateTelefono,
@@ -138,26 +156,30 @@ def update_telefono(
     return user
 
 @router.get("/users/{user_id}", response_model=UserContactSchema)
-def get_user_contact(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return user
+async def get_user_contact(user_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def produce():
+        user = await db.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        return user
+    return await response_cache.cached_response_async(request, UserContactSchema, response_cache.user_tags(user_id), produce)
 
 
 # 🎉 NUEVO ENDPOINT PARA OBTENER EL PERFIL COMPLETO DE UN USUARIO 🎉
 @router.get("/users/{user_id}/profile", response_model=schemas.User)
-def get_user_profile(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return user
+async def get_user_profile(user_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def produce():
+        user = await db.get(models.User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        return user
+    return await response_cache.cached_response_async(request, schemas.User, response_cache.user_tags(user_id), produce)
 
 # 🔎 NUEVO ENDPOINT PARA BUSCAR USUARIOS POR NOMBRE 🎉
 @router.get("/users/search/", response_model=List[schemas.User])
-def search_users(
+async def search_users(
     search_term: str = Query(..., alias="name"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Busca usuarios por su nombre de usuario (username).
@@ -165,16 +187,17 @@ def search_users(
     if not search_term:
         return []
 
-    users = db.query(models.User).filter(
-        models.User.username.ilike(f"%{search_term}%")
-    ).limit(10).all()
+    users = await db.scalars(
+        select(models.User).where(models.User.username.ilike(f"%{search_term}%")).limit(10)
+    )
     
-    return users
+    return users.all()
 
 
 # ✅ **Endpoint para subir o actualizar la foto de perfil**
 @router.put("/users/me/profile_picture", response_model=schemas.User)
 def update_profile_picture(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: models.User = Depends(security.get_current_user),
     db: Session = Depends(get_db),
@@ -189,24 +212,19 @@ def update_profile_picture(
         if not user_to_update:
             raise HTTPException(status_code=404, detail="Usuario no encontrado en la base de datos.")
 
-        if not file.content_type.startswith("image/"):
-            raise HTTPException(status_code=400, detail="El archivo debe ser una imagen.")
-
-        file_extension = file.filename.split('.')[-1]
-        file_name = f"user_{user_to_update.id}.{file_extension}"
-        file_path = os.path.join(UPLOAD_FOLDER, file_name)
-
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        profile_picture_url = f"/static/profile_pictures/{file_name}"
+        # Se guarda por contenido (nombre = SHA-256) y los tamaños reducidos se generan después de responder
+        image = media.store_upload(file, media.PROFILE_PICTURES_DIR)
+        background_tasks.add_task(media.generate_variants, image.path)
+        background_tasks.add_task(response_cache.invalidate, *response_cache.user_tags(current_user.id))
 
         # Ahora actualizamos la instancia correcta, que está en la sesión actual
-        user_to_update.profile_picture_url = profile_picture_url
+        user_to_update.profile_picture_url = image.url
         db.commit()
         db.refresh(user_to_update)
 
         return user_to_update
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error al subir la foto de perfil: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error interno del servidor al subir la foto.")
@@ -1,4 +1,5 @@
-from .book import Book, BookCreate, BookUpdate
+from .book import Book, BookCreate, BookUpdate, BookPage, BookFacets
 from .user import User, UserCreate, TokenPayload, ChangePassword, Token
-from .message import MessageCreate, MessageResponse, ConversationPreview
-from .conversation import ConversationBase, ConversationCreate, ConversationOut
\ No newline at end of file
+from .message import MessageCreate, MessageResponse, ConversationPreview, ConversationPreviewPage, ReadReceiptCreate, ReadState, UnreadSummary
+from .conversation import ConversationBase, ConversationCreate, ConversationOut, ConversationPage
+from .exchange import WishlistItem, WishlistItemCreate, ExchangeMatch, ExchangeMatchPage, ExchangeMatchDetail
\ No newline at end of file
@@ -1,7 +1,9 @@
 # app/schemas/book.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from datetime import date
-from typing import Optional, List
+from typing import Dict, Optional, List
+
+from app import media
 
 class CategoryBase(BaseModel):
     name: str
@@ -51,5 +53,28 @@ class Book(BookBase):
     user_id: int
     categories: List[Category]
 
+    # URLs de la portada en cada tamaño (original, thumbnail, medium)
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[Dict[str, str]]:
+        return media.variant_urls(self.image_url)
+
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Página de libros con cursor para pedir la siguiente (None si es la última)
+class BookPage(BaseModel):
+    items: List[Book]
+    next_cursor: Optional[str] = None
+
+# Cantidad de libros para un valor de faceta (p. ej. idioma "Español": 120)
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+# Conteos por faceta de GET /books/facets, ordenados de mayor a menor
+class BookFacets(BaseModel):
+    categories: List[FacetCount]
+    idioma: List[FacetCount]
+    estado: List[FacetCount]
+    publication_decade: List[FacetCount]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ConversationBase(BaseModel):
     user1_id: int
@@ -16,6 +16,11 @@ class ConversationOut(BaseModel):
     created_at: datetime
     last_message: Optional[str] = None
     last_message_time: Optional[datetime] = None
+    unread_count: int = 0
 
     class Config:
         orm_mode = True
+
+class ConversationPage(BaseModel):
+    items: List[ConversationOut]
+    next_cursor: Optional[str] = None
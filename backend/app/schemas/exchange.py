@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from .book import Book
+
+class WishlistItemCreate(BaseModel):
+    kind: Literal["title", "author", "category"]
+    value: str = Field(..., min_length=1, max_length=200)
+
+class WishlistItem(BaseModel):
+    id: int
+    kind: str
+    value: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Usuario con match recíproco: `gives` cuenta lo que tú tienes y el otro busca,
+# `gets` lo que el otro tiene y tú buscas
+class ExchangeMatch(BaseModel):
+    user_id: int
+    username: str
+    profile_picture_url: Optional[str] = None
+    gives: int
+    gets: int
+
+    class Config:
+        from_attributes = True
+
+class ExchangeMatchPage(BaseModel):
+    items: List[ExchangeMatch]
+    next_cursor: Optional[str] = None
+
+# Detalle de un match: los libros concretos de cada lado
+class ExchangeMatchDetail(BaseModel):
+    user_id: int
+    username: str
+    you_give: List[Book]
+    you_get: List[Book]
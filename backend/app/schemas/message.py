@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
 class MessageBase(BaseModel):
     receiver_id: int
@@ -17,13 +18,40 @@ class MessageResponse(BaseModel):
     is_read: bool
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class MessageHistoryPage(BaseModel):
+    # Mensajes en orden cronológico (id ascendente)
+    items: List[MessageResponse]
+    # Hay más mensajes en la dirección pedida: anteriores a items[0] al paginar hacia
+    # atrás, o posteriores a high_water_mark en la sincronización con since_id
+    has_more: bool = False
+    # Id del mensaje más nuevo que el cliente tiene tras aplicar la respuesta; se
+    # envía como since_id en la próxima sincronización. None en páginas con before_id
+    high_water_mark: Optional[int] = None
 
 class ConversationPreview(BaseModel):
     user_id: int
     username: str
     last_message: str
     last_timestamp: datetime
+    unread_count: int = 0
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class ConversationPreviewPage(BaseModel):
+    items: List[ConversationPreview]
+    next_cursor: Optional[str] = None
+
+class ReadReceiptCreate(BaseModel):
+    # Id del último mensaje visto: se marcan leídos todos los recibidos hasta él
+    up_to_id: int
+
+class ReadState(BaseModel):
+    conversation_id: int
+    last_read_id: Optional[int] = None
+    unread_count: int
+
+class UnreadSummary(BaseModel):
+    total: int
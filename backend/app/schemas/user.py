@@ -1,6 +1,8 @@
 # app/schemas/user.py
-from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional # Importar Optional
+from pydantic import BaseModel, ConfigDict, Field, computed_field
+from typing import Dict, Optional # Importar Optional
+
+from app import media
 
 class UserBase(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
@@ -21,6 +23,12 @@ class User(UserBase):
     is_active: bool
     is_verified: bool = False
 
+    # URLs de la foto de perfil en cada tamaño (original, thumbnail, medium)
+    @computed_field
+    @property
+    def profile_picture_variants(self) -> Optional[Dict[str, str]]:
+        return media.variant_urls(self.profile_picture_url)
+
     class Config:
         from_attributes = True
 
@@ -32,6 +40,8 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: str
+    uid: Optional[int] = None  # id del usuario (tokens anteriores sólo traen el username)
+    ep: Optional[int] = None   # token_epoch del usuario al emitir el token
     
 class ChangePassword(BaseModel):
     old_password: str = Field(..., min_length=8)
@@ -49,5 +59,10 @@ class UserContactSchema(BaseModel):
     username: str | None
     profile_picture_url: str | None
 
+    @computed_field
+    @property
+    def profile_picture_variants(self) -> Optional[Dict[str, str]]:
+        return media.variant_urls(self.profile_picture_url)
+
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,130 @@
+# app/search.py
+import re
+import unicodedata
+from typing import List
+
+from sqlalchemy import DDL, Float, cast, event, func, inspect, literal_column, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.models.book import Book
+
+# Campos del libro que forman el documento de búsqueda (las categorías se agregan aparte)
+SEARCH_FIELDS = ("title", "author", "editorial", "tags")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(value: str) -> str:
+    """Pasa el texto a minúsculas y elimina tildes y diacríticos ("Márquez" -> "marquez")."""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(value: str) -> List[str]:
+    """Devuelve los términos normalizados de un texto."""
+    return _TOKEN_RE.findall(normalize_text(value))
+
+
+def build_search_document(book: Book) -> str:
+    """Construye el documento de búsqueda de un libro a partir de sus campos y categorías."""
+    parts = [getattr(book, field) or "" for field in SEARCH_FIELDS]
+    parts.extend(category.name for category in book.categories)
+    return " ".join(tokenize(" ".join(parts)))
+
+
+# --- Mantenimiento del documento de búsqueda ---
+
+@event.listens_for(Session, "before_flush")
+def _refresh_search_documents(session, flush_context, instances):
+    """Recalcula el documento de búsqueda de los libros nuevos o con campos buscables modificados."""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Book):
+            continue
+        state = inspect(obj)
+        if not state.pending and not any(
+            state.attrs[name].history.has_changes() for name in SEARCH_FIELDS + ("categories",)
+        ):
+            continue
+        with session.no_autoflush:
+            obj.search_document = build_search_document(obj)
+
+
+# --- Índices de texto completo ---
+
+# SQLite: tabla FTS5 de contenido externo sincronizada con triggers.
+_SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "search_document, content='books', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, search_document) VALUES ('delete', old.id, old.search_document); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF search_document ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, search_document) VALUES ('delete', old.id, old.search_document); "
+    "INSERT INTO books_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+]
+
+# PostgreSQL: índice GIN de expresión sobre el tsvector del documento.
+# El documento ya llega sin tildes, por eso alcanza con la configuración 'simple'.
+_POSTGRES_FTS_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_books_search_document_fts ON books "
+    "USING gin (to_tsvector('simple', coalesce(search_document, '')))",
+]
+
+for _statement in _SQLITE_FTS_DDL:
+    event.listen(Book.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in _POSTGRES_FTS_DDL:
+    event.listen(Book.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+
+def rebuild_search_index(db: Session) -> int:
+    """Recalcula el documento de todos los libros y reconstruye el índice. Devuelve los libros procesados."""
+    count = 0
+    for book in db.query(Book).yield_per(500):
+        book.search_document = build_search_document(book)
+        count += 1
+    db.flush()
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+    db.commit()
+    return count
+
+
+# --- Consultas ---
+
+def search_books_query(db: Session, q: str):
+    """
+    Devuelve una consulta de libros que coinciden con todos los términos de `q`
+    (con coincidencia por prefijo) y la expresión de relevancia para ordenarla
+    (mayor es mejor), o (None, None) si `q` no tiene términos.
+    """
+    terms = tokenize(q)
+    if not terms:
+        return None, None
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{t}:*" for t in terms))
+        tsvector = func.to_tsvector(literal_column("'simple'"), func.coalesce(Book.search_document, ""))
+        rank = cast(func.ts_rank_cd(tsvector, tsquery), Float)
+        return db.query(Book).filter(tsvector.op("@@")(tsquery)), rank
+
+    if dialect == "sqlite":
+        match = " AND ".join(f'"{t}"*' for t in terms)
+        fts = (
+            select(
+                literal_column("rowid").label("book_id"),
+                # bm25 devuelve valores negativos: cuanto menor, más relevante
+                (-func.bm25(literal_column("books_fts"))).label("rank"),
+            )
+            .select_from(text("books_fts"))
+            .where(literal_column("books_fts").op("MATCH")(match))
+            .subquery()
+        )
+        return db.query(Book).join(fts, fts.c.book_id == Book.id), fts.c.rank
+
+    # Otros motores: búsqueda simple sobre el documento normalizado
+    query = db.query(Book)
+    for t in terms:
+        query = query.filter(or_(Book.search_document.like(f"% {t}%"), Book.search_document.like(f"{t}%")))
+    return query, literal_column("0")
@@ -1,16 +1,19 @@
 # app/security.py
 
 from datetime import datetime, timedelta, timezone # Importa timezone
-from typing import Optional
+from typing import Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt # Importa JWTError
-from passlib.context import CryptContext
 from pydantic import ValidationError # Sigue siendo útil para TokenPayload
 
-from sqlalchemy.orm import Session
-from app.database import SessionLocal # Asumo que get_db usa esto
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from app import password_hashing
+from app.cache import TTLCache
+from app.database import get_async_db, get_db
 from app.models import User # Necesario para get_current_user
 from app.schemas import TokenPayload # Necesario para get_current_user
 
@@ -36,35 +39,53 @@ if not ALGORITHM:
     raise ValueError("ALGORITHM environment variable is not set. Please set it in your .env file or ensure it defaults correctly.")
 
 
-# Configuración de hashing de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token") # Ajustado a "users/token" si ese es tu endpoint de login
+# Configuración de hashing de contraseñas (bcrypt corre en un pool de procesos)
+pwd_context = password_hashing.pwd_context
 
+# Respuesta cuando el pool de hashing está saturado: se rechaza rápido en vez de encolar
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="El servidor está ocupado, intenta nuevamente en unos segundos.",
+        headers={"Retry-After": "1"},
+    )
 
-# Función para obtener la sesión de la base de datos (mantenida aquí según tu código)
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token") # Ajustado a "users/token" si ese es tu endpoint de login
 
 
 # Funciones de seguridad
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica si la contraseña plana coincide con el hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y devuelve (válida, nuevo_hash). `nuevo_hash` no es None
+    cuando el hash guardado es obsoleto y conviene reemplazarlo (deprecated="auto").
+    """
+    try:
+        return password_hashing.hasher.verify_and_update(plain_password, hashed_password)
+    except password_hashing.PasswordHasherBusy:
+        raise _hasher_busy()
 
 
 def get_password_hash(password: str) -> str:
     """Genera un hash para la contraseña."""
-    return pwd_context.hash(password)
+    try:
+        return password_hashing.hasher.hash(password)
+    except password_hashing.PasswordHasherBusy:
+        raise _hasher_busy()
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
-    """Crea un token de acceso JWT."""
+def create_access_token(subject: str, expires_delta: Optional[timedelta] = None, user: Optional[User] = None) -> str:
+    """
+    Crea un token de acceso JWT. Si se pasa `user`, el token incluye su id y su
+    token_epoch para que get_current_user pueda resolverlo sin consultar la base.
+    """
     to_encode = {"sub": str(subject)} # "sub" (subject) es el usuario o ID
+    if user is not None:
+        to_encode.update({"uid": user.id, "ep": user.token_epoch or 0})
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
@@ -109,8 +130,44 @@ def verify_email_token(token: str) -> Optional[str]:
     except Exception: # Captura cualquier otra excepción inesperada
         raise credentials_exception
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Obtiene el usuario actual a partir del token JWT."""
+# --- Caché de identidades ---
+# Guarda una copia de los datos del usuario por id para que las peticiones
+# autenticadas no consulten la base. Se invalida al modificar el usuario en este
+# proceso; en otros workers el dato (y una revocación por token_epoch) puede
+# tardar hasta AUTH_CACHE_TTL_SECONDS en verse.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000))
+
+identity_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+_IDENTITY_FIELDS = ("id", "username", "email", "telefono", "is_active", "is_verified",
+                    "profile_picture_url", "token_epoch")
+
+
+def _remember_user(user: User) -> dict:
+    snapshot = {field: getattr(user, field) for field in _IDENTITY_FIELDS}
+    snapshot["token_epoch"] = snapshot["token_epoch"] or 0
+    identity_cache.set(user.id, snapshot)
+    return snapshot
+
+
+@event.listens_for(User, "after_update")
+def _forget_updated_user(mapper, connection, target):
+    identity_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("updated_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed_users(session):
+    # Se invalida otra vez tras el commit por si otra petición volvió a cachear
+    # los datos viejos entre el UPDATE y la confirmación
+    for user_id in session.info.pop("updated_user_ids", ()):
+        identity_cache.invalidate(user_id)
+
+
+def _token_data(token: str) -> TokenPayload:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales.",
@@ -122,17 +179,73 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenPayload(sub=username)
+        return TokenPayload(sub=username, uid=payload.get("uid"), ep=payload.get("ep"))
     except (JWTError, ValidationError): # Captura ambos tipos de errores
         raise credentials_exception
     except Exception: # Captura cualquier otra excepción inesperada
         raise credentials_exception
 
-    user = db.query(User).filter(User.username == token_data.sub).first()
-    if user is None:
+
+def _user_lookup(token_data: TokenPayload):
+    """Consulta del usuario del token, para cuando no está en la caché de identidades."""
+    if token_data.uid is not None:
+        return select(User).where(User.id == token_data.uid).limit(1)
+    # Tokens emitidos antes de incluir el id: se resuelven por username
+    return select(User).where(User.username == token_data.sub).limit(1)
+
+
+def _identity(token_data: TokenPayload, snapshot: Optional[dict]) -> User:
+    """Usuario (desasociado de toda sesión) a partir de sus datos, si existe y el token no fue revocado."""
+    if snapshot is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario no encontrado.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
\ No newline at end of file
+
+    # Un token emitido antes del último incremento de token_epoch está revocado
+    if token_data.ep is not None and token_data.ep != snapshot["token_epoch"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="El token fue revocado.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return User(**snapshot)
+
+
+def _cached_identity(token_data: TokenPayload) -> Optional[dict]:
+    return identity_cache.get(token_data.uid) if token_data.uid is not None else None
+
+
+def _snapshot(user: Optional[User]) -> Optional[dict]:
+    return _remember_user(user) if user is not None else None
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """
+    Obtiene el usuario actual a partir del token JWT. Con tokens que traen id y
+    token_epoch se resuelve desde la caché de identidades, sin consultar la base.
+    Devuelve una instancia de User no asociada a ninguna sesión.
+    """
+    token_data = _token_data(token)
+    snapshot = _cached_identity(token_data)
+    if snapshot is None:
+        snapshot = _snapshot(db.scalars(_user_lookup(token_data)).first())
+    return _identity(token_data, snapshot)
+
+
+async def get_async_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Como get_current_user, para las rutas `async def`: consulta la base sin bloquear el event loop."""
+    token_data = _token_data(token)
+    snapshot = _cached_identity(token_data)
+    if snapshot is None:
+        snapshot = _snapshot((await db.scalars(_user_lookup(token_data))).first())
+    return _identity(token_data, snapshot)
+
+
+def revoke_user_tokens(db: Session, user: User) -> User:
+    """Incrementa el token_epoch del usuario, invalidando todos sus tokens anteriores."""
+    user.token_epoch = (user.token_epoch or 0) + 1
+    db.commit()
+    db.refresh(user)
+    return user
@@ -1,9 +1,41 @@
 # app/socket_manager.py
+from typing import Optional
+from urllib.parse import parse_qs
+
 import socketio
+from fastapi import HTTPException
+
+from app import security
+from app.database import AsyncSessionLocal
 
 sio = socketio.AsyncServer(cors_allowed_origins="*", async_mode="asgi")
 
-# Mapea socket_id a user_id
+# Mapea socket_id a user_id (todas las conexiones autenticadas)
 sio.sid_user_map = {}
-# Mapea user_id a socket_id (si un usuario tiene múltiples conexiones, puede ser una lista de sids)
-sio.user_sid_map = {}
\ No newline at end of file
+# Mapea user_id al conjunto de socket_ids con latido vigente (ver app/presence.py)
+sio.user_sid_map = {}
+
+
+def user_room(user_id: int) -> str:
+    """Sala de Socket.IO con todas las conexiones de un usuario."""
+    return f"user:{user_id}"
+
+
+def _token(environ: dict, auth) -> Optional[str]:
+    # El cliente lo envía en `auth` ({"token": ...}) o en la query string (?token=...)
+    if isinstance(auth, dict) and auth.get("token"):
+        return auth["token"]
+    tokens = parse_qs(environ.get("QUERY_STRING", "")).get("token")
+    return tokens[0] if tokens else None
+
+
+async def authenticate(environ: dict, auth) -> Optional[int]:
+    """Resuelve el JWT de la conexión igual que las rutas REST; devuelve el user_id o None."""
+    token = _token(environ, auth)
+    if not token:
+        return None
+    async with AsyncSessionLocal() as db:
+        try:
+            return (await security.get_async_current_user(token, db)).id
+        except HTTPException:
+            return None
@@ -0,0 +1,191 @@
+# app/sql_profiler.py
+"""
+Perfilador de SQL por petición. Con SQL_PROFILER=1 registra cada sentencia que
+ejecuta una petición HTTP y su duración, y:
+
+- agrega a la respuesta X-DB-Query-Count (sentencias) y X-DB-Time (ms en la base);
+- avisa en el log cuando una misma forma de consulta (el SQL sin valores) se
+  repite N_PLUS_ONE_THRESHOLD veces o más: probablemente es un N+1;
+- escribe en el log de consultas lentas (SLOW_QUERY_LOG, o el logger
+  "app.sql_profiler.slow") las que superan SLOW_QUERY_MS, con el SQL normalizado
+  y la ruta que la ejecutó.
+
+Sin SQL_PROFILER los eventos no se instalan y no hay ningún costo. Para pruebas,
+`assert_max_queries` acota las consultas de un bloque sin importar el hilo o el
+event loop donde corran, por ejemplo como fixture de pytest:
+
+    @pytest.fixture
+    def max_queries():
+        return sql_profiler.assert_max_queries
+
+    def test_inbox(client, max_queries):
+        with max_queries(2):
+            client.get("/conversations/", headers=auth)
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import route_template
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(f"{__name__}.slow")
+
+SQL_PROFILER = os.getenv("SQL_PROFILER", "").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_logger.addHandler(_handler)
+
+
+# --- Normalización ---
+
+_PLACEHOLDER = r"(?:\?|%\(\w+\)s|%s|:\w+|\$\d+|-?\d+(?:\.\d+)?|'(?:[^']|'')*')"
+_IN_LIST_RE = re.compile(rf"\bIN\s*\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)", re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|:\w+|\$\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Forma de una sentencia: sin valores ni espacios sobrantes y con las listas de IN
+    colapsadas, para que la misma consulta con otros parámetros cuente como una.
+    """
+    statement = _IN_LIST_RE.sub("IN (...)", statement)
+    statement = _LITERAL_RE.sub("?", statement)
+    return _SPACE_RE.sub(" ", statement).strip()
+
+
+# --- Registro ---
+
+class Profile:
+    """Sentencias ejecutadas (SQL y segundos) en una petición o bloque."""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.statements: List[Tuple[str, float]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(elapsed for _, elapsed in self.statements)
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "-"
+        return f"{self.scope['method']} {route_template(self.scope)}"
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Formas de SELECT que se repiten `threshold` veces o más, de la más repetida a la menos."""
+        shapes = Counter(normalize_sql(sql) for sql, _ in self.statements if sql.lstrip()[:6].upper() == "SELECT")
+        return [(shape, n) for shape, n in shapes.most_common() if n >= threshold]
+
+
+# Perfil de la petición en curso (los hilos del threadpool heredan el contexto)
+_current: ContextVar[Optional[Profile]] = ContextVar("sql_profile", default=None)
+# Capturas de assert_max_queries: reciben las sentencias de cualquier hilo
+_captures: List[Profile] = []
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_profiler_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["sql_profiler_start"].pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.statements.append((statement, elapsed))
+    for capture in _captures:
+        capture.statements.append((statement, elapsed))
+    if elapsed * 1000 >= SLOW_QUERY_MS and (profile is not None or SQL_PROFILER):
+        slow_logger.warning(
+            f"{elapsed * 1000:.1f} ms {profile.route if profile else '-'} {normalize_sql(statement)}"
+        )
+
+
+def install() -> None:
+    """Instala los eventos de SQLAlchemy (una sola vez) en todos los engines."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, "before_cursor_execute", _before_execute)
+            event.listen(Engine, "after_cursor_execute", _after_execute)
+            _installed = True
+
+
+class SqlProfilerMiddleware:
+    """Middleware ASGI que perfila las consultas de cada petición HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                # Las sentencias posteriores (p. ej. de una descarga en streaming) no se cuentan
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-db-query-count", str(profile.count).encode()),
+                    (b"x-db-time", f"{profile.total_seconds * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            for shape, n in profile.repeated():
+                logger.warning(f"Probable N+1 en {profile.route}: {n} consultas {shape}")
+
+
+@contextmanager
+def capture() -> Iterator[Profile]:
+    """Registra todas las sentencias ejecutadas mientras el bloque está activo, en cualquier hilo."""
+    install()
+    profile = Profile()
+    _captures.append(profile)
+    try:
+        yield profile
+    finally:
+        _captures.remove(profile)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[Profile]:
+    """Falla con AssertionError si el bloque ejecuta más de `limit` sentencias."""
+    with capture() as profile:
+        yield profile
+    if profile.count > limit:
+        listing = "\n".join(f"  {normalize_sql(sql)}" for sql, _ in profile.statements)
+        raise AssertionError(f"Se ejecutaron {profile.count} consultas (máximo {limit}):\n{listing}")
@@ -0,0 +1,173 @@
+# benchmarks/bench_async_db.py
+"""
+Rendimiento de la capa síncrona (def + Session, en el threadpool) frente a la
+asíncrona (async def + AsyncSession) con muchos clientes concurrentes. Las dos
+variantes ejecutan las mismas consultas (bandeja de entrada y libros de un
+usuario, con autenticación) sobre la misma base sembrada con benchmarks/dataset.py,
+en una aplicación ASGI dentro del mismo proceso.
+
+Con --db-wait-ms cada petición espera además ese tiempo dentro de la base
+(pg_sleep en PostgreSQL; en SQLite, una función registrada en la conexión), como
+haría una consulta lenta o una base remota: ahí se ve si la concurrencia queda
+limitada por los hilos del threadpool o por el pool de conexiones. Para medir
+con un pool más grande, ajustar DB_POOL_SIZE / DB_MAX_OVERFLOW.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_async_db --concurrency 10 100 400 --duration 10
+    DB_POOL_SIZE=100 python -m benchmarks.bench_async_db --concurrency 400 --db-wait-ms 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_async_db.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import event, func, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session, selectinload  # noqa: E402
+
+from app import database, models, pagination, security  # noqa: E402
+from app.database import Base, SessionLocal, engine, get_async_read_db, get_read_db  # noqa: E402
+from app.routers.conversations import inbox_cursor, inbox_statement  # noqa: E402
+from benchmarks import dataset  # noqa: E402
+from benchmarks.load import Recorder  # noqa: E402
+
+
+def _register_sleep(dbapi_connection, connection_record):
+    # La espera corre en el hilo de la conexión: el del threadpool o el de aiosqlite
+    dbapi_connection.create_function("bench_sleep", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+
+if engine.dialect.name == "sqlite":
+    for _engine in (engine, database.async_engine.sync_engine):
+        event.listen(_engine, "connect", _register_sleep)
+
+
+def _wait(wait_ms: float):
+    if engine.dialect.name == "postgresql":
+        return select(func.pg_sleep(wait_ms / 1000))
+    return select(func.bench_sleep(wait_ms))
+
+
+def _books_statement(user_id: int):
+    return (
+        select(models.Book)
+        .where(models.Book.user_id == user_id)
+        .options(selectinload(models.Book.categories))
+        .order_by(models.Book.id.desc())
+        .limit(21)
+    )
+
+
+def build_app(wait_ms: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/inbox")
+    def sync_inbox(db: Session = Depends(get_read_db), current_user: models.User = Depends(security.get_current_user)):
+        if wait_ms:
+            db.execute(_wait(wait_ms))
+        rows = db.execute(inbox_statement(current_user.id).limit(21)).all()
+        return {"items": len(pagination.split_page(rows, 20, inbox_cursor)[0])}
+
+    @app.get("/async/inbox")
+    async def async_inbox(db: AsyncSession = Depends(get_async_read_db),
+                          current_user: models.User = Depends(security.get_async_current_user)):
+        if wait_ms:
+            await db.execute(_wait(wait_ms))
+        rows, _ = await pagination.paginate_async(db, inbox_statement(current_user.id), 20, inbox_cursor)
+        return {"items": len(rows)}
+
+    @app.get("/sync/books/{user_id}")
+    def sync_books(user_id: int, db: Session = Depends(get_read_db)):
+        if wait_ms:
+            db.execute(_wait(wait_ms))
+        return {"items": len(db.scalars(_books_statement(user_id)).all())}
+
+    @app.get("/async/books/{user_id}")
+    async def async_books(user_id: int, db: AsyncSession = Depends(get_async_read_db)):
+        if wait_ms:
+            await db.execute(_wait(wait_ms))
+        return {"items": len((await db.scalars(_books_statement(user_id))).all())}
+
+    return app
+
+
+def _identities(n: int):
+    db = SessionLocal()
+    try:
+        users = db.scalars(select(models.User).order_by(models.User.id).limit(n)).all()
+        return [(user.id, {"Authorization": f"Bearer {security.create_access_token(subject=user.username, user=user)}"})
+                for user in users]
+    finally:
+        db.close()
+
+
+async def _run(app, variant: str, identities, concurrency: int, duration: float) -> dict:
+    recorder = Recorder()
+
+    async def user(seed: int):
+        rnd = random.Random(seed)
+        while time.perf_counter() < deadline:
+            _, headers = rnd.choice(identities)
+            route, url = (("inbox", f"/{variant}/inbox") if rnd.random() < 0.5
+                          else ("books", f"/{variant}/books/{rnd.choice(identities)[0]}"))
+            start = time.perf_counter()
+            try:
+                ok = (await client.get(url, headers=headers)).status_code == 200
+            except Exception:
+                ok = False
+            recorder.record(route, time.perf_counter() - start, ok)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=120) as client:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    await database.dispose_async_engines()
+    return recorder.summary(elapsed)["total"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 400])
+    parser.add_argument("--duration", type=float, default=10, help="segundos por variante y nivel de concurrencia")
+    parser.add_argument("--db-wait-ms", type=float, default=0)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not dataset.counts(db)["users"]:
+            dataset.seed(db, users=args.users, books=args.books, conversations=args.conversations, messages=args.messages)
+    finally:
+        db.close()
+
+    # Una línea de log por petición de httpx distorsionaría la medición
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app = build_app(args.db_wait_ms)
+    identities = _identities(args.users)
+    print(f"{engine.dialect.name}, pool {database.settings.DB_POOL_SIZE}+{database.settings.DB_MAX_OVERFLOW}, "
+          f"espera en la base {args.db_wait_ms:g} ms")
+    for concurrency in args.concurrency:
+        for variant in ("sync", "async"):
+            result = asyncio.run(_run(app, variant, identities, concurrency, args.duration))
+            print(f"{concurrency:5d} clientes  {variant:5s}  {result['rps']:8.1f} req/s   p50 {result['p50_ms']:8.2f} ms   "
+                  f"p95 {result['p95_ms']:8.2f} ms   p99 {result['p99_ms']:8.2f} ms   errores {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_auth.py
+"""
+Microbenchmark de security.get_current_user: compara la resolución con la caché
+de identidades (camino estable) contra una consulta a la base por petición
+(caché vacía, como antes de cachear), contando también las consultas emitidas.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_auth --iterations 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_auth.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import event  # noqa: E402
+
+from app import models, security  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    token = security.create_access_token(subject=user.username, user=user)
+    db.close()
+
+    queries = [0]
+    event.listen(engine, "before_cursor_execute", lambda *a: queries.__setitem__(0, queries[0] + 1))
+
+    for name, clear in (("sin caché", True), ("con caché", False)):
+        security.identity_cache.clear()
+        queries[0] = 0
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            if clear:
+                security.identity_cache.clear()
+            # Una sesión por petición, igual que la dependencia get_db
+            db = SessionLocal()
+            try:
+                security.get_current_user(token, db)
+            finally:
+                db.close()
+        elapsed = time.perf_counter() - start
+        print(f"{name:10s} {elapsed * 1e6 / args.iterations:8.1f} µs/petición  "
+              f"{queries[0] / args.iterations:.2f} consultas/petición")
+
+
+if __name__ == "__main__":
+    main()
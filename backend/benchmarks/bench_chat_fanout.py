@@ -0,0 +1,126 @@
+# benchmarks/bench_chat_fanout.py
+"""
+Prueba de carga del reparto de mensajes de chat entre workers. Cada worker es
+un proceso con su propio RedisBroker y un ConnectionRegistry con N usuarios
+conectados (sockets simulados). Todos publican mensajes a usuarios repartidos
+entre los demás workers y se mide la tasa de entrega total para 1, 2, 4... workers.
+
+Sin --redis-url levanta el servidor RESP de benchmarks/resp_server.py, que corre
+en un solo hilo y termina siendo el cuello de botella; para medir el escalado
+real conviene apuntar a un Redis:
+    python -m benchmarks.bench_chat_fanout --workers 1,2,4 --redis-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import threading
+import time
+
+from app.chat_manager import ConnectionRegistry, RedisBroker
+
+
+def _target(worker: int, i: int, n_workers: int, total_users: int) -> int:
+    # Destino determinista para que cada worker sepa cuántos mensajes va a recibir
+    return (i * 7919 + worker * 104729) % total_users
+
+
+class _FakeSocket:
+    def __init__(self, counter):
+        self._counter = counter
+
+    async def send_json(self, payload):
+        self._counter()
+
+
+async def _worker(url, worker, n_workers, users_per_worker, n_messages, barrier, results):
+    total_users = users_per_worker * n_workers
+    local_users = range(worker * users_per_worker, (worker + 1) * users_per_worker)
+    expected = sum(
+        1
+        for w in range(n_workers)
+        for i in range(n_messages)
+        if _target(w, i, n_workers, total_users) // users_per_worker == worker
+    )
+    received = 0
+    done = asyncio.Event()
+
+    def count():
+        nonlocal received
+        received += 1
+        if received >= expected:
+            done.set()
+
+    registry = ConnectionRegistry()
+    broker = RedisBroker(url, registry.send)
+    await broker.start()
+    for user_id in local_users:
+        registry.add(user_id, _FakeSocket(count))
+        await broker.subscribe(user_id)
+    if expected == 0:
+        done.set()
+
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+    started = time.time()
+    for i in range(n_messages):
+        await broker.publish(_target(worker, i, n_workers, total_users), {"id": i, "content": "hola"})
+    await asyncio.wait_for(done.wait(), timeout=300)
+    results.put((started, time.time(), received))
+    await broker.stop()
+
+
+def _run_worker(*args):
+    asyncio.run(_worker(*args))
+
+
+def run(url: str, n_workers: int, users_per_worker: int, n_messages: int) -> float:
+    barrier = mp.Barrier(n_workers)
+    results = mp.Queue()
+    processes = [
+        mp.Process(target=_run_worker, args=(url, w, n_workers, users_per_worker, n_messages, barrier, results))
+        for w in range(n_workers)
+    ]
+    for p in processes:
+        p.start()
+    rows = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    elapsed = max(end for _, end, _ in rows) - min(start for start, _, _ in rows)
+    delivered = sum(received for _, _, received in rows)
+    return delivered / elapsed
+
+
+def _start_standin_server() -> str:
+    from benchmarks.resp_server import RespPubSubServer
+
+    ready = threading.Event()
+    port = []
+
+    def serve():
+        async def main():
+            port.append(await RespPubSubServer().start())
+            ready.set()
+            await asyncio.Event().wait()
+        asyncio.run(main())
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"redis://127.0.0.1:{port[0]}/0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--users-per-worker", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=5000, help="mensajes publicados por worker")
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    url = args.redis_url or _start_standin_server()
+    print(f"broker={url}")
+    for n in (int(w) for w in args.workers.split(",")):
+        rate = run(url, n, args.users_per_worker, args.messages)
+        print(f"workers={n:2d}  entregas/s={rate:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_export.py
+"""
+Exporta catálogos sintéticos de distinto tamaño con app.catalog_export y muestra
+que el pico de memoria no crece con la cantidad de libros. El tiempo se mide en
+una pasada sin tracemalloc y el pico de memoria en otra.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_export --sizes 10000 100000 --format csv --gzip
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_export.db')}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import catalog_export, models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.book import books_categories  # noqa: E402
+
+
+def seed(db, start: int, n_books: int, owner_id: int, category_ids):
+    rnd = random.Random(start)
+    rows = [{"id": start + i, "title": f"Libro {start + i}", "author": f"Autor {rnd.randrange(500)}",
+             "description": "Descripción de prueba " * 5, "user_id": owner_id} for i in range(n_books)]
+    db.execute(insert(models.Book), rows)
+    db.execute(insert(books_categories), [
+        {"book_id": row["id"], "category_id": category_id}
+        for row in rows for category_id in rnd.sample(category_ids, 2)
+    ])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--format", choices=sorted(catalog_export.FORMATS), default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    owner = models.User(username="bench", email="bench@example.com", hashed_password="x")
+    categories = [models.Category(name=name) for name in ("Novela", "Cuento", "Poesía", "Ensayo", "Historia")]
+    db.add_all([owner, *categories])
+    db.commit()
+    category_ids = [category.id for category in categories]
+
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed(db, seeded + 1, size - seeded, owner.id, category_ids)
+        seeded = size
+
+        start = time.perf_counter()
+        total = sum(len(chunk) for chunk in catalog_export.export_catalog(args.format, args.gzip))
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        for _ in catalog_export.export_catalog(args.format, args.gzip):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{size:8d} libros  {elapsed:6.2f} s  {size / elapsed:8.0f} libros/s  "
+              f"{total / 1024 / 1024:7.1f} MB generados  pico de memoria {peak / 1024 / 1024:5.1f} MB")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_facets.py
+"""
+Compara los conteos sin filtros de GET /books/facets leídos de la tabla
+precalculada book_facet_counts contra agrupar todo el catálogo, y mide los
+conteos con filtros (consultas agrupadas en una sola UNION ALL).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_facets --books 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_facets.db')}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import facets, models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.book import books_categories  # noqa: E402
+
+IDIOMAS = ["Español", "Inglés", "Francés", "Portugués", "Alemán", "Italiano"]
+ESTADOS = ["Nuevo", "Como nuevo", "Usado", "Gastado"]
+CATEGORIES = ["Novela", "Cuento", "Poesía", "Ensayo", "Historia", "Ciencia", "Infantil", "Viajes", "Arte", "Cocina"]
+
+
+def seed(db, n_books: int):
+    owner = models.User(username="bench", email="bench@example.com", hashed_password="x")
+    categories = [models.Category(name=name) for name in CATEGORIES]
+    db.add_all([owner, *categories])
+    db.commit()
+    rnd = random.Random(42)
+    for start in range(0, n_books, 10000):
+        rows = [{
+            "id": i + 1, "title": f"Libro {i}", "author": f"Autor {i % 700}", "user_id": owner.id,
+            "idioma": rnd.choice(IDIOMAS), "estado": rnd.choice(ESTADOS),
+            "publication_date": rnd.randrange(1900, 2025),
+        } for i in range(start, min(start + 10000, n_books))]
+        db.execute(insert(models.Book), rows)
+        db.execute(insert(books_categories), [
+            {"book_id": row["id"], "category_id": category.id}
+            for row in rows for category in rnd.sample(categories, 2)
+        ])
+        db.commit()
+    # La carga usó INSERT directos, que no pasan por el mantenimiento incremental
+    facets.rebuild_facet_counts(db)
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seed(db, args.books)
+
+    everything = {"all": models.Book.id.isnot(None)}
+    filtered = facets.book_filter_clauses(idioma="Español", category="Novela")
+    assert facets.facet_counts(db, {}) == facets.facet_counts(db, everything)
+
+    print(f"{args.books} libros")
+    print(f"  sin filtros, tabla precalculada  {_timed(lambda: facets.facet_counts(db, {}), args.repeat):9.2f} ms")
+    print(f"  sin filtros, GROUP BY completo   {_timed(lambda: facets.facet_counts(db, everything), args.repeat):9.2f} ms")
+    print(f"  idioma + categoría, agrupado     {_timed(lambda: facets.facet_counts(db, filtered), args.repeat):9.2f} ms")
+
+    # Costo del mantenimiento incremental al crear libros por el ORM
+    novela = db.query(models.Category).filter_by(name="Novela").one()
+    start = time.perf_counter()
+    for i in range(200):
+        db.add(models.Book(title=f"Nuevo {i}", author="X", user_id=1, idioma="Español", categories=[novela]))
+        db.commit()
+    print(f"  alta de un libro con rollup      {(time.perf_counter() - start) * 1000 / 200:9.2f} ms")
+    assert facets.facet_counts(db, {}) == facets.facet_counts(db, everything)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_import.py
+"""
+Importa un catálogo sintético con POST /books/import (CSV o NDJSON, enviado en
+streaming) y lo compara con crear los mismos libros uno por uno con POST /books/.
+Informa libros/s y el pico de memoria (RSS máximo del proceso) tras la importación.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_import --books 10000 --format csv
+    python -m benchmarks.bench_import --books 10000 --format ndjson --single 500
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_import.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import Base, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+CATEGORIES = ["Novela", "Cuento", "Poesía", "Ensayo", "Historia", "Ciencia", "Infantil", "Viajes"]
+
+
+def _books(n: int):
+    rnd = random.Random(42)
+    for i in range(n):
+        yield {
+            "title": f"Libro {i}",
+            "author": f"Autor {rnd.randrange(500)}",
+            "publication_date": rnd.randrange(1900, 2024),
+            "editorial": f"Editorial {rnd.randrange(50)}",
+            "description": "Descripción de prueba " * 5,
+            "categories": rnd.sample(CATEGORIES, 2),
+        }
+
+
+def _body(n: int, fmt: str):
+    """Genera el cuerpo por bloques para no tenerlo entero en memoria."""
+    if fmt == "ndjson":
+        for book in _books(n):
+            yield (json.dumps(book, ensure_ascii=False) + "\n").encode()
+        return
+    fields = ["title", "author", "publication_date", "editorial", "description", "categories"]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for book in _books(n):
+        writer.writerow({**book, "categories": ";".join(book["categories"])})
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--single", type=int, default=200, help="libros a crear uno por uno para comparar")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as client:
+        client.post("/register/", json={"username": "bench", "email": "bench@example.com", "password": "password123"})
+        token = client.post("/login/", data={"username": "bench", "password": "password123"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        with client.stream("POST", f"/books/import?format={args.format}", content=_body(args.books, args.format),
+                           headers=headers) as response:
+            summary = None
+            for line in response.iter_lines():
+                if line.startswith('{"summary"'):
+                    summary = json.loads(line)["summary"]
+        elapsed = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"import {args.format:6s} {args.books:6d} libros  {elapsed:6.2f} s  {args.books / elapsed:8.0f} libros/s  "
+              f"RSS máx {rss_before / 1024:5.0f} -> {rss_after / 1024:5.0f} MB  {summary}")
+
+        start = time.perf_counter()
+        for book in _books(args.single):
+            client.post("/books/", json=book, headers=headers)
+        elapsed = time.perf_counter() - start
+        print(f"POST /books/ uno por uno  {args.single:6d} libros  {elapsed:6.2f} s  {args.single / elapsed:8.0f} libros/s")
+
+
+if __name__ == "__main__":
+    main()
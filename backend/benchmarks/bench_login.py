@@ -0,0 +1,108 @@
+# benchmarks/bench_login.py
+"""
+Mide el throughput de POST /login/ mientras otros clientes leen el catálogo
+(GET /books/) en paralelo. Levanta uvicorn en un subproceso con bcrypt en línea
+(PASSWORD_HASH_WORKERS=0, como antes) y con el pool de procesos, e informa
+logins/s, rechazos 503 y la latencia p50/p95 de las lecturas.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_login --logins 200 --readers 20 --pool-workers 4
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(env: dict, port: int, workdir: str) -> subprocess.Popen:
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, **env, "PYTHONPATH": backend}
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=backend, env=env, check=True)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:socket_app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/books/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn no arrancó")
+
+
+async def _scenario(base_url: str, n_logins: int, login_concurrency: int, n_readers: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await client.post("/register/", json={"username": "bench", "email": "bench@example.com", "password": "password123"})
+
+        statuses = []
+        read_latencies = []
+        done = asyncio.Event()
+        login_slots = asyncio.Semaphore(login_concurrency)
+
+        async def login():
+            async with login_slots:
+                r = await client.post("/login/", data={"username": "bench", "password": "password123"})
+                statuses.append(r.status_code)
+
+        async def reader():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/books/", params={"limit": 20})
+                read_latencies.append((time.perf_counter() - start) * 1000)
+
+        readers = [asyncio.create_task(reader()) for _ in range(n_readers)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(n_logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*readers)
+
+    ok = statuses.count(200)
+    quantiles = statistics.quantiles(read_latencies, n=20) if len(read_latencies) > 1 else [0] * 19
+    return ok / elapsed, statuses.count(503), quantiles[9], quantiles[18]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--pool-workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    for name, workers in (("bcrypt en línea", 0), (f"pool de {args.pool_workers} procesos", args.pool_workers)):
+        workdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+        port = _free_port()
+        server = _start_server({
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench_login.db')}",
+            "SECRET_KEY": os.getenv("SECRET_KEY", "benchmark"),
+            "PASSWORD_HASH_WORKERS": str(workers),
+        }, port, workdir)
+        try:
+            rate, rejected, p50, p95 = asyncio.run(
+                _scenario(f"http://127.0.0.1:{port}", args.logins, args.login_concurrency, args.readers)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{name:22s} logins/s={rate:7.1f}  503={rejected:4d}  GET /books/ p50={p50:7.1f} ms  p95={p95:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_matching.py
+"""
+Mide GET /exchanges/matches sobre el índice de aristas exchange_edges con un
+catálogo grande, y el costo del mantenimiento incremental al publicar un libro
+o agregar un deseo por el ORM.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_matching --users 100000 --books 1000000 --repeat 50
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_matching.db')}"
+
+from sqlalchemy import func, insert  # noqa: E402
+
+from sqlalchemy.orm import aliased  # noqa: E402
+
+from app import matching, models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.book import books_categories  # noqa: E402
+
+BATCH = 20000
+
+
+def seed(db, n_users: int, n_books: int, wishes_per_user: int):
+    rnd = random.Random(42)
+    n_titles, n_authors = max(n_books // 5, 1), max(n_books // 10, 1)
+    categories = [models.Category(name=f"Categoría {i}") for i in range(200)]
+    db.add_all(categories)
+    db.commit()
+    category_ids = [category.id for category in categories]
+
+    for start in range(0, n_users, BATCH):
+        db.execute(insert(models.User), [
+            {"id": i + 1, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(start, min(start + BATCH, n_users))
+        ])
+    for start in range(0, n_books, BATCH):
+        rows = [{
+            "id": i + 1, "title": f"Titulo {rnd.randrange(n_titles)}", "author": f"Autor {rnd.randrange(n_authors)}",
+            "user_id": rnd.randrange(n_users) + 1,
+        } for i in range(start, min(start + BATCH, n_books))]
+        db.execute(insert(models.Book), rows)
+        db.execute(insert(books_categories), [
+            {"book_id": row["id"], "category_id": rnd.choice(category_ids)} for row in rows
+        ])
+    # La mayoría de los deseos son títulos o autores concretos; pocos, categorías enteras
+    wishes = []
+    for user_id in range(1, n_users + 1):
+        keys = set()
+        for _ in range(wishes_per_user):
+            roll = rnd.random()
+            if roll < 0.7:
+                kind, value = "title", f"Titulo {rnd.randrange(n_titles)}"
+            elif roll < 0.998:
+                kind, value = "author", f"Autor {rnd.randrange(n_authors)}"
+            else:
+                kind, value = "category", f"Categoría {rnd.randrange(200)}"
+            key = matching.match_key(kind, value)
+            if key not in keys:
+                keys.add(key)
+                wishes.append({"user_id": user_id, "kind": kind, "value": value, "key": key})
+        if len(wishes) >= BATCH:
+            db.execute(insert(models.WishlistItem), wishes)
+            wishes = []
+    if wishes:
+        db.execute(insert(models.WishlistItem), wishes)
+    db.commit()
+    # La carga usó INSERT directos, que no pasan por el mantenimiento incremental
+    matching.rebuild_match_index(db)
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--wishes", type=int, default=3, help="deseos por usuario")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    start = time.perf_counter()
+    seed(db, args.users, args.books, args.wishes)
+    edges = db.query(func.count()).select_from(models.ExchangeEdge).scalar()
+    print(f"{args.users} usuarios, {args.books} libros, {edges} aristas (carga {time.perf_counter() - start:.1f} s)")
+
+    rnd = random.Random(7)
+    sample = [rnd.randrange(args.users) + 1 for _ in range(args.repeat)]
+    # Usuarios con al menos un intercambio recíproco, para medir también páginas no vacías
+    gets = aliased(models.ExchangeEdge)
+    matched = [user_id for (user_id,) in (
+        db.query(models.ExchangeEdge.owner_id)
+        .join(gets, (gets.owner_id == models.ExchangeEdge.wisher_id) & (gets.wisher_id == models.ExchangeEdge.owner_id))
+        .distinct().limit(args.repeat)
+    )]
+    for label, users in (("usuario al azar", sample), ("usuario con matches", matched)):
+        if users:
+            it = iter(users * args.repeat)
+            print(f"  matches, {label:20s}   {_timed(lambda: matching.matches_query(db, next(it)).limit(20).all(), args.repeat):9.2f} ms")
+
+    category = db.query(models.Category).first()
+    it = iter(sample * 2)
+
+    def add_book():
+        db.add(models.Book(title=f"Titulo {rnd.randrange(args.books // 5)}",
+                           author=f"Autor {rnd.randrange(args.books // 10)}", user_id=next(it), categories=[category]))
+        db.commit()
+
+    def add_wish():
+        value = f"Titulo {rnd.randrange(args.books // 5)}"
+        db.add(models.WishlistItem(user_id=next(it), kind="title", value=value, key=matching.match_key("title", value)))
+        db.commit()
+
+    print(f"  alta de un libro (con aristas)   {_timed(add_book, args.repeat):9.2f} ms")
+    it = iter(sample * 2)
+    print(f"  alta de un deseo (con aristas)   {_timed(add_wish, args.repeat):9.2f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
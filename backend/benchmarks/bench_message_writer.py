@@ -0,0 +1,96 @@
+# benchmarks/bench_message_writer.py
+"""
+Mide cuántos mensajes de chat por segundo persiste un worker con el escritor por
+lotes de app.message_writer frente a un commit síncrono por mensaje (el camino
+anterior del WebSocket), con varios emisores concurrentes en el mismo event loop.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_message_writer --senders 200 --messages 20000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_writer.db')}"
+
+from app import models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.message_writer import MessageWriter  # noqa: E402
+
+
+def seed(n_senders: int) -> int:
+    db = SessionLocal()
+    try:
+        receiver = models.User(username="receiver", email="receiver@example.com", hashed_password="x")
+        db.add(receiver)
+        db.flush()
+        for i in range(n_senders):
+            sender = models.User(username=f"sender{i}", email=f"sender{i}@example.com", hashed_password="x")
+            db.add(sender)
+            db.flush()
+            db.add(models.Conversation(user1_id=sender.id, user2_id=receiver.id))
+        db.commit()
+        return receiver.id
+    finally:
+        db.close()
+
+
+async def per_message_commit(conversations, receiver_id: int, per_sender: int):
+    db = SessionLocal()
+
+    async def sender(conversation):
+        for i in range(per_sender):
+            # Igual que el handler anterior: commit bloqueante dentro del event loop
+            message = models.Message(sender_id=conversation.user1_id, receiver_id=receiver_id,
+                                     conversation_id=conversation.id, content=f"mensaje {i}")
+            db.add(message)
+            db.commit()
+            await asyncio.sleep(0)
+
+    try:
+        await asyncio.gather(*(sender(c) for c in conversations))
+    finally:
+        db.close()
+
+
+async def group_commit(conversations, receiver_id: int, per_sender: int):
+    writer = MessageWriter()
+    writer.start()
+
+    async def sender(conversation):
+        futures = [
+            await writer.submit(conversation.user1_id, receiver_id, conversation.id, f"mensaje {i}")
+            for i in range(per_sender)
+        ]
+        await asyncio.gather(*futures)
+
+    await asyncio.gather(*(sender(c) for c in conversations))
+    await writer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=10000, help="total de mensajes por modo")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    receiver_id = seed(args.senders)
+    db = SessionLocal()
+    conversations = db.query(models.Conversation).all()
+    db.close()
+    per_sender = max(1, args.messages // len(conversations))
+    total = per_sender * len(conversations)
+
+    for name, mode in (("commit por mensaje", per_message_commit), ("group commit", group_commit)):
+        start = time.perf_counter()
+        asyncio.run(mode(conversations, receiver_id, per_sender))
+        elapsed = time.perf_counter() - start
+        print(f"{name:20s} {total / elapsed:10.0f} mensajes/s")
+
+
+if __name__ == "__main__":
+    main()
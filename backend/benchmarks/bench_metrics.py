@@ -0,0 +1,132 @@
+# benchmarks/bench_metrics.py
+"""
+Costo de la instrumentación de app.metrics: operaciones sueltas (Counter.inc,
+Histogram.observe), el middleware ASGI por petición (misma aplicación con y sin
+MetricsMiddleware) y el hook que cuenta consultas SQL, además de lo que tarda
+en generarse GET /metrics con muchas series.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_metrics --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import metrics  # noqa: E402
+
+
+def _per_op(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def _app(instrumented: bool):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+class _Route:
+    path = "/items/{item_id}"
+
+
+async def _bare_app(scope, receive, send):
+    """Aplicación ASGI mínima: aísla el costo del middleware del de FastAPI."""
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _requests(app, n: int) -> float:
+    """µs por petición llamando a la aplicación ASGI directamente (sin cliente HTTP que agregue ruido)."""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        path = f"/items/{i}"
+        return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+                "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+                "client": ("127.0.0.1", 50000), "server": ("testserver", 80)}
+
+    for i in range(200):
+        await app(scope(i), receive, send)
+    start = time.perf_counter()
+    for i in range(n):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _queries(n: int) -> float:
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(n):
+            conn.exec_driver_sql("SELECT 1")
+        return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--series", type=int, default=300, help="series de latencia para medir GET /metrics")
+    args = parser.parse_args()
+
+    counter = metrics.Counter("bench_counter", "Contador de prueba.", ("route",))
+    histogram = metrics.Histogram("bench_histogram", "Histograma de prueba.", ("method", "route", "status"))
+    print(f"Counter.inc:          {_per_op(lambda: counter.inc('/items/{item_id}'), args.operations):8.0f} ns")
+    print(f"Histogram.observe:    {_per_op(lambda: histogram.observe(0.012, 'GET', '/items/{item_id}', '200'), args.operations):8.0f} ns")
+
+    # Rondas alternadas para que el ruido afecte por igual a las dos variantes
+    for name, plain_app, instrumented_app in (
+        ("ASGI mínima", lambda: _bare_app, lambda: metrics.MetricsMiddleware(_bare_app)),
+        ("FastAPI", lambda: _app(False), lambda: _app(True)),
+    ):
+        plain, instrumented = [], []
+        for _ in range(args.rounds):
+            plain.append(asyncio.run(_requests(plain_app(), args.requests)))
+            instrumented.append(asyncio.run(_requests(instrumented_app(), args.requests)))
+        plain, instrumented = min(plain), min(instrumented)
+        print(f"{name:12} sin métricas {plain:8.1f} µs   con métricas {instrumented:8.1f} µs   "
+              f"costo {instrumented - plain:6.1f} µs por petición")
+
+    with_hook, without_hook = [], []
+    for _ in range(args.rounds):
+        with_hook.append(_queries(args.queries))
+        event.remove(Engine, "before_cursor_execute", metrics._count_query)
+        without_hook.append(_queries(args.queries))
+        event.listen(Engine, "before_cursor_execute", metrics._count_query)
+    with_hook, without_hook = min(with_hook), min(without_hook)
+    print(f"consulta sin conteo   {without_hook:8.2f} µs   con conteo   {with_hook:8.2f} µs   "
+          f"costo {with_hook - without_hook:6.2f} µs")
+
+    for i in range(args.series):
+        histogram.observe(0.01, "GET", f"/ruta/{i}", "200")
+    start = time.perf_counter()
+    body = metrics.render()
+    print(f"GET /metrics con {len(body.splitlines())} líneas: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/bench_partners.py
+"""
+Benchmark de regresión de GET /messages/partners: siembra un historial de
+mensajes (1M por defecto) y mide la consulta "último mensaje por interlocutor"
+para el usuario con más conversaciones. Con --legacy también mide el recorrido
+en Python del historial completo que hacía la versión anterior.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_partners --messages 1000000 --budget-ms 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_partners.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import func, insert, or_, select, update  # noqa: E402
+
+from app import models, pagination  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.routers.conversations import inbox_cursor, inbox_statement  # noqa: E402
+
+
+def seed(db, n_users: int, n_conversations: int, n_messages: int):
+    """Inserta usuarios, conversaciones y mensajes en lote (sin pasar por el ORM)."""
+    rnd = random.Random(7)
+    db.execute(insert(models.User), [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+        for i in range(1, n_users + 1)
+    ])
+    # El usuario 1 participa en buena parte de las conversaciones
+    pairs = set()
+    while len(pairs) < n_conversations:
+        a = 1 if rnd.random() < 0.3 else rnd.randint(1, n_users)
+        b = rnd.randint(1, n_users)
+        if a != b and (b, a) not in pairs:
+            pairs.add((a, b))
+    db.execute(insert(models.Conversation), [{"user1_id": a, "user2_id": b} for a, b in pairs])
+    conversations = db.execute(select(models.Conversation.id, models.Conversation.user1_id, models.Conversation.user2_id)).all()
+
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(n_messages):
+        convo_id, a, b = rnd.choice(conversations)
+        sender, receiver = (a, b) if rnd.random() < 0.5 else (b, a)
+        batch.append({
+            "conversation_id": convo_id, "sender_id": sender, "receiver_id": receiver,
+            "content": f"mensaje {i}", "timestamp": start + timedelta(seconds=i),
+        })
+        if len(batch) == 50000:
+            db.execute(insert(models.Message), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Message), batch)
+
+    # El INSERT masivo no dispara el hook del ORM: se recalcula el puntero de último mensaje
+    last_id = (
+        select(func.max(models.Message.id))
+        .where(models.Message.conversation_id == models.Conversation.id)
+        .scalar_subquery()
+    )
+    db.execute(update(models.Conversation).values(last_message_id=last_id))
+    last_at = select(models.Message.timestamp).where(models.Message.id == models.Conversation.last_message_id).scalar_subquery()
+    db.execute(update(models.Conversation).where(models.Conversation.last_message_id.isnot(None)).values(last_message_at=last_at))
+    db.commit()
+
+
+def partners(db, user_id: int, limit: int):
+    statement = inbox_statement(user_id).where(models.Conversation.last_message_id.isnot(None))
+    return pagination.split_page(db.execute(statement.limit(limit + 1)).all(), limit, inbox_cursor)
+
+
+def legacy_partners(db, user_id: int, limit: int):
+    msgs = (
+        db.query(models.Message)
+        .filter(or_(models.Message.sender_id == user_id, models.Message.receiver_id == user_id))
+        .order_by(models.Message.timestamp.desc())
+        .all()
+    )
+    latest = {}
+    for m in msgs:
+        latest.setdefault(m.receiver_id if m.sender_id == user_id else m.sender_id, m)
+    return list(latest.values())[:limit]
+
+
+def measure(fn, db, user_id: int, limit: int, repeat: int) -> float:
+    fn(db, user_id, limit)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(db, user_id, limit)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=None, help="falla si la consulta supera este tiempo")
+    parser.add_argument("--legacy", action="store_true", help="mide también el recorrido en Python")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not db.query(models.Message.id).first():
+            t0 = time.perf_counter()
+            seed(db, args.users, args.conversations, args.messages)
+            print(f"siembra: {time.perf_counter() - t0:.1f} s")
+        total = db.query(func.count(models.Message.id)).scalar()
+        elapsed = measure(partners, db, 1, args.limit, args.repeat)
+        print(f"motor={engine.dialect.name} mensajes={total} /messages/partners: {elapsed:.2f} ms")
+        if args.legacy:
+            print(f"recorrido en Python (anterior): {measure(legacy_partners, db, 1, args.limit, 3):.2f} ms")
+    finally:
+        db.close()
+
+    if args.budget_ms is not None and elapsed > args.budget_ms:
+        print(f"FALLO: {elapsed:.2f} ms supera el presupuesto de {args.budget_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# benchmarks/bench_read_receipts.py
+"""
+Compara los no leídos de la bandeja de entrada leídos de los contadores de cada
+conversación contra contarlos con COUNT(*) sobre los mensajes, y mide un usuario
+que recorre un historial largo enviando una marca de lectura por mensaje: con
+app.read_receipts (marcas fusionadas) frente a un UPDATE por marca.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_read_receipts --conversations 200 --messages 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_read_receipts.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import event, func, insert, select, update  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.read_receipts import ReadReceiptWriter, mark_read  # noqa: E402
+from app.routers.conversations import inbox_statement  # noqa: E402
+
+
+def seed(db, n_conversations: int, n_messages: int) -> int:
+    reader = models.User(username="reader", email="reader@example.com", hashed_password="x")
+    db.add(reader)
+    db.flush()
+    for i in range(n_conversations):
+        other = models.User(username=f"user{i}", email=f"user{i}@example.com", hashed_password="x")
+        db.add(other)
+        db.flush()
+        db.add(models.Conversation(user1_id=other.id, user2_id=reader.id))
+    db.commit()
+    conversations = db.query(models.Conversation).all()
+    rnd = random.Random(42)
+    rows = []
+    for i in range(n_messages):
+        conversation = rnd.choice(conversations)
+        rows.append({"conversation_id": conversation.id, "sender_id": conversation.user1_id,
+                     "receiver_id": reader.id, "content": f"mensaje {i}", "is_read": False})
+    db.execute(insert(models.Message), rows)
+    # La carga usó INSERT directos: se completan punteros y contadores de una vez
+    for conversation in conversations:
+        last_id, unread = db.query(func.max(models.Message.id), func.count()).filter(
+            models.Message.conversation_id == conversation.id).one()
+        conversation.last_message_id, conversation.user2_unread_count = last_id, unread
+    db.commit()
+    return reader.id
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _counting_updates():
+    counter = {"updates": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            counter["updates"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    return counter, lambda: event.remove(engine, "before_cursor_execute", count)
+
+
+def reset(db, conversation_id: int) -> list:
+    db.execute(update(models.Message).where(models.Message.conversation_id == conversation_id).values(is_read=False))
+    ids = db.scalars(
+        select(models.Message.id).where(models.Message.conversation_id == conversation_id).order_by(models.Message.id)
+    ).all()
+    db.query(models.Conversation).filter(models.Conversation.id == conversation_id).update(
+        {"user2_unread_count": len(ids), "user2_last_read_id": None})
+    db.commit()
+    return ids
+
+
+def per_message(conversation_id: int, reader_id: int, ids: list) -> None:
+    db = SessionLocal()
+    try:
+        for message_id in ids:
+            # Una escritura por mensaje visto, como un cliente que marca al hacer scroll
+            mark_read(db.connection(), conversation_id, reader_id, message_id)
+            db.commit()
+    finally:
+        db.close()
+
+
+async def coalesced(conversation_id: int, reader_id: int, ids: list) -> None:
+    writer = ReadReceiptWriter(interval_ms=50)
+    futures = []
+    for message_id in ids:
+        futures.append(writer.submit(conversation_id, reader_id, message_id))
+        # Un scroll: unas pocas marcas por milisegundo
+        if message_id % 5 == 0:
+            await asyncio.sleep(0.001)
+    await asyncio.gather(*futures)
+    await writer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    reader_id = seed(db, args.conversations, args.messages)
+
+    counted = (
+        db.query(models.Message.conversation_id, func.count())
+        .filter(models.Message.receiver_id == reader_id, models.Message.is_read == False)  # noqa: E712
+        .group_by(models.Message.conversation_id)
+    )
+    print(f"{args.conversations} conversaciones, {args.messages} mensajes sin leer")
+    print(f"  bandeja con contadores      {_timed(lambda: db.execute(inbox_statement(reader_id).limit(50)).all(), args.repeat):9.2f} ms")
+    print(f"  COUNT(*) de no leídos       {_timed(lambda: counted.all(), args.repeat):9.2f} ms")
+
+    conversation_id = db.query(models.Conversation.id).first()[0]
+    for name, run in (
+        ("UPDATE por marca", lambda ids: per_message(conversation_id, reader_id, ids)),
+        ("marcas fusionadas", lambda ids: asyncio.run(coalesced(conversation_id, reader_id, ids))),
+    ):
+        ids = reset(db, conversation_id)
+        counter, stop = _counting_updates()
+        start = time.perf_counter()
+        run(ids)
+        elapsed = (time.perf_counter() - start) * 1000
+        stop()
+        unread = db.query(models.Conversation.user2_unread_count).filter(models.Conversation.id == conversation_id).scalar()
+        print(f"  {name:20s} {len(ids)} marcas en {elapsed:8.1f} ms, {counter['updates']:5d} UPDATE, no leídos al final {unread}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_response_cache.py
+"""
+Mide la latencia de las rutas públicas de lectura con la caché de respuestas
+(aciertos) y sin ella (se invalida antes de cada petición), más el caso de un
+cliente que revalida con If-None-Match y recibe 304.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_response_cache --books 2000 --requests 500
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_response_cache.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import models, response_cache  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def _measure(client, url: str, n: int, invalidate: bool = False, etag: str = None) -> float:
+    headers = {"If-None-Match": etag} if etag else {}
+    latencies = []
+    for _ in range(n):
+        if invalidate:
+            response_cache.invalidate("books", "book:1", "user-books:1", "user:1")
+        start = time.perf_counter()
+        client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as client:
+        client.post("/register/", json={"username": "bench", "email": "bench@example.com", "password": "password123"})
+        db = SessionLocal()
+        db.execute(insert(models.Book), [
+            {"title": f"Libro {i}", "author": f"Autor {i % 300}", "description": "Descripción " * 10, "user_id": 1}
+            for i in range(args.books)
+        ])
+        db.commit()
+        db.close()
+
+        for url in ("/books/?limit=100", "/books/1", "/books/user-books/1?limit=50", "/users/1/profile"):
+            cold = _measure(client, url, args.requests, invalidate=True)
+            warm = _measure(client, url, args.requests)
+            etag = client.get(url).headers["etag"]
+            revalidated = _measure(client, url, args.requests, etag=etag)
+            print(f"{url:32s} sin caché {cold:7.3f} ms   acierto {warm:7.3f} ms   304 {revalidated:7.3f} ms")
+        print(response_cache.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_search.py
+"""
+Compara la búsqueda por `ilike('%termino%')` de GET /books/ con la búsqueda
+de texto completo de GET /books/search sobre un catálogo sintético.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_search --books 50000 --repeat 20
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_search
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_search.db')}"
+
+from app import models, search  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+WORDS = [
+    "amor", "guerra", "noche", "cien", "años", "soledad", "ciudad", "perros", "casa",
+    "espíritus", "túnel", "rayuela", "ficciones", "aleph", "pedro", "páramo", "sombra",
+    "viento", "ángel", "corazón", "invierno", "jardín", "isla", "tesoro", "camino",
+]
+AUTHORS = ["Gabriel García Márquez", "Isabel Allende", "Jorge Luis Borges", "Julio Cortázar",
+           "Juan Rulfo", "Ernesto Sábato", "Carlos Ruiz Zafón", "Mario Vargas Llosa"]
+QUERIES = ["soledad", "marquez", "angel", "corazon jardin", "borges aleph", "sombra viento"]
+
+
+def seed(db, n_books: int):
+    owner = models.User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(owner)
+    db.flush()
+    categories = [models.Category(name=name) for name in ("Novela", "Cuento", "Poesía", "Ensayo")]
+    db.add_all(categories)
+    rnd = random.Random(42)
+    for i in range(n_books):
+        db.add(models.Book(
+            title=" ".join(rnd.sample(WORDS, 3)).capitalize(),
+            author=rnd.choice(AUTHORS),
+            editorial=rnd.choice(["Sudamericana", "Planeta", "Alfaguara"]),
+            tags=" ".join(rnd.sample(WORDS, 2)),
+            user_id=owner.id,
+            categories=[rnd.choice(categories)],
+        ))
+        if i % 5000 == 4999:
+            db.commit()
+    db.commit()
+
+
+def ilike_search(db, q: str, limit: int):
+    term = f"%{q}%"
+    return (
+        db.query(models.Book)
+        .filter(models.Book.title.ilike(term) | models.Book.author.ilike(term) | models.Book.tags.ilike(term))
+        .limit(limit)
+        .all()
+    )
+
+
+def fts_search(db, q: str, limit: int):
+    query, rank = search.search_books_query(db, q)
+    return query.order_by(rank.desc(), models.Book.id).limit(limit).all()
+
+
+def timed(fn, db, repeat: int, limit: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in QUERIES:
+            fn(db, q, limit)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(QUERIES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if db.query(models.Book).count() < args.books:
+            seed(db, args.books)
+        print(f"motor={engine.dialect.name} libros={db.query(models.Book).count()}")
+        print(f"ilike:          {timed(ilike_search, db, args.repeat, args.limit):8.2f} ms/consulta")
+        print(f"texto completo: {timed(fts_search, db, args.repeat, args.limit):8.2f} ms/consulta")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
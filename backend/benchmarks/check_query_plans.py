@@ -0,0 +1,289 @@
+# benchmarks/check_query_plans.py
+"""
+Regresión de planes de consulta. Crea el esquema con las migraciones de Alembic,
+siembra una base chica, recorre todas las rutas de la API (REST y WebSocket)
+capturando cada consulta SQL que emiten y corre EXPLAIN sobre cada una.
+Termina con código 1 si alguna recorre una tabla completa en lugar de usar un
+índice, salvo las que figuran en ALLOWED_SCANS con su motivo, o si hay una ruta
+sin escenario (así cada endpoint nuevo entra en el chequeo).
+
+En SQLite se usa EXPLAIN QUERY PLAN; en PostgreSQL, EXPLAIN con
+enable_seqscan=off para que el planificador elija un índice siempre que exista
+uno aplicable, sin importar el tamaño de la base de prueba. Las consultas de las
+rutas asíncronas se explican con el mismo engine asíncrono que las ejecutó.
+
+Uso (desde backend/, en CI antes de desplegar):
+    python -m benchmarks.check_query_plans
+    DATABASE_URL=postgresql://.../plans_check python -m benchmarks.check_query_plans   # base vacía
+"""
+import asyncio
+import io
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+WORK_DIR = tempfile.mkdtemp()
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'check_query_plans.db')}"
+os.environ.setdefault("SECRET_KEY", "check")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("EXPORT_TOKEN", "check")
+os.environ["READ_RECEIPT_INTERVAL_MS"] = "0"
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from fastapi.routing import APIRoute, APIWebSocketRoute  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from PIL import Image  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+
+from app.database import Base, async_engine, engine  # noqa: E402
+
+# Recorridos completos aceptados: (ruta, tabla) -> motivo
+ALLOWED_SCANS = {
+    ("GET /books/export", "books"): "la exportación recorre todo el catálogo a propósito",
+    ("GET /books/facets", "book_facet_counts"): "tabla precalculada chica: una fila por valor de faceta",
+    ("GET /users/search/", "users"): "ILIKE con comodín inicial no puede usar un índice B-tree",
+    ("GET /books/", "books"): "filtros ILIKE con comodín inicial",
+    ("GET /books/facets", "books"): "filtros ILIKE con comodín inicial",
+    ("GET /books/facets", "categories"): "filtro de categoría por ILIKE",
+    ("GET /books/facets", "books_categories"): "conteo por categoría de los libros filtrados por ILIKE",
+    ("GET /books/", "categories"): "filtro de categoría por ILIKE",
+}
+
+_SQLITE_SCAN_RE = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+_POSTGRES_SCAN_RE = re.compile(r"Seq Scan on (\w+)")
+_ALIAS_RE = re.compile(r"\b(\w+) AS (\w+)\b")
+
+
+class QueryCapture:
+    """Junta las sentencias SQL que emite cada ruta mientras se ejecuta su escenario."""
+
+    def __init__(self):
+        self.route = None
+        self.statements = {}  # (ruta, sentencia) -> parámetros
+        self.asynchronous = set()  # (ruta, sentencia) emitidas por el engine asíncrono
+        self.routes = set()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.route is None:
+            return
+        if not re.match(r"\s*(SELECT|UPDATE|DELETE|INSERT .* SELECT|WITH)\b", statement, re.IGNORECASE | re.DOTALL):
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else parameters
+        self.statements.setdefault((self.route, statement), parameters)
+        if conn.engine is async_engine.sync_engine:
+            self.asynchronous.add((self.route, statement))
+
+    @contextmanager
+    def run(self, route: str):
+        self.route = route
+        self.routes.add(route)
+        try:
+            yield
+        finally:
+            self.route = None
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def exercise(client: TestClient, capture: QueryCapture) -> None:
+    """Un escenario por ruta, con datos que recorren los caminos habituales (incluida la segunda página)."""
+
+    def call(route, url, expected=200, **kwargs):
+        method = route.split(" ", 1)[0]
+        with capture.run(route):
+            response = client.request(method, url, **kwargs)
+        assert response.status_code == expected, f"{route}: {response.status_code} {response.text[:200]}"
+        return response
+
+    def register(name):
+        body = {"username": name, "email": f"{name}@example.com", "password": "password123"}
+        data = call("POST /register/", "/register/", json=body).json()
+        return data["user"]["id"], {"Authorization": f"Bearer {data['access_token']}"}
+
+    def paged(route, url, headers=None):
+        """Primera página de un elemento y, si hay, la siguiente con el cursor."""
+        sep = "&" if "?" in url else "?"
+        page = call(route, f"{url}{sep}limit=1", headers=headers).json()
+        if page.get("next_cursor"):
+            call(route, f"{url}{sep}limit=1&cursor={page['next_cursor']}", headers=headers)
+
+    ana, ha = register("ana")
+    beto, hb = register("beto")
+    call("POST /login/", "/login/", data={"username": "ana", "password": "password123"})
+    call("GET /me/", "/me/", headers=ha)
+    call("PUT /update-telefono/", "/update-telefono/", json={"telefono": "1122334455"}, headers=ha)
+    call("PUT /users/me/profile_picture", "/users/me/profile_picture",
+         files={"file": ("a.png", _png(), "image/png")}, headers=ha)
+    call("GET /users/{user_id}", f"/users/{ana}")
+    call("GET /users/{user_id}/profile", f"/users/{ana}/profile")
+    call("GET /users/search/", "/users/search/?name=an")
+
+    book_ids = []
+    for i, (title, author, categories) in enumerate([
+        ("Rayuela", "Julio Cortázar", ["Novela"]),
+        ("Ficciones", "Jorge Luis Borges", ["Cuento", "Clásicos"]),
+        ("Cien años de soledad", "Gabriel García Márquez", ["Novela", "Clásicos"]),
+    ]):
+        body = {"title": title, "author": author, "categories": categories, "idioma": "Español",
+                "estado": "Usado", "publication_date": 1960 + i, "description": "x"}
+        book_ids.append(call("POST /books/", "/books/", json=body, headers=hb).json()["id"])
+    csv = "title,author,categories\nEl Aleph,Jorge Luis Borges,Cuento\nPedro Páramo,Juan Rulfo,Novela;Clásicos\n"
+    call("POST /books/import", "/books/import?format=csv", content=csv, headers=hb)
+    call("POST /books/{book_id}/image/", f"/books/{book_ids[0]}/image/",
+         files={"file": ("b.png", _png(), "image/png")}, headers=hb)
+    call("PUT /books/{book_id}/upload-image", f"/books/{book_ids[0]}/upload-image",
+         files={"file": ("c.png", _png(), "image/png")}, headers=hb)
+    call("PUT /books/{book_id}", f"/books/{book_ids[1]}",
+         json={"title": "Ficciones (ed. 1956)", "categories": ["Cuento"]}, headers=hb)
+
+    paged("GET /books/", "/books/")
+    paged("GET /books/", "/books/?title=ray&category=novela&idioma=espa")
+    call("GET /books/facets", "/books/facets")
+    call("GET /books/facets", "/books/facets?idioma=espa&category=nov")
+    paged("GET /books/search", "/books/search?q=borges")
+    paged("GET /books/my-books", "/books/my-books", headers=hb)
+    call("GET /books/export", "/books/export?format=csv", headers={"X-Export-Token": os.environ["EXPORT_TOKEN"]})
+    call("GET /books/{book_id}", f"/books/{book_ids[0]}")
+    paged("GET /books/user-books/{user_id}", f"/books/user-books/{beto}")
+
+    call("POST /exchanges/wishlist", "/exchanges/wishlist", json={"kind": "author", "value": "Borges"}, headers=ha)
+    wish = call("POST /exchanges/wishlist", "/exchanges/wishlist",
+                json={"kind": "title", "value": "Rayuela"}, headers=ha).json()
+    call("POST /books/", "/books/", json={"title": "Ficciones", "author": "Jorge Luis Borges", "categories": []}, headers=ha)
+    call("POST /exchanges/wishlist", "/exchanges/wishlist", json={"kind": "category", "value": "cuento"}, headers=hb)
+    call("GET /exchanges/wishlist", "/exchanges/wishlist", headers=ha)
+    paged("GET /exchanges/matches", "/exchanges/matches", headers=ha)
+    call("GET /exchanges/matches/{user_id}", f"/exchanges/matches/{beto}", headers=ha)
+    call("DELETE /exchanges/wishlist/{item_id}", f"/exchanges/wishlist/{wish['id']}", headers=ha)
+    call("DELETE /books/{book_id}", f"/books/{book_ids[2]}", headers=hb)
+
+    call("POST /conversations/", "/conversations/", json={"receiver_id": beto}, headers=ha)
+    for i in range(3):
+        call("POST /messages/", "/messages/", json={"receiver_id": beto, "content": f"hola {i}"}, headers=ha)
+    with capture.run("WEBSOCKET /messages/ws"):
+        with client.websocket_connect(f"/messages/ws?token={hb['Authorization'][7:]}") as ws:
+            ws.send_json({"receiver_id": ana, "content": "respuesta"})
+            message = ws.receive_json()
+            ws.send_json({"type": "read", "conversation_id": message["conversation_id"], "up_to_id": message["id"]})
+            ws.receive_json()
+    paged("GET /conversations/", "/conversations/", headers=hb)
+    paged("GET /messages/partners", "/messages/partners", headers=hb)
+    history = call("GET /messages/conversation/{user_id}", f"/messages/conversation/{ana}?limit=2", headers=hb).json()
+    call("GET /messages/conversation/{user_id}",
+         f"/messages/conversation/{ana}?before_id={history['items'][0]['id']}&limit=2", headers=hb)
+    call("GET /messages/conversation/{user_id}",
+         f"/messages/conversation/{ana}?since_id={history['items'][0]['id']}", headers=hb)
+    call("GET /messages/unread", "/messages/unread", headers=hb)
+    call("POST /messages/conversation/{user_id}/read", f"/messages/conversation/{ana}/read",
+         json={"up_to_id": message["id"]}, headers=hb)
+    call("GET /cache/stats", "/cache/stats")
+    call("GET /db/pool-stats", "/db/pool-stats")
+    call("GET /metrics", "/metrics")
+    # Al final: deja inválidos los tokens emitidos hasta ahora
+    call("POST /users/me/revoke-tokens", "/users/me/revoke-tokens", headers=ha)
+
+
+def _route_names(app) -> set:
+    names = set()
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.include_in_schema:
+            names.update(f"{method} {route.path}" for method in route.methods)
+        elif isinstance(route, APIWebSocketRoute):
+            names.add(f"WEBSOCKET {route.path}")
+    return names
+
+
+def _full_scans(connection, statement: str, parameters) -> list:
+    """Tablas (de los modelos) que el plan de `statement` recorre completas."""
+    tables = set(Base.metadata.tables)
+    aliases = {alias: table for table, alias in _ALIAS_RE.findall(statement) if table in tables}
+    if connection.dialect.name == "postgresql":
+        plan = "\n".join(row[0] for row in connection.exec_driver_sql(f"EXPLAIN {statement}", parameters))
+        return sorted({name for name in _POSTGRES_SCAN_RE.findall(plan) if name in tables})
+
+    details = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    # Sin filtros, el motor lee en el orden pedido y corta en LIMIT (primera página de un
+    # listado): recorrer así la clave primaria o un índice no es un recorrido completo
+    ordered_with_limit = (
+        re.search(r"\bLIMIT\b", statement) and not re.search(r"\bWHERE\b", statement)
+        and not any("TEMP B-TREE" in detail for detail in details)
+    )
+    scanned = set()
+    for detail in details:
+        match = _SQLITE_SCAN_RE.match(detail)
+        if not match:
+            continue
+        table = aliases.get(match.group(1), match.group(1))
+        if table in tables and not ordered_with_limit:
+            scanned.add(table)
+    return sorted(scanned)
+
+
+def _check_plans(connection, statements: dict) -> list:
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SET enable_seqscan = off"))
+    failures = []
+    for (route, statement), parameters in statements.items():
+        for table in _full_scans(connection, statement, parameters):
+            if (route, table) not in ALLOWED_SCANS:
+                failures.append(f"{route}: recorre {table} completa\n    {' '.join(statement.split())}")
+    return failures
+
+
+async def _check_async_plans(statements: dict) -> list:
+    # Los parámetros tienen el formato del driver asíncrono (p. ej. $1 en asyncpg)
+    try:
+        async with async_engine.connect() as connection:
+            return await connection.run_sync(_check_plans, statements)
+    finally:
+        # Cada conexión de aiosqlite tiene un hilo propio que no dejaría terminar el proceso
+        await async_engine.dispose()
+
+
+def main():
+    alembic_config = Config(str(BACKEND_DIR / "alembic.ini"))
+    alembic_config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    command.upgrade(alembic_config, "head")
+
+    # Las subidas de imágenes escriben en static/: se trabaja en un directorio temporal
+    os.chdir(WORK_DIR)
+    from app.main import app
+
+    capture = QueryCapture()
+    for e in (engine, async_engine.sync_engine):
+        event.listen(e, "before_cursor_execute", capture)
+    with TestClient(app) as client:
+        exercise(client, capture)
+    for e in (engine, async_engine.sync_engine):
+        event.remove(e, "before_cursor_execute", capture)
+
+    failures = []
+    missing = sorted(_route_names(app) - capture.routes)
+    for route in missing:
+        failures.append(f"{route}: la ruta no tiene escenario en check_query_plans.exercise")
+
+    synchronous = {key: value for key, value in capture.statements.items() if key not in capture.asynchronous}
+    asynchronous = {key: value for key, value in capture.statements.items() if key in capture.asynchronous}
+    with engine.connect() as connection:
+        failures.extend(_check_plans(connection, synchronous))
+    failures.extend(asyncio.run(_check_async_plans(asynchronous)))
+
+    print(f"{len(capture.statements)} consultas en {len(capture.routes)} rutas")
+    for failure in failures:
+        print(f"FALLA {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
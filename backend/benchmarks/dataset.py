@@ -0,0 +1,250 @@
+# benchmarks/dataset.py
+"""
+Generador de datos sintéticos para los benchmarks: usuarios, categorías, libros
+con sus categorías, listas de deseos, conversaciones y mensajes. Inserta en lote
+sobre los modelos de app.models y después recalcula lo que los hooks del ORM
+mantienen en una escritura normal (documento de búsqueda, conteos de facetas,
+índice de intercambios, último mensaje y no leídos de cada conversación).
+
+Funciona igual en SQLite y en PostgreSQL; la base debe tener el esquema al día
+(`alembic upgrade head`). Es determinista: la misma semilla da los mismos datos.
+
+Uso (desde backend/):
+    python -m benchmarks.dataset --users 2000 --books 50000 --messages 2000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import func, insert, select, update
+
+from app import facets, matching, models, password_hashing, search
+from app.models.book import books_categories, normalize_category_name
+
+BATCH_SIZE = 20000
+PASSWORD = "password123"
+
+WORDS = [
+    "amor", "guerra", "noche", "cien", "años", "soledad", "ciudad", "perros", "casa",
+    "espíritus", "túnel", "rayuela", "ficciones", "aleph", "pedro", "páramo", "sombra",
+    "viento", "ángel", "corazón", "invierno", "jardín", "isla", "tesoro", "camino",
+    "río", "memoria", "silencio", "fuego", "luna", "mar", "desierto", "tiempo", "sueño",
+]
+AUTHORS = ["Gabriel García Márquez", "Isabel Allende", "Jorge Luis Borges", "Julio Cortázar",
+           "Juan Rulfo", "Ernesto Sábato", "Carlos Ruiz Zafón", "Mario Vargas Llosa",
+           "Silvina Ocampo", "Alfonsina Storni", "Rosario Castellanos", "Horacio Quiroga"]
+CATEGORIES = ["Novela", "Cuento", "Poesía", "Ensayo", "Historia", "Ciencia", "Infantil", "Viajes",
+              "Biografía", "Filosofía", "Arte", "Cocina", "Policial", "Ciencia Ficción", "Fantasía", "Teatro"]
+EDITORIALES = ["Sudamericana", "Planeta", "Alfaguara", "Anagrama", "Emecé", "Seix Barral"]
+IDIOMAS = ["Español", "Inglés", "Portugués", "Francés"]
+ESTADOS = ["Nuevo", "Como nuevo", "Usado", "Con detalles"]
+
+
+def _batches(rows, size: int = BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _seed_users(db, n_users: int) -> None:
+    # Todos comparten la contraseña: se hashea una sola vez
+    hashed = password_hashing.pwd_context.hash(PASSWORD)
+    for batch in _batches(
+        {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed}
+        for i in range(1, n_users + 1)
+    ):
+        db.execute(insert(models.User), batch)
+
+
+def _seed_books(db, rnd: random.Random, user_ids, n_books: int) -> None:
+    db.execute(insert(models.Category), [
+        {"name": name, "normalized_name": normalize_category_name(name)} for name in CATEGORIES
+    ])
+    categories = db.execute(select(models.Category.id, models.Category.name)).all()
+    next_id = (db.scalar(select(func.max(models.Book.id))) or 0) + 1
+
+    def books():
+        for i in range(n_books):
+            book = {
+                "title": " ".join(rnd.sample(WORDS, 3)).capitalize(),
+                "author": rnd.choice(AUTHORS),
+                "publication_date": rnd.randrange(1900, 2025),
+                "editorial": rnd.choice(EDITORIALES),
+                "description": "Libro de prueba " + " ".join(rnd.sample(WORDS, 8)),
+                "tags": " ".join(rnd.sample(WORDS, 2)),
+                "idioma": rnd.choice(IDIOMAS),
+                "estado": rnd.choice(ESTADOS),
+                "user_id": rnd.choice(user_ids),
+            }
+            yield book, rnd.sample(categories, rnd.randint(1, 3))
+
+    for batch in _batches(books()):
+        # Ids explícitos para poder enlazar las categorías sin releer los libros
+        rows, links = [], []
+        for book, book_categories in batch:
+            book["id"] = next_id
+            book["search_document"] = search.build_search_document(
+                SimpleNamespace(**book, categories=[SimpleNamespace(name=name) for _, name in book_categories])
+            )
+            rows.append(book)
+            links.extend({"book_id": next_id, "category_id": category_id} for category_id, _ in book_categories)
+            next_id += 1
+        db.execute(insert(models.Book), rows)
+        db.execute(insert(books_categories), links)
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Con ids explícitos la secuencia no avanza: se alinea para las altas posteriores
+        db.execute(select(func.setval(func.pg_get_serial_sequence("books", "id"), next_id - 1)))
+
+
+def _seed_wishlists(db, rnd: random.Random, user_ids, per_user: int) -> None:
+    def items():
+        for user_id in user_ids:
+            wishes = {}
+            for _ in range(per_user):
+                kind, value = rnd.choice([
+                    ("author", rnd.choice(AUTHORS)),
+                    ("category", rnd.choice(CATEGORIES)),
+                    ("title", " ".join(rnd.sample(WORDS, 3)).capitalize()),
+                ])
+                wishes[matching.match_key(kind, value)] = (kind, value)
+            for key, (kind, value) in wishes.items():
+                yield {"user_id": user_id, "kind": kind, "value": value, "key": key}
+
+    for batch in _batches(items()):
+        db.execute(insert(models.WishlistItem), batch)
+
+
+def _seed_messages(db, rnd: random.Random, user_ids, n_conversations: int, n_messages: int, unread_ratio: float) -> None:
+    pairs = set()
+    # Unos pocos usuarios concentran muchas conversaciones, como en un uso real
+    hubs = user_ids[:max(1, len(user_ids) // 50)]
+    while len(pairs) < min(n_conversations, len(user_ids) * (len(user_ids) - 1) // 2):
+        a = rnd.choice(hubs) if rnd.random() < 0.3 else rnd.choice(user_ids)
+        b = rnd.choice(user_ids)
+        if a != b and (b, a) not in pairs:
+            pairs.add((a, b))
+    for batch in _batches({"user1_id": a, "user2_id": b} for a, b in sorted(pairs)):
+        db.execute(insert(models.Conversation), batch)
+    conversations = db.execute(
+        select(models.Conversation.id, models.Conversation.user1_id, models.Conversation.user2_id)
+    ).all()
+    if not conversations:
+        return
+
+    start = datetime.utcnow() - timedelta(seconds=n_messages)
+
+    def messages():
+        for i in range(n_messages):
+            conversation_id, a, b = rnd.choice(conversations)
+            sender, receiver = (a, b) if rnd.random() < 0.5 else (b, a)
+            yield {
+                "conversation_id": conversation_id, "sender_id": sender, "receiver_id": receiver,
+                "content": f"Mensaje {i}: " + " ".join(rnd.sample(WORDS, 5)),
+                "timestamp": start + timedelta(seconds=i),
+                "is_read": rnd.random() >= unread_ratio,
+            }
+
+    for batch in _batches(messages()):
+        db.execute(insert(models.Message), batch)
+
+    # El INSERT en lote no pasa por los hooks de app.models.message: se recalculan
+    # el último mensaje, los no leídos y el último leído de cada participante
+    Conversation, Message = models.Conversation, models.Message
+    in_conversation = Message.conversation_id == Conversation.id
+
+    def received(user_column, is_read):
+        return select(func.count()).where(in_conversation, Message.receiver_id == user_column, Message.is_read == is_read)
+
+    def last_read(user_column):
+        return select(func.max(Message.id)).where(in_conversation, Message.receiver_id == user_column, Message.is_read.is_(True))
+
+    db.execute(update(Conversation).values(
+        last_message_id=select(func.max(Message.id)).where(in_conversation).scalar_subquery(),
+        user1_unread_count=received(Conversation.user1_id, False).scalar_subquery(),
+        user2_unread_count=received(Conversation.user2_id, False).scalar_subquery(),
+        user1_last_read_id=last_read(Conversation.user1_id).scalar_subquery(),
+        user2_last_read_id=last_read(Conversation.user2_id).scalar_subquery(),
+    ))
+    db.execute(update(Conversation).values(last_message_at=func.coalesce(
+        select(Message.timestamp).where(Message.id == Conversation.last_message_id).scalar_subquery(),
+        Conversation.created_at,
+    )))
+
+
+def seed(db, users: int = 2000, books: int = 50000, conversations: int = 20000, messages: int = 1_000_000,
+         wishes_per_user: int = 3, unread_ratio: float = 0.1, seed_value: int = 42) -> dict:
+    """
+    Siembra el conjunto de datos en una base vacía y devuelve cuántas filas y
+    cuánto tiempo llevó cada parte.
+    """
+    rnd = random.Random(seed_value)
+    timings = {}
+
+    def step(name, fn, *args):
+        started = time.perf_counter()
+        fn(db, *args)
+        db.commit()
+        timings[name] = round(time.perf_counter() - started, 2)
+
+    step("users", _seed_users, users)
+    user_ids = db.scalars(select(models.User.id).order_by(models.User.id)).all()
+    step("books", _seed_books, rnd, user_ids, books)
+    step("wishlists", _seed_wishlists, rnd, user_ids, wishes_per_user)
+    step("messages", _seed_messages, rnd, user_ids, conversations, messages, unread_ratio)
+    step("facets", lambda db: facets.rebuild_facet_counts(db))
+    step("matching", lambda db: matching.rebuild_match_index(db))
+    return {"counts": counts(db), "seconds": timings}
+
+
+def counts(db) -> dict:
+    """Filas de cada tabla sembrada (sirve también para saber si la base ya tiene datos)."""
+    return {
+        name: db.scalar(select(func.count()).select_from(model))
+        for name, model in (("users", models.User), ("books", models.Book), ("wishlist_items", models.WishlistItem),
+                            ("conversations", models.Conversation), ("messages", models.Message))
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument("--conversations", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--wishes-per-user", type=int, default=3)
+    parser.add_argument("--unread-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def seed_from_args(db, args) -> dict:
+    return seed(db, args.users, args.books, args.conversations, args.messages,
+                args.wishes_per_user, args.unread_ratio, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from app.database import SessionLocal, engine
+
+    db = SessionLocal()
+    try:
+        if counts(db)["users"]:
+            print("La base ya tiene datos; usa una base vacía (DATABASE_URL) para sembrar.")
+            return
+        result = seed_from_args(db, args)
+    finally:
+        db.close()
+    print(f"motor={engine.dialect.name} filas={result['counts']} segundos={result['seconds']}")
+
+
+if __name__ == "__main__":
+    main()
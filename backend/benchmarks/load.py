@@ -0,0 +1,358 @@
+# benchmarks/load.py
+"""
+Prueba de carga de la API completa. Siembra un conjunto de datos sintético
+(benchmarks/dataset.py) si la base está vacía y lanza clientes concurrentes
+contra la aplicación ASGI real (app.main.socket_app) dentro del mismo proceso:
+usuarios virtuales por HTTP (httpx) que recorren el catálogo, la bandeja de
+entrada y los mensajes, y clientes de chat por WebSocket que miden cuánto tarda
+un mensaje en volver confirmado. Informa p50/p95/p99 y rendimiento por ruta.
+
+Con --output guarda el resultado en JSON; con --baseline lo compara contra una
+corrida anterior y termina con código 1 si alguna ruta empeora más de lo
+permitido, para cortar el build ante una regresión.
+
+Corre sobre SQLite (por defecto, en un directorio temporal) o sobre un
+PostgreSQL local indicado en DATABASE_URL; una base ya sembrada se reutiliza.
+
+Uso (desde backend/):
+    python -m benchmarks.load --duration 30 --concurrency 50 --output resultados.json
+    python -m benchmarks.load --baseline resultados.json --max-regression 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+START_DIR = Path.cwd()
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_load.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# La aplicación crea static/ en el directorio actual: se trabaja en uno temporal
+os.chdir(tempfile.mkdtemp())
+
+import httpx  # noqa: E402
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy import or_, select  # noqa: E402
+
+from app import models, security  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import socket_app  # noqa: E402
+from benchmarks import dataset  # noqa: E402
+
+SEARCH_TERMS = ["soledad", "marquez", "angel", "corazon jardin", "borges", "sombra viento", "rio", "memoria"]
+
+
+# --- Clientes ASGI en el mismo proceso ---
+
+@asynccontextmanager
+async def lifespan(app):
+    """Ejecuta el arranque y el apagado de la aplicación (writers, broker, pool de hashing)."""
+    inbox, outbox = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, inbox.get, outbox.put))
+    await inbox.put({"type": "lifespan.startup"})
+    message = await outbox.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"La aplicación no arrancó: {message}")
+    try:
+        yield
+    finally:
+        await inbox.put({"type": "lifespan.shutdown"})
+        await outbox.get()
+        await task
+
+
+class AsgiWebSocket:
+    """Cliente WebSocket mínimo que habla ASGI directamente con la aplicación."""
+
+    def __init__(self, app, path: str, query_string: str = ""):
+        self._app = app
+        self._scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query_string.encode(),
+            "headers": [(b"host", b"testserver")], "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+            "subprotocols": [],
+        }
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task = None
+
+    async def connect(self) -> None:
+        self._task = asyncio.create_task(self._app(self._scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._from_app.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"WebSocket rechazado: {message}")
+
+    async def send_json(self, data) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self):
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError("WebSocket cerrado por el servidor")
+        return json.loads(message["text"])
+
+    async def close(self) -> None:
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        await self._task
+
+
+# --- Mediciones ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route: str, elapsed: float, ok: bool) -> None:
+        self.latencies[route].append(elapsed)
+        if not ok:
+            self.errors[route] += 1
+
+    def summary(self, duration: float) -> dict:
+        routes = {}
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            routes[route] = _stats(values, self.errors[route], duration)
+        every = sorted(v for values in self.latencies.values() for v in values)
+        return {"routes": routes, "total": _stats(every, sum(self.errors.values()), duration)}
+
+
+def _percentile(values, q: float) -> float:
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+def _stats(values, errors: int, duration: float) -> dict:
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / duration, 2) if duration else 0.0,
+        "mean_ms": round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(_percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 3),
+    }
+
+
+# --- Escenario ---
+
+def _identities(n: int, rnd: random.Random):
+    """Usuarios sembrados con token (sin pasar por bcrypt) y sus interlocutores."""
+    db = SessionLocal()
+    try:
+        users = db.scalars(select(models.User).order_by(models.User.id).limit(max(n * 4, n))).all()
+        picked = rnd.sample(users, min(n, len(users)))
+        identities = []
+        for user in picked:
+            partners = [
+                a if a != user.id else b
+                for a, b in db.execute(
+                    select(models.Conversation.user1_id, models.Conversation.user2_id)
+                    .where(or_(models.Conversation.user1_id == user.id, models.Conversation.user2_id == user.id))
+                    .limit(20)
+                )
+            ]
+            token = security.create_access_token(subject=user.username, user=user)
+            identities.append({
+                "id": user.id,
+                "headers": {"Authorization": f"Bearer {token}"},
+                "token": token,
+                "partners": partners or [u.id for u in users if u.id != user.id][:1],
+            })
+        max_book_id = db.scalar(select(models.Book.id).order_by(models.Book.id.desc()).limit(1)) or 1
+        return identities, max_book_id, dataset.counts(db)["users"]
+    finally:
+        db.close()
+
+
+def _http_actions(me: dict, max_book_id: int, n_users: int, rnd: random.Random):
+    """(peso, ruta, método, url, cuerpo) de cada acción de un usuario virtual."""
+    partner = rnd.choice(me["partners"])
+    return [
+        (20, "GET /books/", "GET", f"/books/?limit=20&idioma={rnd.choice(dataset.IDIOMAS)}", None),
+        (10, "GET /books/search", "GET", f"/books/search?q={rnd.choice(SEARCH_TERMS)}&limit=20", None),
+        (5, "GET /books/facets", "GET", f"/books/facets?category={rnd.choice(dataset.CATEGORIES)}", None),
+        (10, "GET /books/{book_id}", "GET", f"/books/{rnd.randint(1, max_book_id)}", None),
+        (5, "GET /users/{user_id}/profile", "GET", f"/users/{rnd.randint(1, n_users)}/profile", None),
+        (8, "GET /conversations/", "GET", "/conversations/?limit=20", None),
+        (8, "GET /messages/partners", "GET", "/messages/partners?limit=20", None),
+        (10, "GET /messages/conversation/{user_id}", "GET", f"/messages/conversation/{partner}", None),
+        (6, "GET /messages/unread", "GET", "/messages/unread", None),
+        (5, "GET /exchanges/matches", "GET", "/exchanges/matches?limit=20", None),
+        (8, "POST /messages/", "POST", "/messages/", {"receiver_id": partner, "content": "hola desde la prueba"}),
+        (5, "POST /messages/conversation/{user_id}/read", "POST", f"/messages/conversation/{partner}/read",
+         {"up_to_id": 2 ** 31 - 1}),
+    ]
+
+
+async def http_user(client, me, max_book_id, n_users, deadline, recorder, seed_value):
+    rnd = random.Random(seed_value)
+    while time.perf_counter() < deadline:
+        actions = _http_actions(me, max_book_id, n_users, rnd)
+        _, route, method, url, body = rnd.choices(actions, weights=[a[0] for a in actions])[0]
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, json=body, headers=me["headers"])
+            # Un libro borrado o inexistente (404) es una respuesta válida del escenario
+            ok = response.status_code < 400 or response.status_code == 404
+        except Exception:
+            ok = False
+        recorder.record(route, time.perf_counter() - started, ok)
+
+
+async def chat_user(me, deadline, recorder, seed_value, think_time: float):
+    """Envía mensajes por WebSocket y mide hasta recibir su confirmación de guardado."""
+    rnd = random.Random(seed_value)
+    socket = AsgiWebSocket(socket_app, "/messages/ws", f"token={me['token']}")
+    await socket.connect()
+    try:
+        while time.perf_counter() < deadline:
+            content = f"ws {rnd.random()}"
+            started = time.perf_counter()
+            await socket.send_json({"receiver_id": rnd.choice(me["partners"]), "content": content})
+            ok = False
+            try:
+                while True:
+                    event = await asyncio.wait_for(socket.receive_json(), timeout=10)
+                    if event.get("type") == "message" and event.get("content") == content:
+                        ok = True
+                        break
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+            recorder.record("WS /messages/ws (envío -> confirmación)", time.perf_counter() - started, ok)
+            await asyncio.sleep(think_time)
+    finally:
+        await socket.close()
+
+
+async def run_load(args) -> dict:
+    rnd = random.Random(args.seed)
+    identities, max_book_id, n_users = _identities(args.concurrency + args.chat_clients, rnd)
+    http_users, chat_users = identities[:args.concurrency], identities[args.concurrency:]
+    recorder = Recorder()
+
+    async with lifespan(socket_app):
+        transport = httpx.ASGITransport(app=socket_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=60) as client:
+            # Calentamiento: llena cachés y pools sin registrar latencias
+            warmup = time.perf_counter() + args.warmup
+            await asyncio.gather(*(
+                http_user(client, me, max_book_id, n_users, warmup, Recorder(), args.seed + i)
+                for i, me in enumerate(http_users)
+            ))
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(
+                *(http_user(client, me, max_book_id, n_users, deadline, recorder, args.seed + i)
+                  for i, me in enumerate(http_users)),
+                *(chat_user(me, deadline, recorder, args.seed + 1000 + i, args.chat_think_ms / 1000)
+                  for i, me in enumerate(chat_users)),
+            )
+            elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+
+# --- Comparación con una corrida anterior ---
+
+def compare(current: dict, baseline: dict, max_regression: float, min_delta_ms: float):
+    """Rutas cuyo p95 empeoró más de max_regression (y de min_delta_ms) o que ahora fallan más."""
+    failures = []
+    for route, stats in current["routes"].items():
+        before = baseline["routes"].get(route)
+        if not before:
+            continue
+        p95, base_p95 = stats["p95_ms"], before["p95_ms"]
+        if p95 > base_p95 * (1 + max_regression) and p95 - base_p95 > min_delta_ms:
+            failures.append(f"{route}: p95 {base_p95:.1f} -> {p95:.1f} ms")
+        error_rate = stats["errors"] / stats["count"] if stats["count"] else 0.0
+        base_error_rate = before["errors"] / before["count"] if before["count"] else 0.0
+        if error_rate > base_error_rate + 0.01:
+            failures.append(f"{route}: errores {base_error_rate:.1%} -> {error_rate:.1%}")
+    return failures
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _print_table(result: dict) -> None:
+    print(f"{'ruta':48} {'n':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, stats in list(result["routes"].items()) + [("TOTAL", result["total"])]:
+        print(f"{route:48} {stats['count']:7} {stats['errors']:5} {stats['rps']:8.1f} "
+              f"{stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    dataset.add_arguments(parser)
+    parser.add_argument("--concurrency", type=int, default=50, help="usuarios virtuales por HTTP")
+    parser.add_argument("--chat-clients", type=int, default=10, help="clientes de chat por WebSocket")
+    parser.add_argument("--chat-think-ms", type=float, default=50, help="pausa entre mensajes de cada cliente de chat")
+    parser.add_argument("--duration", type=float, default=30, help="segundos de medición")
+    parser.add_argument("--warmup", type=float, default=5, help="segundos de calentamiento sin medir")
+    parser.add_argument("--output", help="guarda el resultado en este archivo JSON")
+    parser.add_argument("--baseline", help="resultado JSON anterior contra el que comparar")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="empeoramiento tolerado del p95 (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="diferencia de p95 por debajo de la cual no se falla")
+    args = parser.parse_args()
+
+    alembic_config = Config(str(BACKEND_DIR / "alembic.ini"))
+    alembic_config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    command.upgrade(alembic_config, "head")
+
+    db = SessionLocal()
+    try:
+        rows = dataset.counts(db)
+        if not rows["users"]:
+            t0 = time.perf_counter()
+            rows = dataset.seed_from_args(db, args)["counts"]
+            print(f"siembra: {time.perf_counter() - t0:.1f} s {rows}")
+    finally:
+        db.close()
+
+    result = asyncio.run(run_load(args))
+    result["meta"] = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "database": engine.dialect.name,
+        "python": platform.python_version(),
+        "dataset": rows,
+        "concurrency": args.concurrency,
+        "chat_clients": args.chat_clients,
+        "duration": args.duration,
+    }
+    _print_table(result)
+
+    if args.output:
+        (START_DIR / args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.baseline:
+        baseline = json.loads((START_DIR / args.baseline).read_text())
+        failures = compare(result, baseline, args.max_regression, args.min_delta_ms)
+        for failure in failures:
+            print(f"REGRESIÓN {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"sin regresiones frente a {args.baseline} ({baseline.get('meta', {}).get('commit', '')})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/resp_server.py
+"""
+Servidor mínimo compatible con el protocolo de Redis (RESP2) que sólo implementa
+pub/sub: SUBSCRIBE, UNSUBSCRIBE, PUBLISH y PING. Reemplaza a un Redis real en
+pruebas locales del broker de chat; cualquier otro comando responde +OK.
+
+Uso (desde backend/):
+    python -m benchmarks.resp_server --port 6390
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+
+def _bulk(value: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(*items: bytes) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+class RespPubSubServer:
+    def __init__(self):
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscribed: Set[bytes] = set()
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                command = args[0].upper()
+                if command == b"SUBSCRIBE":
+                    for channel in args[1:]:
+                        subscribed.add(channel)
+                        self.channels[channel].add(writer)
+                        writer.write(_array(_bulk(b"subscribe"), _bulk(channel), b":%d\r\n" % len(subscribed)))
+                elif command == b"UNSUBSCRIBE":
+                    for channel in args[1:] or list(subscribed):
+                        subscribed.discard(channel)
+                        self.channels[channel].discard(writer)
+                        writer.write(_array(_bulk(b"unsubscribe"), _bulk(channel), b":%d\r\n" % len(subscribed)))
+                elif command == b"PUBLISH":
+                    channel, data = args[1], args[2]
+                    frame = _array(_bulk(b"message"), _bulk(channel), _bulk(data))
+                    receivers = self.channels.get(channel, ())
+                    for subscriber in receivers:
+                        subscriber.write(frame)
+                    writer.write(b":%d\r\n" % len(receivers))
+                elif command == b"PING":
+                    writer.write(_array(_bulk(b"pong"), _bulk(b"")) if subscribed else b"+PONG\r\n")
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels[channel].discard(writer)
+            writer.close()
+
+
+async def _serve(host: str, port: int) -> None:
+    server = RespPubSubServer()
+    port = await server.start(host, port)
+    print(f"servidor RESP escuchando en redis://{host}:{port}/0")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
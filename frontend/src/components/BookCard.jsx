@@ -33,7 +33,7 @@ const BookCard = ({ book, isOwnedByCurrentUser, children, showHighlight }) => {
 
       <div className="libro-imagen-container">
         <img
-          src={book.image_url ? `http://localhost:8000${book.image_url}` : "https://placehold.co/300x400/E5E7EB/4B5563?text=Sin+Imagen"}
+          src={book.image_url ? `http://localhost:8000${book.image_variants?.medium || book.image_url}` : "https://placehold.co/300x400/E5E7EB/4B5563?text=Sin+Imagen"}
           alt={book.title}
           onError={(e) => {
             e.target.onerror = null;
@@ -18,7 +18,12 @@ const MensajeriaPage = () => {
   const [selectedChatUser, setSelectedChatUser] = useState(null);
   const [messages, setMessages] = useState([]);
   const [newMessage, setNewMessage] = useState("");
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
   const messagesEndRef = useRef(null);
+  // Historial ya descargado por chat: { messages, hasOlder, highWaterMark }
+  const historyCacheRef = useRef({});
+  // Al cargar mensajes anteriores no se baja al último mensaje
+  const skipScrollRef = useRef(false);
   const wsRef = useRef(null); // Referencia persistente al objeto WebSocket
 
   // ✨ FUNCIÓN PARA CONECTAR AL WEBSOCKET (se ejecuta una única vez al montar el componente)
@@ -40,6 +45,8 @@ const MensajeriaPage = () => {
 
     ws.onmessage = (event) => {
       const message = JSON.parse(event.data);
+      // Los avisos de lectura ("read"/"unread") no son mensajes del chat
+      if (message.type && message.type !== "message") return;
       const otherId = message.sender_id === loggedInUserId ? message.receiver_id : message.sender_id;
 
       // Actualiza la lista de conversaciones
@@ -168,16 +175,53 @@ const MensajeriaPage = () => {
   const fetchMessages = useCallback(async (userId) => {
     if (!token || !userId) {
       setMessages([]);
+      setHasOlderMessages(false);
       return;
     }
     try {
-      const fetchedMessages = await getMessages(userId, token);
-      setMessages(fetchedMessages);
+      const cached = historyCacheRef.current[userId];
+      let entry;
+      if (cached && cached.highWaterMark != null) {
+        // Chat ya abierto antes: sólo se piden los mensajes posteriores al último conocido
+        const newer = [];
+        let highWaterMark = cached.highWaterMark;
+        let page;
+        do {
+          page = await getMessages(userId, token, { since_id: highWaterMark });
+          newer.push(...page.items);
+          highWaterMark = page.high_water_mark;
+        } while (page.has_more);
+        entry = { ...cached, messages: [...cached.messages, ...newer], highWaterMark };
+      } else {
+        const page = await getMessages(userId, token);
+        entry = { messages: page.items, hasOlder: page.has_more, highWaterMark: page.high_water_mark };
+      }
+      historyCacheRef.current[userId] = entry;
+      setMessages(entry.messages);
+      setHasOlderMessages(entry.hasOlder);
     } catch (error) {
       console.error("Error al cargar mensajes:", error);
     }
   }, [token]);
 
+  // Carga la página anterior al mensaje más antiguo que se está mostrando
+  const loadOlderMessages = async () => {
+    const userId = selectedChatUser?.user_id;
+    const entry = historyCacheRef.current[userId];
+    if (!entry || !entry.messages.length) return;
+    try {
+      const page = await getMessages(userId, token, { before_id: entry.messages[0].id });
+      const updated = { ...entry, messages: [...page.items, ...entry.messages], hasOlder: page.has_more };
+      historyCacheRef.current[userId] = updated;
+      skipScrollRef.current = true;
+      // Conserva los mensajes recibidos por WebSocket desde que se abrió el chat
+      setMessages(prev => [...page.items, ...prev]);
+      setHasOlderMessages(updated.hasOlder);
+    } catch (error) {
+      console.error("Error al cargar mensajes anteriores:", error);
+    }
+  };
+
   useEffect(() => {
     if (selectedChatUser) {
       fetchMessages(selectedChatUser.user_id);
@@ -187,6 +231,10 @@ const MensajeriaPage = () => {
 
   // Scroll al último mensaje
   useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
@@ -281,6 +329,11 @@ const MensajeriaPage = () => {
               <h3>{selectedChatUser.username}</h3>
             </div>
             <div className="messages-container">
+              {hasOlderMessages && (
+                <button type="button" className="load-older-button" onClick={loadOlderMessages}>
+                  Cargar mensajes anteriores
+                </button>
+              )}
               {messages.map((msg, index) => ( // Usar index como fallback key si msg.id no está disponible (ej. mensajes temporales)
                 <div
                   key={msg.id || index}
@@ -39,7 +39,7 @@ api.interceptors.response.use(
 // 🔍 Obtener todos los libros
 export const getAllBooks = async () => {
   const response = await api.get("/books/");
-  return response.data;
+  return response.data.items;
 };
 
 // 🔍 Obtener un libro por ID
@@ -54,7 +54,7 @@ export const getMyBooks = async (token) => {
       Authorization: `Bearer ${token}`,
     },
   });
-  return response.data;
+  return response.data.items;
 };
 
 export const deleteBook = async (bookId, token) => {
@@ -178,7 +178,7 @@ export const getUserBooks = async (userId) => {
       Authorization: `Bearer ${token}`,
     },
   });
-  return response.data;
+  return response.data.items;
 };
 
 export const updateBookImage = async (bookId, imageFile, token) => {
@@ -266,12 +266,15 @@ export const getConversations = async () => {
       Authorization: `Bearer ${token}`,
     },
   });
-  return response.data;
+  return response.data.items;
 };
 
-export const getMessages = async (userId, token) => {
+// Página del historial: { items, has_more, high_water_mark }.
+// params: { before_id } para mensajes anteriores o { since_id } para los nuevos
+export const getMessages = async (userId, token, params = {}) => {
   const response = await api.get(`/messages/conversation/${userId}`, {
     headers: { Authorization: `Bearer ${token}` },
+    params,
   });
   return response.data;
 };